@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+import os
+import math
+import time
+import random
+import asyncio
+import threading
+
+from lazy_imports import lazy_import
+
+# O cliente da OpenAI (e o httpx) só é importado na primeira chamada à API
+httpx = lazy_import("httpx")
+openai = lazy_import("openai")
+
+# chave da API OpenAI
+API_KEY = os.environ.get("OPENAI_API_KEY", "")
+
+# Tempo máximo (s) de cada chamada; o áudio de um segmento pode levar minutos para ser transcrito
+CHAT_TIMEOUT_SECONDS = 180
+TRANSCRIPTION_TIMEOUT_SECONDS = 300
+MAX_CONNECTIONS = 32  # Conexões HTTP mantidas abertas e reaproveitadas entre as chamadas
+
+# Novas tentativas com backoff exponencial e jitter
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+# Códigos HTTP que indicam falha temporária (limite de requisições ou erro do servidor)
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+# Limites de requisições (RPM) e tokens (TPM) por minuto, compartilhados por todas as chamadas do processo
+WHISPER_REQUESTS_PER_MINUTE = 50
+CHAT_REQUESTS_PER_MINUTE = 500
+CHAT_TOKENS_PER_MINUTE = 40000
+CHARS_PER_TOKEN_ESTIMATE = 3  # Estimativa do prompt antes da chamada; corrigida pelo consumo informado pela API
+RESERVED_COMPLETION_TOKENS = 1500  # Tokens de resposta reservados no limite de TPM antes da chamada
+BURST_SECONDS = 10  # A API aplica os limites também em janelas curtas; a rajada máxima equivale a 10 s de cota
+
+class ApiCallError(Exception):
+    """
+    Falha definitiva de uma chamada à API, após esgotar as novas tentativas ou em um erro não repetível.
+    """
+
+    def __init__(self, operation, cause, attempts, status_code=None):
+        status = f" (HTTP {status_code})" if status_code else ""
+        super().__init__(f"{operation} falhou após {attempts} tentativa(s){status}: {cause}")
+        self.operation = operation
+        self.cause = cause
+        self.attempts = attempts
+        self.status_code = status_code
+
+class _StreamInterrupted(Exception):
+    """
+    Falha de um streaming depois que parte do texto já foi entregue a on_token.
+    """
+
+    def __init__(self, cause):
+        super().__init__(str(cause))
+        self.cause = cause
+
+class TokenBucket:
+    """
+    Limitador por balde de tokens: a cota por minuto é reposta continuamente, com rajadas de até
+    burst_seconds de cota, e quem pede mais do que há disponível espera, na ordem de chegada.
+    Um limite vazio (None ou 0) não limita.
+    """
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = (per_minute or 0) / 60
+        self.capacity = max(self.rate * burst_seconds, 1) if per_minute else 0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        if not self.capacity:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def adjust(self, amount):
+        """
+        Desconta (ou devolve, se negativo) a diferença entre o consumo estimado e o real.
+        """
+        if self.capacity:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+def _retry_delay(error, attempt):
+    """
+    Tempo de espera antes de uma nova tentativa, respeitando o cabeçalho 'retry-after'
+    quando a API o informa e aplicando backoff exponencial com jitter caso contrário.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** attempt), BACKOFF_MAX_SECONDS)
+    return random.uniform(delay / 2, delay)
+
+def _transcript_to_dict(transcript):
+    """
+    Converte a resposta verbose_json do Whisper em um dicionário com os trechos e as palavras,
+    com tempos relativos ao áudio enviado e a confiança de cada trecho (exp da log-probabilidade média).
+    """
+    segments = [{"start": s.start, "end": s.end, "text": s.text.strip(),
+                 "confidence": round(math.exp(s.avg_logprob), 4) if s.avg_logprob is not None else None}
+                for s in getattr(transcript, "segments", None) or []]
+    words = [{"start": w.start, "end": w.end, "text": w.word}
+             for w in getattr(transcript, "words", None) or []]
+    return {"text": transcript.text, "segments": segments or None, "words": words or None}
+
+def _is_retryable(error):
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS or isinstance(error, asyncio.TimeoutError):
+        return True
+    return isinstance(error, (openai.APITimeoutError, openai.APIConnectionError))
+
+class ApiClient:
+    """
+    Camada de acesso à API: um único AsyncOpenAI, com pool de conexões, rodando em um event loop
+    próprio em segundo plano. As funções do pipeline continuam síncronas (chamadas a partir dos pools
+    de threads) e compartilham o cliente, os limites de RPM/TPM e a política de novas tentativas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+        self._client = None
+        self._custom_client = None
+        self._buckets = None
+        self.limits = {"whisper_rpm": WHISPER_REQUESTS_PER_MINUTE, "chat_rpm": CHAT_REQUESTS_PER_MINUTE,
+                       "chat_tpm": CHAT_TOKENS_PER_MINUTE}
+        self.timeouts = {"chat": CHAT_TIMEOUT_SECONDS, "transcription": TRANSCRIPTION_TIMEOUT_SECONDS}
+        self.max_attempts = MAX_ATTEMPTS
+
+    def configure(self, whisper_rpm=None, chat_rpm=None, chat_tpm=None, chat_timeout=None,
+                  transcription_timeout=None, max_attempts=None):
+        """
+        Ajusta limites, timeouts e tentativas; valores None mantêm a configuração atual.
+        """
+        with self._lock:
+            for name, value in (("whisper_rpm", whisper_rpm), ("chat_rpm", chat_rpm), ("chat_tpm", chat_tpm)):
+                if value is not None:
+                    self.limits[name] = value
+            if chat_timeout is not None:
+                self.timeouts["chat"] = chat_timeout
+            if transcription_timeout is not None:
+                self.timeouts["transcription"] = transcription_timeout
+            if max_attempts is not None:
+                self.max_attempts = max_attempts
+            # Os limitadores são recriados com a nova configuração na próxima chamada
+            self._buckets = None
+
+    def set_client(self, new_client):
+        """
+        Substitui o cliente assíncrono (ex: cliente falso dos benchmarks). Retorna o cliente anterior.
+        """
+        with self._lock:
+            previous, self._custom_client = self._custom_client, new_client
+        return previous
+
+    def _ensure_loop(self):
+        with self._lock:
+            # Processos criados por fork não herdam a thread do event loop
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                self._client = None
+                self._buckets = None
+                threading.Thread(target=self._loop.run_forever, name="api-loop", daemon=True).start()
+            return self._loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def _async_client(self):
+        if self._custom_client is not None:
+            return self._custom_client
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(
+                api_key=API_KEY,
+                max_retries=0,  # As novas tentativas são feitas aqui, com os limitadores
+                http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                                                  max_keepalive_connections=MAX_CONNECTIONS)),
+            )
+        return self._client
+
+    def _bucket(self, name):
+        # Criados dentro do event loop, compartilhados por todas as chamadas concorrentes
+        if self._buckets is None:
+            self._buckets = {key: TokenBucket(limit) for key, limit in self.limits.items()}
+        return self._buckets[name]
+
+    async def _with_retries(self, operation, call):
+        attempt = 0
+        while True:
+            try:
+                return await call(), attempt
+            except _StreamInterrupted as e:
+                # O consumidor já recebeu parte do texto; repetir a chamada o entregaria em dobro
+                raise ApiCallError(operation, e.cause, attempt + 1, getattr(e.cause, "status_code", None)) from e.cause
+            except Exception as e:
+                if not _is_retryable(e) or attempt + 1 >= self.max_attempts:
+                    raise ApiCallError(operation, e, attempt + 1, getattr(e, "status_code", None)) from e
+                delay = _retry_delay(e, attempt)
+                print(f"{operation}: {e}. Nova tentativa em {delay:.1f}s ({attempt + 1}/{self.max_attempts}).")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _transcribe(self, audio_bytes, file_name, model, language, word_timestamps):
+        async def call():
+            await self._bucket("whisper_rpm").acquire()
+            transcript = await self._async_client().audio.transcriptions.create(
+                model=model,
+                file=(file_name, audio_bytes),
+                language=language,
+                response_format="verbose_json",
+                timestamp_granularities=["segment", "word"] if word_timestamps else ["segment"],
+                timeout=self.timeouts["transcription"],
+            )
+            return _transcript_to_dict(transcript)
+        return await self._with_retries(f"Transcrição de {file_name}", call)
+
+    async def _chat(self, messages, model, temperature, on_token, response_format):
+        estimated = sum(len(message["content"]) for message in messages) // CHARS_PER_TOKEN_ESTIMATE
+        estimated += RESERVED_COMPLETION_TOKENS
+
+        async def call():
+            await self._bucket("chat_rpm").acquire()
+            await self._bucket("chat_tpm").acquire(estimated)
+            client = self._async_client()
+            options = {"response_format": response_format} if response_format else {}
+            if on_token is None:
+                response = await client.chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, timeout=self.timeouts["chat"], **options)
+                return response.choices[0].message.content, getattr(response, "usage", None)
+
+            stream = await client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature, timeout=self.timeouts["chat"],
+                stream=True, stream_options={"include_usage": True}, **options)
+            pieces, usage = [], None
+            try:
+                async for chunk in stream:
+                    # Com include_usage, o último trecho traz apenas o consumo de tokens, sem choices
+                    usage = getattr(chunk, "usage", None) or usage
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        pieces.append(delta)
+                        on_token(delta)
+            except Exception as e:
+                # Sem texto entregue, a chamada ainda pode ser repetida normalmente
+                if pieces:
+                    raise _StreamInterrupted(e) from e
+                raise
+            return "".join(pieces), usage
+
+        (content, usage), retries = await self._with_retries("Chamada de chat", call)
+        if usage is not None:
+            self._bucket("chat_tpm").adjust(usage.prompt_tokens + usage.completion_tokens - estimated)
+        return content, usage, retries
+
+    def transcribe(self, audio_bytes, file_name, model, language, word_timestamps=False):
+        """
+        Transcreve o áudio (bytes já codificados) com timestamps. Retorna ({"text", "segments", "words"},
+        novas tentativas) ou levanta ApiCallError.
+        """
+        return self._run(self._transcribe(audio_bytes, file_name, model, language, word_timestamps))
+
+    def chat(self, messages, model, temperature, on_token=None, response_format=None):
+        """
+        Executa uma chamada de chat, em streaming quando on_token é informado (chamado no event loop).
+        Uma falha depois que on_token recebeu texto não é repetida, para que o texto não seja entregue em dobro.
+        Retorna (texto, consumo de tokens ou None, novas tentativas) ou levanta ApiCallError.
+
+        :param response_format: formato estruturado da resposta (ex: {"type": "json_object"}).
+        """
+        return self._run(self._chat(messages, model, temperature, on_token, response_format))
+
+# Instância compartilhada pelo pipeline
+api = ApiClient()
@@ -1,123 +1,117 @@
 import streamlit as st
 import os
-from model_functions import (criar_pastas, extract_and_split_audio_from_video, 
-                       process_audio_mp3, process_audio_wav, process_audio,
-                       transcribe_audio, split_text_by_length, summarize_text_as_minutes, 
-                       read_meeting_parts_from_directory, combine_meeting_parts,
-                       generate_full_summary, generate_aggregated_minutes)
+import time
 
-from pdf_generator import gerar_pdf_resumo_ata
-from folder_delete import  clean_folders_except_pdf
+from job_workspace import criar_job
+from job_runner import spool_upload
+from job_queue import JobQueue, QUEUED, RUNNING, DONE
+from progress import STAGES, format_eta
+
+# Tipos de arquivo aceitos e o tipo usado pelo pipeline
+FILE_TYPES = {"mp4": "video", "mp3": "mp3", "wav": "wav"}
+POLL_INTERVAL = 1.0  # Intervalo (s) entre consultas ao progresso do job
 
 # Título da aplicação
 st.title("Geração de Atas")
 
+queue = JobQueue()
+
 # Upload do arquivo
 uploaded_file = st.file_uploader("Faça o upload do arquivo (MP4, MP3 ou WAV)", type=["mp4", "mp3", "wav"])
 
-if uploaded_file is not None:
-    # Cria as pastas necessárias
-    criar_pastas()
-
-    # Salva o arquivo carregado na pasta de upload
-    file_path = os.path.join("arquivos_upload", uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
+# Cada upload é enfileirado uma única vez, mesmo com as re-execuções do script pelo Streamlit
+if uploaded_file is not None and st.session_state.get("uploaded_file_id") != uploaded_file.file_id:
+    # Determina o tipo de arquivo
+    file_ext = uploaded_file.name.split('.')[-1].lower()
+    if file_ext not in FILE_TYPES:
+        st.error("Tipo de arquivo não suportado.")
+        st.stop()
+
+    # Cria um diretório de trabalho exclusivo para este upload
+    manifest = criar_job(uploaded_file.name, FILE_TYPES[file_ext])
+
+    # O upload é apenas gravado na pasta do job; a extração do áudio e a segmentação ficam com o worker,
+    # que envia o arquivo ao ffmpeg em fluxo, para que a página não fique presa ao ffmpeg
+    try:
+        with st.spinner("Enviando a gravação..."):
+            spool_upload(uploaded_file, manifest, uploaded_file.name)
+    except OSError as e:
+        st.error(f"Não foi possível gravar o arquivo: {e}")
+        st.stop()
+
+    # O processamento é feito pelos workers (worker.py); a página apenas acompanha o job
+    queue.submit(manifest=manifest)
+    st.session_state["uploaded_file_id"] = uploaded_file.file_id
+    st.query_params["job"] = manifest.job_id
     st.success(f"Arquivo {uploaded_file.name} carregado com sucesso!")
 
-    # Inicia o processamento automaticamente
-    with st.spinner("Processando arquivo..."):
-        try:
-            # Determina o tipo de arquivo
-            file_ext = uploaded_file.name.split('.')[-1].lower()
-            if file_ext == "mp4":
-                st.write("Processando arquivo de vídeo...")
-                segments = extract_and_split_audio_from_video(file_path)
-            elif file_ext == "mp3":
-                st.write("Processando arquivo MP3...")
-                output_dir = "audio_mp3_processado"
-                cleaned_audio_path = process_audio_mp3(file_path, output_dir)
-                segments = [cleaned_audio_path]  # Como é um arquivo único, não precisa dividir
-            elif file_ext == "wav":
-                st.write("Processando arquivo WAV...")
-                output_folder = "segmentos_audio"
-                segments = process_audio_wav(file_path, output_folder)
-            else:
-                st.error("Tipo de arquivo não suportado.")
-                st.stop()
-
-            st.write(f"Total de arquivos a serem processados: {len(segments)}")
-
-            cleaned_audio_dir = "audio_limpo"  # Pasta onde os áudios limpos serão salvos
-            if not os.path.exists(cleaned_audio_dir):
-                os.makedirs(cleaned_audio_dir)
-
-            full_transcription = ""
-            for idx, segment_path in enumerate(segments):
-                st.write(f"Processando segmento {idx+1}/{len(segments)}...")
-                cleaned_audio_path = process_audio(segment_path, cleaned_audio_dir)
-                transcription = transcribe_audio(cleaned_audio_path)
-                full_transcription += transcription + "\n"
-
-            with open(os.path.join("transcricoes", "full_transcription.txt"), "w", encoding="utf-8") as f:
-                f.write(full_transcription)
-
-            st.write("Transcrição concluída e salva em 'transcricoes/full_transcription.txt'.")
-
-            atas_dir = "atas_parciais"
-            if not os.path.exists(atas_dir):
-                os.makedirs(atas_dir)
-
-            # Verifica o tamanho da transcrição
-            max_char_limit = 8000
-            if len(full_transcription) > max_char_limit:
-                transcription_parts = split_text_by_length(full_transcription, max_char_limit)
-            else:
-                transcription_parts = [full_transcription]
-
-            final_summaries = []
-            for i, part in enumerate(transcription_parts):
-                st.write(f"Gerando a ata da Parte {i+1}/{len(transcription_parts)}...")
-                summary = summarize_text_as_minutes(part, part_number=i+1)
-                final_summaries.append(summary)
-                st.write(f"Ata da Parte {i+1} concluída.\n")
-
-            # Salvar as atas na pasta 'atas_parciais'
-            for i, summary in enumerate(final_summaries):
-                file_name = os.path.join(atas_dir, f"ata_parte_{i+1}.txt")
-                with open(file_name, "w", encoding="utf-8") as f:
-                    f.write(summary)
-                st.write(f"Ata Parte {i+1} salva em '{file_name}'.")
-
-            # Lê as atas do diretório
-            meeting_parts = read_meeting_parts_from_directory(atas_dir)
-
-            # Consolida a ata final
-            final_ata = combine_meeting_parts(meeting_parts)
-            full_summary = generate_full_summary("\n".join(meeting_parts))
-            aggregated_minutes = generate_aggregated_minutes("\n".join(meeting_parts))
-
-            # Gera o PDF
-            gerar_pdf_resumo_ata(full_summary, aggregated_minutes, "resumo_e_ata.pdf")
-
-            # Verifica se o PDF foi gerado
-            pdf_path = os.path.join("pdf", "resumo_e_ata.pdf")
-            if os.path.exists(pdf_path):
-                st.success("Processamento concluído com sucesso!")
-
-                # Disponibiliza o download do PDF
-                with open(pdf_path, "rb") as f:
-                    st.download_button(
-                        label="Baixar PDF",
-                        data=f,
-                        file_name="resumo_e_ata.pdf",
-                        mime="application/pdf"
-                    )
-
-                # Limpa as pastas, exceto a pasta 'pdf'
-                clean_folders_except_pdf()
-            else:
-                st.error("Ocorreu um erro ao gerar o PDF.")
-        except Exception as e:
-            st.error(f"Ocorreu um erro durante o processamento: {e}")
\ No newline at end of file
+# O id do job fica na URL, então recarregar a página continua acompanhando o mesmo job
+job_id = st.query_params.get("job")
+job = queue.get(job_id) if job_id else None
+
+if job_id and job is None:
+    st.error(f"Job '{job_id}' não encontrado.")
+elif job is not None:
+    st.caption(f"Job: {job_id}")
+
+    # Uma barra de progresso por etapa, criadas na ordem do pipeline
+    progress_bars = {stage: st.empty() for stage in STAGES}
+    status = st.empty()
+    partial_minutes = st.expander("Atas parciais", expanded=False)
+    partial_area = partial_minutes.empty()
+
+    # Texto do resumo e da ata exibido enquanto o modelo gera as respostas
+    live_columns = st.columns(2)
+    live_titles = {"resumo_extenso": "Resumo Extenso e Detalhado", "ata_consolidada": "Ata Consolidada"}
+    live_areas = {}
+    for column, (stage, title) in zip(live_columns, live_titles.items()):
+        column.subheader(title)
+        live_areas[stage] = column.empty()
+
+    def render(job):
+        progress = job["progress"]
+        for stage, data in progress.get("stages", {}).items():
+            fraction = data["done"] / data["total"] if data["total"] else 0.0
+            progress_bars[stage].progress(
+                min(fraction, 1.0),
+                text=f"{data['label']}: {data['done']}/{data['total'] or '?'} (ETA {format_eta(data['eta_seconds'])})")
+        if job["status"] == QUEUED:
+            status.write("Aguardando um worker disponível...")
+        elif progress.get("message"):
+            status.write(progress["message"])
+        partials = progress.get("partials", {})
+        if partials:
+            partial_area.markdown("\n\n".join(f"**Ata Parte {int(index) + 1}**\n\n{partials[index]}"
+                                              for index in sorted(partials, key=int)))
+        for stage, text in progress.get("live", {}).items():
+            if stage in live_areas:
+                live_areas[stage].markdown(text)
+
+    # Acompanha o job consultando a fila até que ele termine
+    render(job)
+    while job["status"] in (QUEUED, RUNNING):
+        time.sleep(POLL_INTERVAL)
+        job = queue.get(job_id)
+        render(job)
+
+    # O PDF é sempre o gerado pelo worker a partir das saídas salvas do job
+    pdf_path = queue.result_pdf(job_id)
+    pdf_data = None
+    if pdf_path and os.path.exists(pdf_path):
+        with open(pdf_path, "rb") as f:
+            pdf_data = f.read()
+
+    if job["status"] != DONE:
+        st.error(f"Ocorreu um erro durante o processamento: {job['error']}")
+    elif pdf_data:
+        st.success("Processamento concluído com sucesso!")
+
+        # Disponibiliza o download do PDF
+        st.download_button(
+            label="Baixar PDF",
+            data=pdf_data,
+            file_name="resumo_e_ata.pdf",
+            mime="application/pdf"
+        )
+    else:
+        st.error("Ocorreu um erro ao gerar o PDF.")
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from lazy_imports import lazy_import
+
+ffmpeg = lazy_import("ffmpeg")
+
+# Codecs disponíveis para o envio à API Whisper: formato do contêiner, codec do ffmpeg e extensão do arquivo
+UPLOAD_CODECS = {
+    "wav": {"format": "wav", "acodec": "pcm_s16le", "ext": "wav"},
+    "opus": {"format": "ogg", "acodec": "libopus", "ext": "ogg"},
+    "mp3": {"format": "mp3", "acodec": "libmp3lame", "ext": "mp3"},
+}
+
+UPLOAD_CODEC = "opus"  # Codec usado no envio dos segmentos
+UPLOAD_BITRATE_KBPS = 24  # Taxa de bits para os codecs com perda (ignorada no WAV)
+UPLOAD_SAMPLE_RATE = 16000
+PCM_BYTES_PER_SECOND = UPLOAD_SAMPLE_RATE * 2  # WAV 16 bits mono
+SIZE_SAFETY_MARGIN = 0.9  # Folga para cabeçalhos e variação da taxa de bits
+MAX_SEGMENT_SECONDS = 30 * 60  # Limita a duração (e a memória) de cada segmento
+
+def upload_extension(codec=UPLOAD_CODEC):
+    return UPLOAD_CODECS[codec]["ext"]
+
+def upload_bytes_per_second(codec=UPLOAD_CODEC, bitrate_kbps=UPLOAD_BITRATE_KBPS):
+    """
+    Taxa de bytes do áudio efetivamente enviado à API para o codec escolhido.
+    """
+    if codec == "wav":
+        return PCM_BYTES_PER_SECOND
+    return bitrate_kbps * 1000 / 8
+
+def upload_segment_seconds(max_segment_size_mb, codec=UPLOAD_CODEC, bitrate_kbps=UPLOAD_BITRATE_KBPS,
+                           max_seconds=MAX_SEGMENT_SECONDS):
+    """
+    Duração máxima de um segmento para que o arquivo codificado fique abaixo de max_segment_size_mb.
+    """
+    budget = max_segment_size_mb * 1024 * 1024 * SIZE_SAFETY_MARGIN
+    seconds = int(budget / upload_bytes_per_second(codec, bitrate_kbps))
+    return max(1, min(seconds, max_seconds)) if max_seconds else max(1, seconds)
+
+def encode_for_upload(wav_bytes, codec=UPLOAD_CODEC, bitrate_kbps=UPLOAD_BITRATE_KBPS):
+    """
+    Converte um WAV em memória para o codec de envio (mono, 16 kHz), usando o ffmpeg via stdin/stdout.
+    """
+    if codec == "wav":
+        return wav_bytes
+    spec = UPLOAD_CODECS[codec]
+    encoded, _ = (
+        ffmpeg.input("pipe:", format="wav")
+        .output("pipe:", format=spec["format"], acodec=spec["acodec"], audio_bitrate=f"{bitrate_kbps}k",
+                ac=1, ar=str(UPLOAD_SAMPLE_RATE))
+        .run(input=wav_bytes, capture_stdout=True, capture_stderr=True)
+    )
+    return encoded
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import glob
+import json
+import math
+import wave
+import struct
+import threading
+import numpy as np
+
+from instrumentation import traced
+from lazy_imports import lazy_import
+
+ffmpeg = lazy_import("ffmpeg")
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30  # Duração de cada quadro analisado
+SILENCE_THRESHOLD_DBFS = -40.0  # Quadros abaixo desta energia são considerados silêncio
+MIN_SILENCE_MS = 300  # Pausa mínima para que um corte seja feito nela
+KEEP_SILENCE_MS = 500  # Silêncio mantido em cada pausa; o excedente de pausas longas não é enviado
+TARGET_SECONDS = 180  # Duração desejada de cada segmento
+MIN_SECONDS = 120  # Antes desta duração nenhum corte é feito
+MAX_SECONDS = 300  # Corte forçado (com sobreposição) se nenhuma pausa for encontrada
+OVERLAP_SECONDS = 1.5  # Sobreposição aplicada apenas em cortes forçados, no meio da fala
+MAX_WORDS_PER_SECOND = 4  # Limite de palavras faladas por segundo, usado para delimitar o texto sobreposto
+SEGMENT_INDEX_FILE = "segments_index.json"
+READ_BLOCK_BYTES = 64 * 1024
+STDIN_BLOCK_BYTES = 1024 * 1024  # Blocos da gravação enviados ao ffmpeg pela entrada padrão
+
+def open_pcm_stream(audio_path, sr=SAMPLE_RATE):
+    """
+    Inicia o ffmpeg decodificando qualquer entrada (vídeo ou áudio) para PCM 16 bits mono na saída padrão.
+    Com audio_path="pipe:", a entrada é lida da entrada padrão do processo (ver split_stream_on_silence).
+    """
+    from_pipe = audio_path == "pipe:"
+    return (
+        ffmpeg.input(audio_path)
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=str(sr), vn=None)
+        .global_args("-loglevel", "error", *(() if from_pipe else ("-nostdin",)))
+        .run_async(pipe_stdin=from_pipe, pipe_stdout=True)
+    )
+
+def mp4_streamable(stream):
+    """
+    Indica se um MP4 pode ser lido por pipe: o índice (átomo moov) precisa vir antes dos dados (mdat),
+    como em arquivos com 'faststart' ou fragmentados. Lê apenas os cabeçalhos dos átomos e volta à posição inicial.
+    """
+    start = stream.tell()
+    try:
+        while True:
+            header = stream.read(8)
+            if len(header) < 8:
+                return False
+            size, kind = struct.unpack(">I4s", header)
+            if kind == b"moov":
+                return True
+            if kind == b"mdat" or size == 0:
+                return False
+            if size == 1:  # Tamanho estendido de 64 bits logo após o cabeçalho
+                size = struct.unpack(">Q", stream.read(8))[0] - 8
+            stream.seek(size - 8, os.SEEK_CUR)
+    finally:
+        stream.seek(start)
+
+class SilenceSegmenter:
+    """
+    Divide um fluxo PCM 16 bits mono em segmentos próximos de target_seconds, cortando nas pausas.
+
+    O fluxo é consumido de forma incremental (feed/finish) e apenas o segmento atual fica em memória.
+    Pausas mais longas que keep_silence_ms são encurtadas, e cortes forçados ao atingir max_seconds
+    repetem os últimos overlap_seconds no início do segmento seguinte.
+    """
+
+    def __init__(self, output_folder, sr=SAMPLE_RATE, target_seconds=TARGET_SECONDS, min_seconds=MIN_SECONDS,
+                 max_seconds=MAX_SECONDS, overlap_seconds=OVERLAP_SECONDS,
+                 silence_threshold_dbfs=SILENCE_THRESHOLD_DBFS, min_silence_ms=MIN_SILENCE_MS,
+                 keep_silence_ms=KEEP_SILENCE_MS, prefix="segment"):
+        self.output_folder = output_folder
+        self.sr = sr
+        self.prefix = prefix
+        self.frame_len = sr * FRAME_MS // 1000
+        frames_per_second = 1000 / FRAME_MS
+        self.max_frames = int(max_seconds * frames_per_second)
+        self.min_frames = min(int(min_seconds * frames_per_second), self.max_frames)
+        self.target_frames = min(max(int(target_seconds * frames_per_second), self.min_frames), self.max_frames)
+        self.overlap_frames = int(overlap_seconds * frames_per_second)
+        self.min_silence_frames = max(1, min_silence_ms // FRAME_MS)
+        self.keep_silence_frames = max(self.min_silence_frames, keep_silence_ms // FRAME_MS)
+        self.silence_threshold = 10 ** (silence_threshold_dbfs / 20) * 32768
+
+        self.segments = []  # Metadados dos segmentos gravados
+        self._frames = []  # Quadros do segmento atual
+        self._starts = []  # Posição (em amostras) de cada quadro na gravação original
+        self._silent = []  # Indica se cada quadro é silêncio
+        self._overlap = 0
+        self._silence_run = 0
+        self._best_cut = None  # (duração da pausa, posição do corte)
+        self._position = 0
+        self._pending = b""
+        os.makedirs(output_folder, exist_ok=True)
+
+    def feed(self, pcm_bytes):
+        """
+        Consome mais bytes PCM do fluxo; segmentos completos são gravados assim que encontrados.
+        """
+        data = self._pending + pcm_bytes
+        usable = len(data) - len(data) % (self.frame_len * 2)
+        self._pending = data[usable:]
+        if not usable:
+            return
+        samples = np.frombuffer(data[:usable], dtype=np.int16).reshape(-1, self.frame_len)
+        rms = np.sqrt(np.mean(np.square(samples, dtype=np.float32), axis=1))
+        for frame, silent in zip(samples, rms < self.silence_threshold):
+            self._push_frame(frame, bool(silent))
+
+    def finish(self):
+        """
+        Grava o último segmento (se contiver fala) e retorna os metadados de todos os segmentos.
+        """
+        if self._pending:
+            tail = np.frombuffer(self._pending[:len(self._pending) - len(self._pending) % 2], dtype=np.int16)
+            if len(tail):
+                self._frames.append(tail)
+                self._starts.append(self._position)
+                self._silent.append(bool(np.sqrt(np.mean(np.square(tail, dtype=np.float32))) < self.silence_threshold))
+            self._pending = b""
+        if self._frames:
+            self._cut(len(self._frames), hard=False)
+        return self.segments
+
+    def _push_frame(self, frame, silent):
+        start = self._position
+        self._position += len(frame)
+
+        if silent:
+            self._silence_run += 1
+            if self._silence_run > self.keep_silence_frames:
+                return  # Pausa longa: o excedente não é enviado
+        else:
+            self._silence_run = 0
+
+        self._frames.append(frame)
+        self._starts.append(start)
+        self._silent.append(silent)
+        n = len(self._frames)
+
+        if silent and self._silence_run >= self.min_silence_frames and n >= self.min_frames:
+            cut_at = n - min(self._silence_run, self.keep_silence_frames) // 2
+            if n >= self.target_frames:
+                self._cut(cut_at, hard=False)
+                return
+            if self._best_cut is None or self._silence_run >= self._best_cut[0]:
+                self._best_cut = (self._silence_run, cut_at)
+
+        if n >= self.max_frames:
+            if self._best_cut is not None:
+                self._cut(self._best_cut[1], hard=False)
+            else:
+                self._cut(n, hard=True)
+
+    def _cut(self, k, hard):
+        frames, starts = self._frames[:k], self._starts[:k]
+        keep_from = max(0, k - self.overlap_frames) if hard and self.overlap_frames else k
+
+        if not all(self._silent[:k]):
+            self._write_segment(frames, starts)
+
+        self._frames = self._frames[keep_from:]
+        self._starts = self._starts[keep_from:]
+        self._silent = self._silent[keep_from:]
+        self._overlap = (k - keep_from) * self.frame_len / self.sr
+        self._best_cut = None
+
+    def _write_segment(self, frames, starts):
+        segment_path = os.path.join(self.output_folder, f"{self.prefix}_{len(self.segments) + 1}.wav")
+        with wave.open(segment_path, "wb") as wav_out:
+            wav_out.setnchannels(1)
+            wav_out.setsampwidth(2)
+            wav_out.setframerate(self.sr)
+            for frame in frames:
+                wav_out.writeframesraw(frame.tobytes())
+
+        # Pontos em que o áudio do segmento salta na gravação original (pausas longas encurtadas):
+        # pares [tempo no segmento, tempo na gravação], usados para levar os timestamps à gravação
+        lengths = np.array([len(f) for f in frames])
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        starts_array = np.array(starts)
+        jumps = np.flatnonzero(np.diff(starts_array) != lengths[:-1]) + 1
+        timeline = [[0.0, starts[0] / self.sr]]
+        timeline += [[round(float(offsets[i]) / self.sr, 3), round(float(starts_array[i]) / self.sr, 3)] for i in jumps]
+
+        duration = sum(len(f) for f in frames) / self.sr
+        self.segments.append({
+            "path": segment_path,
+            "start_seconds": starts[0] / self.sr,
+            "end_seconds": (starts[-1] + len(frames[-1])) / self.sr,
+            "duration_seconds": duration,
+            "overlap_seconds": self._overlap,
+            "timeline": timeline,
+        })
+        print(f"Segmento criado: {segment_path} ({duration:.1f}s, início em {starts[0] / self.sr:.1f}s)")
+
+def _prepare_output(output_folder):
+    os.makedirs(output_folder, exist_ok=True)
+    # Remove segmentos de execuções anteriores para não misturá-los com os novos
+    for old_segment in glob.glob(os.path.join(output_folder, "segment_*.wav")):
+        os.remove(old_segment)
+
+def _segment_pcm(process, segmenter, output_folder, source):
+    """
+    Consome o PCM do ffmpeg no segmentador e grava o índice dos segmentos. Retorna a lista de caminhos.
+    """
+    try:
+        for block in iter(lambda: process.stdout.read(READ_BLOCK_BYTES), b""):
+            segmenter.feed(block)
+    finally:
+        process.stdout.close()
+        return_code = process.wait()
+    if return_code != 0:
+        raise RuntimeError(f"ffmpeg falhou ao decodificar '{source}' (código {return_code}).")
+
+    segments = segmenter.finish()
+    with open(os.path.join(output_folder, SEGMENT_INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(segments, f, ensure_ascii=False, indent=2)
+    return [segment["path"] for segment in segments]
+
+@traced("split", paths=("audio_path",), returns_paths=True)
+def split_audio_on_silence(audio_path, output_folder, max_seconds=MAX_SECONDS, **segmenter_options):
+    """
+    Decodifica a entrada com o ffmpeg e a divide em segmentos cortados nas pausas da fala,
+    sem gravar o áudio completo em disco. Retorna a lista de caminhos dos segmentos.
+
+    Os tempos de cada segmento na gravação original são salvos em SEGMENT_INDEX_FILE na pasta de saída.
+    """
+    print(f"Dividindo áudio nas pausas: {audio_path}")
+    _prepare_output(output_folder)
+    segmenter = SilenceSegmenter(output_folder, max_seconds=max_seconds, **segmenter_options)
+    return _segment_pcm(open_pcm_stream(audio_path, segmenter.sr), segmenter, output_folder, audio_path)
+
+def _copy_to_stdin(stream, process, block_bytes):
+    try:
+        for block in iter(lambda: stream.read(block_bytes), b""):
+            process.stdin.write(block)
+    except (BrokenPipeError, ValueError):
+        pass  # O ffmpeg encerrou antes do fim da entrada; o erro é informado pelo código de saída
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+@traced("split", returns_paths=True)
+def split_stream_on_silence(stream, output_folder, max_seconds=MAX_SECONDS, name="upload",
+                            block_bytes=STDIN_BLOCK_BYTES, **segmenter_options):
+    """
+    Como split_audio_on_silence, mas lendo a gravação de um objeto binário (ex: upload do Streamlit),
+    enviado ao ffmpeg pela entrada padrão: a entrada é lida uma única vez e não é gravada em disco.
+    O formato precisa ser legível em fluxo (ver mp4_streamable para MP4).
+    """
+    print(f"Dividindo áudio nas pausas: {name} (via pipe)")
+    _prepare_output(output_folder)
+    segmenter = SilenceSegmenter(output_folder, max_seconds=max_seconds, **segmenter_options)
+    process = open_pcm_stream("pipe:", segmenter.sr)
+    feeder = threading.Thread(target=_copy_to_stdin, args=(stream, process, block_bytes),
+                              name="ffmpeg-stdin", daemon=True)
+    feeder.start()
+    try:
+        return _segment_pcm(process, segmenter, output_folder, name)
+    finally:
+        feeder.join()
+
+def _audio_duration(path):
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav_in:
+            return wav_in.getnframes() / wav_in.getframerate()
+    return float(ffmpeg.probe(path)["format"]["duration"])
+
+def segment_timelines(segment_paths):
+    """
+    Retorna, para cada segmento, {"timeline", "duration_seconds", "overlap_seconds"}: os pares [tempo no segmento,
+    tempo na gravação] a partir dos quais o áudio é contínuo, a duração do segmento e os segundos iniciais
+    repetidos do segmento anterior.
+
+    Usa o SEGMENT_INDEX_FILE gravado na segmentação por pausas; sem ele (segmentos de duração fixa),
+    os segmentos são considerados consecutivos e sem cortes.
+    """
+    index = {}
+    folders = {os.path.dirname(path) for path in segment_paths}
+    for folder in folders:
+        index_path = os.path.join(folder, SEGMENT_INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    index[os.path.join(folder, os.path.basename(entry["path"]))] = entry
+
+    timelines, position = [], 0.0
+    for path in segment_paths:
+        entry = index.get(path)
+        if entry is not None:
+            timeline = entry.get("timeline") or [[0.0, entry["start_seconds"]]]
+            timelines.append({"timeline": timeline, "duration_seconds": entry["duration_seconds"],
+                              "overlap_seconds": entry.get("overlap_seconds", 0.0)})
+            position = entry["end_seconds"]
+        else:
+            duration = _audio_duration(path)
+            timelines.append({"timeline": [[0.0, position]], "duration_seconds": duration, "overlap_seconds": 0.0})
+            position += duration
+    return timelines
+
+def to_recording_time(timeline, seconds):
+    """
+    Converte um tempo relativo ao segmento em tempo na gravação original (ver segment_timelines).
+    """
+    segment_time, recording_time = timeline[0]
+    for point in timeline[1:]:
+        if point[0] > seconds:
+            break
+        segment_time, recording_time = point
+    return recording_time + seconds - segment_time
+
+def _normalize_word(word):
+    return re.sub(r"[^\w]", "", word.lower())
+
+def _overlap_length(previous_words, words, min_match_words, max_match_words):
+    limit = min(max_match_words, len(previous_words), len(words))
+    tail = [_normalize_word(w) for w in previous_words[-limit:]] if limit else []
+    head = [_normalize_word(w) for w in words[:limit]]
+    for n in range(limit, min_match_words - 1, -1):
+        if tail[-n:] == head[:n]:
+            return n
+    return 0
+
+def stitch_transcriptions(transcriptions, overlaps=None, min_match_words=2, words_per_second=MAX_WORDS_PER_SECOND):
+    """
+    Junta as transcrições dos segmentos (uma por linha), removendo do início de cada segmento
+    as palavras repetidas do final do anterior, geradas pela sobreposição dos cortes forçados.
+
+    :param overlaps: segundos de áudio repetidos no início de cada segmento ("overlap_seconds" do índice
+        dos segmentos, ver segment_timelines). Só segmentos com sobreposição são comparados ao anterior,
+        e no máximo pelas palavras que cabem nesse tempo; sem overlaps, as transcrições são apenas unidas.
+    """
+    overlaps = overlaps or [0.0] * len(transcriptions)
+    stitched = []
+    previous_words = []
+    for text, overlap in zip(transcriptions, overlaps):
+        words = text.split()
+        max_match_words = math.ceil(overlap * words_per_second) if overlap and overlap > 0 else 0
+        duplicated = _overlap_length(previous_words, words, min_match_words, max_match_words)
+        if duplicated:
+            text = " ".join(words[duplicated:])
+            words = words[duplicated:]
+        stitched.append(text)
+        previous_words = words
+    return "".join(text + "\n" for text in stitched)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import glob
+import json
+import time
+from datetime import datetime
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from job_workspace import JOBS_DIR, criar_job
+from job_runner import run_job
+from progress import ProgressTracker
+from pipeline import MAX_WORKERS_DENOISE
+from transcription_backends import get_transcriber, MAX_WORKERS_LOCAL
+
+# Tipos de arquivo aceitos no modo em lote e o tipo usado pelo pipeline
+FILE_TYPES = {"mp4": "video", "mp3": "mp3", "wav": "wav"}
+
+MAX_JOBS = 2  # Gravações processadas ao mesmo tempo
+MAX_WORKERS_API = 16  # Chamadas simultâneas à API somando todas as gravações (limitadas por RPM/TPM em api_client)
+
+def collect_inputs(source):
+    """
+    Lista os arquivos suportados de um diretório ou padrão glob (ex: 'reunioes/*.mp4'), em ordem alfabética.
+    """
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, "*"))
+    else:
+        paths = glob.glob(source)
+    return sorted(os.path.abspath(path) for path in paths
+                  if os.path.isfile(path) and path.split('.')[-1].lower() in FILE_TYPES)
+
+def _job_printer(job_id):
+    """
+    Exibe as mensagens de progresso de um job identificadas pelo job_id; o texto em streaming é omitido.
+    """
+    def on_event(event):
+        if event["type"] == "message":
+            print(f"[{job_id}] {event['text']}")
+        elif event["type"] == "stage" and event["total"] and event["done"] >= event["total"]:
+            print(f"[{job_id}] {event['label']} concluída.")
+    return on_event
+
+def _run_batch_job(manifest, keep_intermediates, pool_cpu, pool_api, pool_local):
+    started = time.monotonic()
+    entry = {"input_file": manifest.data["input_file"], "job_id": manifest.job_id}
+    try:
+        entry["pdf"] = run_job(manifest, ProgressTracker(on_event=_job_printer(manifest.job_id)),
+                               keep_intermediates, pool_cpu=pool_cpu, pool_api=pool_api, pool_local=pool_local)
+        entry["status"] = "ok"
+    except Exception as e:
+        entry["status"] = "erro"
+        entry["error"] = str(e)
+    entry["seconds"] = round(time.monotonic() - started, 1)
+    return entry
+
+def run_batch(inputs, max_jobs=MAX_JOBS, max_workers_cpu=MAX_WORKERS_DENOISE, max_workers_api=MAX_WORKERS_API,
+              keep_intermediates=False, report_dir=JOBS_DIR, transcription_backend=None):
+    """
+    Processa várias gravações em uma única execução, cada uma em seu próprio job (um PDF por entrada).
+
+    Todas as gravações compartilham um pool de processos para o ffmpeg e a redução de ruído e um pool
+    de chamadas à API (sujeito aos limites globais de RPM/TPM de api_client), mantendo a CPU e a cota
+    da API ocupadas enquanto cada gravação está em etapas diferentes. Com a transcrição local, um pool de
+    processos com o modelo carregado também é compartilhado. Retorna o relatório do lote, também salvo em JSON.
+    """
+    transcriber = get_transcriber(transcription_backend)
+    started_at = datetime.now()
+    started = time.monotonic()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=max_workers_cpu) as pool_cpu, \
+            ThreadPoolExecutor(max_workers=max_workers_api, thread_name_prefix="api") as pool_api, \
+            ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job") as pool_jobs, \
+            ExitStack() as stack:
+        pool_local = None
+        if transcriber.runs_in_process:
+            pool_local = stack.enter_context(ProcessPoolExecutor(max_workers=MAX_WORKERS_LOCAL,
+                                                                 initializer=transcriber.warm_up))
+        futures = []
+        for input_file in inputs:
+            manifest = criar_job(input_file, FILE_TYPES[input_file.split('.')[-1].lower()],
+                                 transcription_backend=transcriber.name)
+            futures.append(pool_jobs.submit(_run_batch_job, manifest, keep_intermediates, pool_cpu, pool_api,
+                                            pool_local))
+
+        for future in as_completed(futures):
+            entry = future.result()
+            results.append(entry)
+            if entry["status"] == "ok":
+                print(f"[{entry['job_id']}] PDF gerado: {entry['pdf']} ({entry['seconds']}s)")
+            else:
+                print(f"[{entry['job_id']}] Falha: {entry['error']}. Retome com --resume {entry['job_id']}")
+
+    results.sort(key=lambda entry: inputs.index(entry["input_file"]))
+    report = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "seconds": round(time.monotonic() - started, 1),
+        "total": len(results),
+        "succeeded": sum(1 for entry in results if entry["status"] == "ok"),
+        "failed": sum(1 for entry in results if entry["status"] != "ok"),
+        "jobs": results,
+    }
+
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, f"relatorio_lote_{started_at.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"Lote concluído: {report['succeeded']}/{report['total']} gravações em {report['seconds']}s. "
+          f"Relatório salvo em '{report_path}'.")
+    report["report_path"] = report_path
+    return report
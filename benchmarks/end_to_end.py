@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do pipeline completo sobre uma gravação sintética, com a API substituída por um cliente falso.
+
+Mede o tempo total, o pico de memória (RSS) e o tempo de cada etapa (extração e divisão,
+redução de ruído, transcrição, atas e PDF). O resultado é emitido em JSON para comparar
+execuções entre commits.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.end_to_end --minutos 60 [--formato mp4] [--latencia 0.5] [--taxa-erro 0.02]
+                                    [--saida resultado.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from benchmarks.synthetic_audio import gerar_audio_sintetico, FORMATS
+from benchmarks.fake_openai import FakeOpenAI
+from cache import result_cache
+from job_workspace import criar_job
+from job_runner import run_job
+from model_functions import set_client
+from progress import ProgressTracker
+from instrumentation import tracer
+
+DATA_DIR = os.path.join("benchmarks", "dados")  # Gravações sintéticas reaproveitadas entre execuções
+FILE_TYPES = {"mp4": "video", "mp3": "mp3", "wav": "wav"}
+
+# Etapas do pipeline agrupadas nas etapas reportadas pelo benchmark
+STAGE_GROUPS = {
+    "extract_split": ("segmentacao",),
+    "denoise": ("denoise",),
+    "transcribe": ("transcricao",),
+    "summarize": ("atas_parciais", "reducao", "resumo_extenso", "ata_consolidada"),
+    "pdf": ("pdf",),
+}
+
+class StageTimer:
+    """
+    Registra, a partir dos eventos do ProgressTracker, quando cada etapa começou e terminou.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = {}
+
+    def __call__(self, event):
+        if event["type"] != "stage":
+            return
+        now = time.monotonic() - self.started
+        stage = self.stages.setdefault(event["stage"], {"start": now, "end": None})
+        if event["total"] and event["done"] >= event["total"]:
+            stage["end"] = now
+
+    def report(self):
+        stages = {name: {"start": round(data["start"], 3),
+                         "seconds": round(data["end"] - data["start"], 3) if data["end"] is not None else None}
+                  for name, data in self.stages.items()}
+        groups = {}
+        for group, names in STAGE_GROUPS.items():
+            spans = [self.stages[name] for name in names if name in self.stages]
+            if spans and all(span["end"] is not None for span in spans):
+                groups[group] = round(max(span["end"] for span in spans) - min(span["start"] for span in spans), 3)
+            else:
+                groups[group] = None
+        return groups, stages
+
+def _peak_rss_mb(who):
+    # ru_maxrss é informado em KB no Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize_trace(trace_path):
+    """
+    Agrega o trace da execução por função de etapa: chamadas, tempo somado, bytes, tokens e novas tentativas.
+    """
+    calls = {}
+    if not os.path.exists(trace_path):
+        return calls
+    with open(trace_path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            totals = calls.setdefault(entry["function"], {"calls": 0, "errors": 0, "seconds": 0.0})
+            totals["calls"] += 1
+            totals["errors"] += entry["status"] != "ok"
+            totals["seconds"] = round(totals["seconds"] + entry["seconds"], 4)
+            for name in ("bytes_in", "bytes_out", "prompt_tokens", "cached_prompt_tokens", "completion_tokens",
+                         "retries"):
+                if entry.get(name):
+                    totals[name] = totals.get(name, 0) + entry[name]
+    return calls
+
+def preparar_gravacao(minutos, snr_db, formato, seed, data_dir=DATA_DIR):
+    """
+    Gera a gravação sintética, ou reaproveita a já gerada com os mesmos parâmetros.
+    """
+    path = os.path.join(data_dir, f"sintetico_{minutos:g}min_{snr_db:g}db_seed{seed}.{formato}")
+    if not os.path.exists(path):
+        print(f"Gerando gravação sintética de {minutos:g} min em '{path}'...", file=sys.stderr)
+        gerar_audio_sintetico(path, minutos * 60, snr_db, seed, formato=formato)
+    return path
+
+def run_benchmark(minutos=10, formato="mp4", snr_db=15.0, latency_seconds=0.5, error_rate=0.0,
+                  chat_error_rate=0.0, seed=0, verbose=False):
+    """
+    Executa o pipeline completo sobre a gravação sintética com o cliente falso e retorna as medições.
+    O cache de resultados é desviado para um diretório temporário, para que nenhuma etapa seja pulada.
+    """
+    audio_path = preparar_gravacao(minutos, snr_db, formato, seed)
+    fake_client = FakeOpenAI(latency_seconds, error_rate, chat_error_rate, seed)
+    work_dir = tempfile.mkdtemp(prefix="bench_atas_")
+    previous_client = set_client(fake_client)
+    previous_cache_dir = result_cache.set_directory(os.path.join(work_dir, "cache"))
+    previous_trace, tracer.path = tracer.path, os.path.join(work_dir, "trace.jsonl")
+
+    timer = StageTimer()
+    result = {"status": "ok", "error": None}
+    try:
+        manifest = criar_job(os.path.abspath(audio_path), FILE_TYPES[formato], jobs_dir=work_dir)
+        # As mensagens do pipeline vão para stderr, mantendo o JSON sozinho na saída padrão
+        with open(os.devnull, "w") as devnull, redirect_stdout(sys.stderr if verbose else devnull):
+            run_job(manifest, ProgressTracker(on_event=timer))
+        result["segments"] = len(manifest.get_output("segmentacao"))
+    except Exception as e:
+        result.update(status="erro", error=str(e))
+    finally:
+        wall_seconds = time.monotonic() - timer.started
+        set_client(previous_client)
+        result_cache.set_directory(previous_cache_dir)
+        result["calls"] = summarize_trace(tracer.path)
+        tracer.path = previous_trace
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    groups, stages = timer.report()
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {"minutes": minutos, "format": formato, "snr_db": snr_db, "latency_seconds": latency_seconds,
+                   "error_rate": error_rate, "chat_error_rate": chat_error_rate, "seed": seed},
+        **result,
+        "wall_seconds": round(wall_seconds, 3),
+        "peak_rss_mb": {"main": _peak_rss_mb(resource.RUSAGE_SELF),
+                        "children": _peak_rss_mb(resource.RUSAGE_CHILDREN)},
+        "stages": groups,
+        "pipeline_stages": stages,
+        "api": fake_client.stats,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline completo com gravação sintética e API falsa.")
+    parser.add_argument("--minutos", type=float, default=10, help="Duração da gravação (10 a 240 minutos).")
+    parser.add_argument("--formato", choices=sorted(FORMATS), default="mp4", help="Formato da gravação de entrada.")
+    parser.add_argument("--snr", type=float, default=15.0, help="Relação sinal-ruído da gravação em dB.")
+    parser.add_argument("--latencia", type=float, default=0.5, help="Latência média (s) de cada chamada à API.")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração das transcrições que falham com 429.")
+    parser.add_argument("--taxa-erro-chat", type=float, default=0.0, help="Fração das chamadas de chat que falham.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--saida", help="Arquivo onde o resultado JSON também é salvo.")
+    parser.add_argument("--verbose", action="store_true", help="Exibe as mensagens do pipeline em stderr.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.minutos, args.formato, args.snr, args.latencia, args.taxa_erro,
+                           args.taxa_erro_chat, args.seed, args.verbose)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.saida:
+        os.makedirs(os.path.dirname(args.saida) or ".", exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente falso da OpenAI para rodar o pipeline sem rede nos benchmarks.
+
+Imita as partes do AsyncOpenAI usadas em api_client (audio.transcriptions.create e
+chat.completions.create, com e sem streaming), com latência e taxa de erro configuráveis.
+Os erros simulados têm status 429, como um limite de requisições da API real.
+"""
+import os
+import json
+import random
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from audio_encoding import UPLOAD_CODECS, upload_bytes_per_second
+
+WORDS_PER_SECOND = 2.5  # Ritmo de fala usado para dimensionar as transcrições falsas
+RESPONSE_WORDS = 300  # Palavras de cada resposta de chat
+STREAM_CHUNK_WORDS = 5  # Palavras por trecho nas respostas em streaming
+VOCABULARY = ("reunião projeto prazo equipe cliente proposta orçamento entrega relatório decisão "
+              "responsável próxima etapa aprovado revisar contrato sistema dados análise meta "
+              "o a de que para com uma foi será ficou definido então também sobre").split()
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code=429):
+        super().__init__(f"Erro simulado da API ({status_code})")
+        self.status_code = status_code
+        self.response = None
+
+class FakeOpenAI:
+    """
+    :param latency_seconds: latência média de cada chamada (varia ±25%).
+    :param error_rate: fração das transcrições que falham com 429.
+    :param chat_error_rate: fração das chamadas de chat que falham com 429.
+    """
+
+    def __init__(self, latency_seconds=0.5, error_rate=0.0, chat_error_rate=0.0, seed=0):
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.chat_error_rate = chat_error_rate
+        self.stats = {"transcription_calls": 0, "transcription_errors": 0, "chat_calls": 0, "chat_errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._transcribe))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    def _call(self, kind, error_rate):
+        with self._lock:
+            self.stats[f"{kind}_calls"] += 1
+            delay = self.latency_seconds * self._random.uniform(0.75, 1.25)
+            failed = self._random.random() < error_rate
+            if failed:
+                self.stats[f"{kind}_errors"] += 1
+        return delay, failed
+
+    def _text(self, n_words):
+        with self._lock:
+            words = [self._random.choice(VOCABULARY) for _ in range(max(n_words, 1))]
+        sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        return " ".join(sentences)
+
+    async def _transcribe(self, model, file, language=None, **kwargs):
+        file_name, audio_bytes = file
+        delay, failed = self._call("transcription", self.error_rate)
+        await asyncio.sleep(delay)
+        if failed:
+            raise FakeAPIError()
+        # O tamanho do texto acompanha a duração do áudio, estimada pelo codec do arquivo enviado
+        codec = next((name for name, spec in UPLOAD_CODECS.items()
+                      if spec["ext"] == os.path.splitext(file_name)[1].lstrip(".")), "wav")
+        seconds = len(audio_bytes) / upload_bytes_per_second(codec)
+        text = self._text(int(seconds * WORDS_PER_SECOND))
+        if kwargs.get("response_format") != "verbose_json":
+            return SimpleNamespace(text=text)
+
+        # Com verbose_json, cada sentença vira um trecho, com as palavras distribuídas uniformemente no tempo
+        sentences = text.split(". ")
+        step = seconds / max(len(text.split()), 1)
+        segments, words, position = [], [], 0.0
+        for sentence in sentences:
+            start = position
+            for word in sentence.split():
+                words.append(SimpleNamespace(start=position, end=position + step, word=word))
+                position += step
+            segments.append(SimpleNamespace(start=start, end=position, text=" " + sentence, avg_logprob=-0.2))
+        granularities = kwargs.get("timestamp_granularities") or ["segment"]
+        return SimpleNamespace(text=text, segments=segments, words=words if "word" in granularities else None)
+
+    async def _chat(self, model, messages, temperature=None, stream=False, **kwargs):
+        delay, failed = self._call("chat", self.chat_error_rate)
+        if failed:
+            await asyncio.sleep(delay)
+            raise FakeAPIError()
+        content = self._text(RESPONSE_WORDS)
+        if kwargs.get("response_format") or "JSON" in messages[0]["content"]:
+            # Chamada combinada das saídas finais: as duas saídas em um objeto JSON
+            content = json.dumps({"resumo_extenso": content, "ata_consolidada": self._text(RESPONSE_WORDS)},
+                                 ensure_ascii=False)
+        # Consumo de tokens estimado pelo número de palavras, como no relatório de uso da API real
+        usage = SimpleNamespace(prompt_tokens=sum(len(m["content"].split()) for m in messages) * 4 // 3,
+                                completion_tokens=RESPONSE_WORDS * 4 // 3)
+        if not stream:
+            await asyncio.sleep(delay)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+        include_usage = (kwargs.get("stream_options") or {}).get("include_usage")
+        return self._stream(content, delay, usage if include_usage else None)
+
+    async def _stream(self, content, delay, usage=None):
+        words = content.split(" ")
+        chunks = [" ".join(words[i:i + STREAM_CHUNK_WORDS]) + " " for i in range(0, len(words), STREAM_CHUNK_WORDS)]
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))], usage=None)
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)
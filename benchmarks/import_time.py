@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Mede o tempo de inicialização: a importação dos pontos de entrada (CLI, worker e os módulos da aplicação)
+em um interpretador novo, quais dependências pesadas cada um carrega e o custo do aquecimento de um worker.
+Serve para acompanhar regressões: com --limite-ms, termina com erro se alguma importação passar do limite.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.import_time [--repeticoes 5] [--aquecimento] [--limite-ms 500] [--json]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Pontos de entrada medidos (a aplicação Streamlit não pode ser importada fora do servidor; medem-se seus módulos)
+ENTRY_POINTS = {
+    "main": "main",
+    "worker": "worker",
+    "app (módulos)": "model_functions, pdf_generator, job_workspace, job_runner, job_queue, progress",
+}
+
+# Dependências que não devem ser carregadas na inicialização
+HEAVY_MODULES = ("librosa", "numba", "noisereduce", "scipy", "soundfile", "pydub", "openai", "httpx",
+                 "reportlab", "pyarrow", "torch", "speechbrain", "faster_whisper")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import sys, time, json
+inicio = time.perf_counter()
+import {modules}
+importacao = time.perf_counter() - inicio
+aquecimento = None
+if {warm}:
+    from warmup import warm_up_worker
+    aquecimento = warm_up_worker()
+print(json.dumps({{"import_seconds": importacao, "warm_up_seconds": aquecimento,
+                  "heavy": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+def _top_imports(stderr, top):
+    """
+    Maiores tempos próprios (self) do relatório de python -X importtime, em ms.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us) / 1000, name.strip()))
+    return [{"module": name, "self_ms": round(ms, 1)} for ms, name in sorted(rows, reverse=True)[:top]]
+
+def medir(nome, modules, repeticoes, warm=False, top=5):
+    tempos, aquecimentos, stderr, heavy = [], [], "", []
+    code = CHILD.format(modules=modules, warm=warm, heavy=HEAVY_MODULES)
+    for _ in range(repeticoes):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Falha ao importar '{modules}': {proc.stderr.strip().splitlines()[-1]}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        tempos.append(result["import_seconds"])
+        if result["warm_up_seconds"] is not None:
+            aquecimentos.append(result["warm_up_seconds"])
+        stderr, heavy = proc.stderr, result["heavy"]
+    return {
+        "ponto_de_entrada": nome,
+        "modules": modules,
+        "import_ms": round(statistics.median(tempos) * 1000, 1),
+        "warm_up_ms": round(statistics.median(aquecimentos) * 1000, 1) if aquecimentos else None,
+        "heavy_loaded": heavy,
+        "top_imports": _top_imports(stderr, top),
+    }
+
+def run_benchmark(repeticoes, aquecimento=False):
+    results = [medir(nome, modules, repeticoes) for nome, modules in ENTRY_POINTS.items()]
+    if aquecimento:
+        results.append(medir("worker aquecido", "worker", 1, warm=True))
+    return {"python": sys.version.split()[0], "repeticoes": repeticoes, "results": results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do tempo de importação dos pontos de entrada.")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Interpretadores novos por ponto de entrada (mediana).")
+    parser.add_argument("--aquecimento", action="store_true",
+                        help="Mede também o aquecimento de um worker (requer as dependências instaladas).")
+    parser.add_argument("--limite-ms", type=float, help="Falha se a importação de algum ponto de entrada passar disto.")
+    parser.add_argument("--json", action="store_true", help="Emite o resultado em JSON.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.repeticoes, args.aquecimento)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"Python {report['python']}, mediana de {report['repeticoes']} execuções")
+        print(f"{'ponto de entrada':<18} {'importação (ms)':>16} {'aquecimento (ms)':>17}  dependências pesadas")
+        for r in report["results"]:
+            warm = f"{r['warm_up_ms']:.0f}" if r["warm_up_ms"] is not None else "-"
+            print(f"{r['ponto_de_entrada']:<18} {r['import_ms']:>16.0f} {warm:>17}  {', '.join(r['heavy_loaded']) or '-'}")
+            print("    " + ", ".join(f"{t['module']} {t['self_ms']:.0f}" for t in r["top_imports"]))
+
+    if args.limite_ms is not None:
+        lentos = [r["ponto_de_entrada"] for r in report["results"]
+                  if r["warm_up_ms"] is None and r["import_ms"] > args.limite_ms]
+        if lentos:
+            print(f"Importação acima de {args.limite_ms:.0f} ms: {', '.join(lentos)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Mede a geração do PDF para atas muito longas: o procedimento anterior (fontes registradas e estilos
+criados a cada documento e a cada marcador) comparado ao PdfRenderer reaproveitado, gravando em arquivo
+e em memória.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.pdf_render [--linhas 20000] [--documentos 5] [--json]
+"""
+import os
+import io
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.lib.enums import TA_JUSTIFY
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from pdf_generator import PdfRenderer, FONTS
+
+PALAVRAS = ("reunião orçamento equipe prazo entrega cliente projeto decisão responsável meta relatório "
+            "contrato revisão indicador trimestre proposta aprovação cronograma risco plano").split()
+
+def gerar_ata_longa(linhas, seed=0):
+    """
+    Texto no formato das atas geradas: seções numeradas, marcadores e parágrafos.
+    """
+    rng = random.Random(seed)
+    texto = []
+    for i in range(linhas):
+        frase = " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(8, 40))).capitalize() + "."
+        if i % 200 == 0:
+            texto.append(f"{(i // 200) % 3 + 1}. Principais Tópicos")
+        elif i % 3 == 0:
+            texto.append(f"● {frase}")
+        else:
+            texto.append(frase)
+    return "\n".join(texto)
+
+def render_legado(full_summary, aggregated_minutes, output):
+    """
+    Procedimento anterior de gerar_pdf_resumo_ata, mantido aqui como referência.
+    """
+    for name, path in FONTS.items():
+        pdfmetrics.registerFont(TTFont(name, path))
+    doc = SimpleDocTemplate(output, pagesize=A4, leftMargin=50, rightMargin=50, topMargin=50, bottomMargin=50)
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='Centered', fontSize=11, fontName='Arial', alignment=1, spaceAfter=6))
+    styles.add(ParagraphStyle(name='CustomTitle', fontSize=14, fontName='Arial-Bold', alignment=1, spaceAfter=12))
+    styles.add(ParagraphStyle(name='SubTitle', fontSize=14, fontName='Arial-Bold', alignment=1, spaceAfter=12))
+    styles.add(ParagraphStyle(name='Justified', parent=styles['Normal'], alignment=TA_JUSTIFY, spaceAfter=6))
+    story = [Paragraph("Data: 01/01/2024 00:00:00", styles['Centered']), Spacer(1, 20)]
+    for titulo, texto in (("Resumo Extenso e Detalhado", full_summary), ("Ata Consolidada", aggregated_minutes)):
+        story.append(Paragraph(titulo, styles['CustomTitle']))
+        story.append(Spacer(1, 12))
+        for linha in texto.split("\n"):
+            if linha.startswith("1.") or linha.startswith("2.") or linha.startswith("3."):
+                story.append(Paragraph(linha, styles['SubTitle']))
+            elif linha.strip().startswith("●"):
+                story.append(Paragraph(linha, ParagraphStyle('Bullet', parent=styles['Justified'], leftIndent=20)))
+            else:
+                story.append(Paragraph(linha, styles['Justified']))
+    doc.build(story)
+
+def medir(nome, documentos, render):
+    tempos = []
+    for _ in range(documentos):
+        inicio = time.perf_counter()
+        tamanho = render()
+        tempos.append(time.perf_counter() - inicio)
+    return {"modo": nome, "documentos": documentos, "total_seconds": round(sum(tempos), 3),
+            "primeiro_seconds": round(tempos[0], 3), "medio_seconds": round(sum(tempos) / len(tempos), 3),
+            "bytes": tamanho}
+
+def run_benchmark(linhas, documentos, seed=0):
+    resumo = gerar_ata_longa(linhas // 2, seed)
+    ata = gerar_ata_longa(linhas - linhas // 2, seed + 1)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "resumo_e_ata.pdf")
+
+        def legado():
+            render_legado(resumo, ata, caminho)
+            return os.path.getsize(caminho)
+
+        renderer = None
+
+        def arquivo():
+            nonlocal renderer
+            renderer = renderer or PdfRenderer()
+            renderer.render(resumo, ata, caminho)
+            return os.path.getsize(caminho)
+
+        def memoria():
+            buffer = io.BytesIO()
+            renderer.render(resumo, ata, buffer)
+            return len(buffer.getvalue())
+
+        # O renderizador é medido primeiro, para que o registro das fontes entre no seu primeiro documento
+        results = [medir("renderizador_arquivo", documentos, arquivo), medir("renderizador_memoria", documentos, memoria),
+                   medir("legado", documentos, legado)]
+    return {"linhas": linhas, "caracteres": len(resumo) + len(ata), "results": results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da geração do PDF para atas muito longas.")
+    parser.add_argument("--linhas", type=int, default=20000, help="Linhas somadas do resumo e da ata.")
+    parser.add_argument("--documentos", type=int, default=5, help="Documentos gerados em cada modo.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Emite o resultado em JSON.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.linhas, args.documentos, args.seed)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{report['linhas']} linhas ({report['caracteres'] / 1024:.0f} KB de texto)")
+    print(f"{'modo':<22} {'primeiro (s)':>13} {'médio (s)':>10} {'KB':>8}")
+    for r in report["results"]:
+        print(f"{r['modo']:<22} {r['primeiro_seconds']:>13.3f} {r['medio_seconds']:>10.3f} {r['bytes'] / 1024:>8.0f}")
+
+if __name__ == "__main__":
+    main()
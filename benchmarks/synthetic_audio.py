@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Gera gravações sintéticas de fala com ruído de fundo para os benchmarks.
+
+A "fala" é formada por enunciados de tons harmônicos modulados em amplitude no ritmo
+das sílabas, separados por pausas, o que exercita a segmentação por silêncio e a
+redução de ruído sem depender de gravações reais. O áudio é escrito em blocos,
+então mesmo gravações de horas não são montadas inteiras em memória.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.synthetic_audio saida.wav --minutos 60 [--snr 15] [--formato mp4]
+"""
+import os
+import wave
+import argparse
+
+import numpy as np
+import ffmpeg
+
+SAMPLE_RATE = 16000
+BLOCK_SECONDS = 60  # Áudio gerado e gravado por vez
+SYLLABLE_RATE_HZ = 4.5  # Ritmo aproximado das sílabas na fala
+FORMATS = {"wav": None, "mp3": "libmp3lame", "mp4": "aac"}
+
+def _utterance(rng, duration, sample_rate):
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    f0 = rng.uniform(100, 220) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(0.2, 0.6) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * SYLLABLE_RATE_HZ * t + rng.uniform(0, np.pi)), 0, None)
+    return (voice * syllables).astype(np.float32)
+
+def _speech_blocks(duration_seconds, sample_rate, rng):
+    """
+    Gera a fala em blocos de BLOCK_SECONDS: enunciados de 1 a 8 s separados por pausas de 0,2 a 1,5 s.
+    """
+    total = int(duration_seconds * sample_rate)
+    block_size = BLOCK_SECONDS * sample_rate
+    pending = np.zeros(0, dtype=np.float32)
+    produced = 0
+    while produced < total:
+        while len(pending) < block_size:
+            pause = np.zeros(int(rng.uniform(0.2, 1.5) * sample_rate), dtype=np.float32)
+            pending = np.concatenate([pending, _utterance(rng, rng.uniform(1, 8), sample_rate), pause])
+        size = min(block_size, total - produced)
+        yield pending[:size]
+        pending = pending[size:]
+        produced += size
+
+def gerar_audio_sintetico(output_path, duration_seconds, snr_db=15.0, seed=0, sample_rate=SAMPLE_RATE,
+                          formato="wav"):
+    """
+    Grava uma gravação sintética de duration_seconds com ruído branco na SNR indicada (dB).
+    Formatos diferentes de WAV são convertidos com o ffmpeg (MP4 contém apenas a faixa de áudio).
+    """
+    rng = np.random.default_rng(seed)
+    wav_path = output_path if formato == "wav" else os.path.splitext(output_path)[0] + ".tmp.wav"
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    speech_rms = None
+    with wave.open(wav_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        for block in _speech_blocks(duration_seconds, sample_rate, rng):
+            if speech_rms is None:
+                speech_rms = float(np.sqrt(np.mean(np.square(block)))) or 1.0
+            noise = rng.normal(0, speech_rms / (10 ** (snr_db / 20)), len(block)).astype(np.float32)
+            samples = 0.3 * (block + noise) / (speech_rms * 3)
+            wav_file.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+    if formato != "wav":
+        (
+            ffmpeg.input(wav_path)
+            .output(output_path, acodec=FORMATS[formato], audio_bitrate="64k")
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        os.remove(wav_path)
+    return output_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera uma gravação sintética de fala com ruído.")
+    parser.add_argument("saida", help="Arquivo de saída.")
+    parser.add_argument("--minutos", type=float, default=10, help="Duração da gravação em minutos.")
+    parser.add_argument("--snr", type=float, default=15.0, help="Relação sinal-ruído em dB.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formato", choices=sorted(FORMATS), default="wav")
+    args = parser.parse_args(argv)
+    print(gerar_audio_sintetico(args.saida, args.minutos * 60, args.snr, args.seed, formato=args.formato))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Compara, para cada codec de envio, quantos bytes seriam enviados à API Whisper
+e quantas requisições seriam feitas para uma gravação.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.upload_codec caminho/da/reuniao.mp4 [--bitrate 24] [--json]
+"""
+import argparse
+import json
+import math
+
+import ffmpeg
+
+from audio_encoding import UPLOAD_CODECS, UPLOAD_SAMPLE_RATE, upload_segment_seconds
+
+MAX_SEGMENT_SIZE_MB = 24
+
+def medir_codec(audio_path, duration, codec, bitrate_kbps):
+    """
+    Codifica a gravação inteira no codec informado (sem gravar em disco) e calcula
+    o total de bytes e o número de segmentos/requisições resultantes.
+    """
+    spec = UPLOAD_CODECS[codec]
+    output_kwargs = {"format": spec["format"], "acodec": spec["acodec"], "ac": 1, "ar": str(UPLOAD_SAMPLE_RATE)}
+    if codec != "wav":
+        output_kwargs["audio_bitrate"] = f"{bitrate_kbps}k"
+    encoded, _ = (
+        ffmpeg.input(audio_path)
+        .output("pipe:", vn=None, **output_kwargs)
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    segment_seconds = upload_segment_seconds(MAX_SEGMENT_SIZE_MB, codec, bitrate_kbps)
+    return {
+        "codec": codec,
+        "bitrate_kbps": None if codec == "wav" else bitrate_kbps,
+        "segment_seconds": segment_seconds,
+        "requests": math.ceil(duration / segment_seconds),
+        "bytes_uploaded": len(encoded),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de bytes enviados e requisições por codec de envio.")
+    parser.add_argument("arquivo", help="Gravação de entrada (MP4, MP3 ou WAV).")
+    parser.add_argument("--bitrate", type=int, default=24, help="Taxa de bits (kbps) dos codecs com perda.")
+    parser.add_argument("--json", action="store_true", help="Emite o resultado em JSON.")
+    args = parser.parse_args(argv)
+
+    duration = float(ffmpeg.probe(args.arquivo)["format"]["duration"])
+    results = [medir_codec(args.arquivo, duration, codec, args.bitrate) for codec in UPLOAD_CODECS]
+
+    if args.json:
+        print(json.dumps({"arquivo": args.arquivo, "duration_seconds": duration, "results": results}, indent=2))
+        return
+
+    baseline = next(r for r in results if r["codec"] == "wav")
+    print(f"Duração: {duration / 60:.1f} min")
+    print(f"{'codec':<6} {'MB enviados':>12} {'requisições':>12} {'redução':>9}")
+    for r in results:
+        reduction = baseline["bytes_uploaded"] / max(r["bytes_uploaded"], 1)
+        print(f"{r['codec']:<6} {r['bytes_uploaded'] / (1024 * 1024):>12.2f} {r['requests']:>12} {reduction:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
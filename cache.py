@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Pasta do cache em disco (fora das pastas dos jobs, as únicas limpas ao final; ver folder_delete.py)
+CACHE_DIR = "cache_atas"
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo, lendo-o em blocos.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    Cache em disco endereçado por conteúdo, com remoção LRU por tamanho total e por idade.
+
+    Cada entrada é um arquivo JSON cujo nome é o hash da chave. A data de modificação
+    do arquivo é atualizada a cada leitura e serve como referência de uso para o LRU.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_size_mb=512, max_age_days=30):
+        self.directory = directory
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size_bytes = None
+
+    @staticmethod
+    def make_key(namespace, *parts):
+        """
+        Gera a chave a partir de um namespace e de partes (str ou bytes),
+        como o hash do áudio, modelo, idioma e texto do prompt.
+        """
+        digest = hashlib.sha256(namespace.encode("utf-8"))
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """
+        Retorna o valor armazenado ou None se não houver entrada válida.
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                self._remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["value"]
+            os.utime(path)  # Marca a entrada como usada recentemente
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Armazena o valor (serializável em JSON) e aplica a política de remoção se necessário.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"value": value, "created_at": time.time()}, f, ensure_ascii=False)
+        new_size = os.path.getsize(tmp_path)
+        with self._lock:
+            # Ao sobrescrever uma entrada, conta só a diferença de tamanho
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            os.replace(tmp_path, path)
+            if self._size_bytes is None:
+                self._size_bytes = self._scan_size()
+            else:
+                self._size_bytes += new_size - old_size
+            needs_eviction = self._size_bytes > self.max_size_bytes
+        if needs_eviction:
+            self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def _scan_size(self):
+        return sum(size for _, _, size in self._entries())
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Remove entradas mais antigas que max_age_days e, em seguida, as menos usadas
+        recentemente até que o tamanho total fique abaixo do limite.
+        """
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for path, mtime, size in entries:
+            if now - mtime <= self.max_age_seconds and total <= self.max_size_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size_bytes = total
+        if removed:
+            print(f"Cache: {removed} entradas removidas ({total / (1024 * 1024):.2f} MB restantes).")
+
+    def set_directory(self, directory):
+        """
+        Passa a usar outro diretório (ex: cache temporário dos benchmarks). Retorna o diretório anterior.
+        """
+        with self._lock:
+            previous, self.directory = self.directory, directory
+            self._size_bytes = None
+            self.hits = self.misses = 0
+        return previous
+
+    def stats(self):
+        """
+        Retorna os contadores de acertos e falhas do cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+# Instância compartilhada pelo pipeline
+result_cache = DiskCache()
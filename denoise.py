@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import io
+import numpy as np
+from lazy_imports import lazy_import
+from audio_encoding import encode_for_upload
+from instrumentation import traced
+
+# Importados na primeira redução de ruído (o librosa, com o numba, leva segundos para carregar)
+librosa = lazy_import("librosa")
+nr = lazy_import("noisereduce")
+sf = lazy_import("soundfile")
+
+# Taxa de amostragem usada pelo Whisper; decodificar já nela evita trabalhar com áudio em taxa nativa
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 2048  # Amostras por quadro na estimativa de energia
+NOISE_PERCENTILE = 10  # Quadros abaixo deste percentil de energia são considerados ruído
+SIGNAL_PERCENTILE = 90  # Quadros acima deste percentil de energia são considerados fala
+MAX_NOISE_SECONDS = 10  # Duração máxima do trecho de ruído de referência
+SNR_THRESHOLD_DB = 25.0  # Acima desta SNR estimada o áudio é considerado limpo e a redução é pulada
+CHUNK_SECONDS = 60  # Tamanho dos blocos de STFT processados pelo noisereduce
+
+def load_audio(audio_path, sr=SAMPLE_RATE):
+    """
+    Decodifica o áudio uma única vez em um buffer float32 mono na taxa de amostragem indicada.
+    """
+    audio_data, sr = librosa.load(audio_path, sr=sr, mono=True, dtype=np.float32)
+    return audio_data, sr
+
+def _frame_rms(audio_data):
+    n_frames = len(audio_data) // FRAME_LENGTH
+    if n_frames == 0:
+        return np.sqrt(np.mean(np.square(audio_data), keepdims=True)) if len(audio_data) else np.zeros(1)
+    frames = audio_data[:n_frames * FRAME_LENGTH].reshape(n_frames, FRAME_LENGTH)
+    return np.sqrt(np.mean(np.square(frames), axis=1))
+
+def estimate_snr_db(audio_data):
+    """
+    Estima a relação sinal-ruído (dB) comparando a energia dos quadros mais altos com a dos mais baixos.
+    """
+    rms = _frame_rms(audio_data)
+    noise = np.percentile(rms, NOISE_PERCENTILE)
+    signal = np.percentile(rms, SIGNAL_PERCENTILE)
+    return float(20 * np.log10((signal + 1e-10) / (noise + 1e-10)))
+
+def estimate_noise_profile(audio_data, sr=SAMPLE_RATE):
+    """
+    Extrai um trecho de referência de ruído concatenando os quadros de menor energia do áudio.
+    O resultado é pequeno (no máximo MAX_NOISE_SECONDS) e pode ser reutilizado em todos os segmentos da gravação.
+    """
+    rms = _frame_rms(audio_data)
+    n_frames = len(audio_data) // FRAME_LENGTH
+    if n_frames == 0:
+        return audio_data.copy()
+    threshold = np.percentile(rms, NOISE_PERCENTILE)
+    quiet = np.flatnonzero(rms <= threshold)[:max(1, MAX_NOISE_SECONDS * sr // FRAME_LENGTH)]
+    frames = audio_data[:n_frames * FRAME_LENGTH].reshape(n_frames, FRAME_LENGTH)
+    return np.ascontiguousarray(frames[quiet].ravel())
+
+def denoise_settings(snr_threshold_db=SNR_THRESHOLD_DB):
+    """
+    Parâmetros da estimativa do perfil e da redução de ruído, para compor chaves de cache:
+    alterar qualquer um deles muda o áudio limpo e, portanto, a transcrição.
+    """
+    return (f"sr={SAMPLE_RATE};quadro={FRAME_LENGTH};ruido={NOISE_PERCENTILE};sinal={SIGNAL_PERCENTILE};"
+            f"perfil={MAX_NOISE_SECONDS};snr={snr_threshold_db};bloco={CHUNK_SECONDS};estacionario=1")
+
+def reduce_noise(audio_data, sr=SAMPLE_RATE, noise_profile=None, snr_threshold_db=SNR_THRESHOLD_DB):
+    """
+    Reduz o ruído do buffer em blocos de STFT, usando o perfil de ruído informado.
+    Se a SNR estimada já estiver acima do limite, o buffer é devolvido sem processamento.
+
+    :return: tupla (áudio, redução aplicada).
+    """
+    if snr_threshold_db is not None and estimate_snr_db(audio_data) >= snr_threshold_db:
+        return audio_data, False
+
+    if noise_profile is None:
+        noise_profile = estimate_noise_profile(audio_data, sr)
+
+    reduced = nr.reduce_noise(y=audio_data, sr=sr, y_noise=noise_profile, stationary=True,
+                              chunk_size=CHUNK_SECONDS * sr, n_jobs=1)
+    return reduced.astype(np.float32, copy=False), True
+
+def encode_wav(audio_data, sr=SAMPLE_RATE):
+    """
+    Codifica o buffer como WAV PCM 16 bits em memória.
+    """
+    buffer = io.BytesIO()
+    sf.write(buffer, audio_data, sr, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+@traced("denoise", paths=("audio_path",))
+def denoise_file_to_bytes(audio_path, noise_profile=None, snr_threshold_db=SNR_THRESHOLD_DB, codec="wav"):
+    """
+    Decodifica o arquivo, reduz o ruído e devolve o áudio resultante em bytes, sem gravar em disco,
+    já codificado no codec de envio informado (ver audio_encoding.UPLOAD_CODECS).
+    Executado nos processos do pool de CPU do pipeline.
+    """
+    audio_data, sr = load_audio(audio_path)
+    reduced, applied = reduce_noise(audio_data, sr, noise_profile, snr_threshold_db)
+    if applied:
+        print(f"Ruído reduzido: {audio_path}")
+    else:
+        print(f"SNR adequada, redução de ruído dispensada: {audio_path}")
+    return encode_for_upload(encode_wav(reduced, sr), codec)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+
+from cache import result_cache, hash_file
+from denoise import load_audio, SAMPLE_RATE
+from audio_segmenter import SILENCE_THRESHOLD_DBFS
+from transcript_store import _map_times, speaker_label
+from instrumentation import traced, bind_job
+from lazy_imports import lazy_import
+
+librosa = lazy_import("librosa")
+# Sem o speechbrain, as vozes são comparadas por estatísticas de MFCC; o torch só é importado ao carregar o modelo
+speechbrain = lazy_import("speechbrain", optional=True)
+torch = lazy_import("torch", optional=True)
+
+# Identificação dos falantes, em paralelo com a transcrição (opcional: "1" ativa)
+DIARIZATION_ENABLED = os.environ.get("ATAS_DIARIZACAO", "0") == "1"
+
+# Janelas de voz comparadas entre si
+WINDOW_SECONDS = 1.5
+HOP_SECONDS = 0.75
+N_MFCC = 20
+EMBEDDING_BATCH_SIZE = 64  # Janelas processadas juntas pelo modelo de embeddings
+ECAPA_MODEL = "speechbrain/spkrec-ecapa-voxceleb"
+
+# Distância de cosseno máxima para que duas vozes sejam consideradas do mesmo falante, por tipo de embedding
+DISTANCE_THRESHOLDS = {"ecapa": 0.45, "mfcc": 0.35}
+MAX_SPEAKERS = 10
+MIN_TURN_SECONDS = 1.0  # Turnos mais curtos (ex: interjeições sobrepostas) são absorvidos pelos vizinhos
+
+def embedding_backend():
+    return "ecapa" if speechbrain is not None else "mfcc"
+
+# Modelo de embeddings carregado uma vez por processo
+_encoder = None
+
+def _load_encoder():
+    global _encoder
+    if _encoder is None:
+        print(f"Carregando o modelo de embeddings de voz '{ECAPA_MODEL}' no processo {os.getpid()}...")
+        from speechbrain.inference.speaker import EncoderClassifier
+        _encoder = EncoderClassifier.from_hparams(source=ECAPA_MODEL, run_opts={"device": "cpu"})
+    return _encoder
+
+def _windows(n_samples, sr):
+    window, hop = int(WINDOW_SECONDS * sr), int(HOP_SECONDS * sr)
+    if n_samples < window:
+        return np.array([0]), window
+    return np.arange(0, n_samples - window + 1, hop), window
+
+def _mfcc_embeddings(audio, sr, starts, window):
+    """
+    Média e desvio padrão dos MFCCs (sem o coeficiente de energia) em cada janela, calculados
+    sobre um único MFCC do segmento inteiro e somas acumuladas.
+    """
+    hop_length = sr // 100
+    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=N_MFCC + 1, n_fft=hop_length * 4, hop_length=hop_length)[1:].T
+    cumsum = np.vstack([np.zeros((1, mfcc.shape[1])), np.cumsum(mfcc, axis=0)])
+    cumsum_sq = np.vstack([np.zeros((1, mfcc.shape[1])), np.cumsum(mfcc ** 2, axis=0)])
+    first = np.minimum(starts // hop_length, len(mfcc) - 1)
+    last = np.minimum(first + max(window // hop_length, 1), len(mfcc))
+    count = (last - first)[:, None]
+    mean = (cumsum[last] - cumsum[first]) / count
+    std = np.sqrt(np.maximum((cumsum_sq[last] - cumsum_sq[first]) / count - mean ** 2, 0))
+    return np.hstack([mean, std]).astype(np.float32)
+
+def _ecapa_embeddings(audio, starts, window):
+    encoder = _load_encoder()
+    embeddings = []
+    for i in range(0, len(starts), EMBEDDING_BATCH_SIZE):
+        batch = np.stack([np.pad(audio[s:s + window], (0, max(0, s + window - len(audio))))
+                          for s in starts[i:i + EMBEDDING_BATCH_SIZE]])
+        with torch.no_grad():
+            embeddings.append(encoder.encode_batch(torch.from_numpy(batch)).squeeze(1).numpy())
+    return np.vstack(embeddings).astype(np.float32)
+
+@traced("diarization_embeddings", paths=("segment_path",))
+def segment_embeddings(segment_path, backend=None):
+    """
+    Calcula os embeddings de voz das janelas com fala de um segmento, em lotes.
+    Retorna (tempos [início, fim] de cada janela no segmento, embeddings) como listas.
+    """
+    backend = backend or embedding_backend()
+    audio, sr = load_audio(segment_path, SAMPLE_RATE)
+    starts, window = _windows(len(audio), sr)
+
+    # Janelas em silêncio não identificam ninguém
+    threshold = 10 ** (SILENCE_THRESHOLD_DBFS / 20)
+    rms = np.array([np.sqrt(np.mean(np.square(audio[s:s + window]))) if len(audio) else 0.0 for s in starts])
+    starts = starts[rms >= threshold]
+    if not len(starts):
+        return [], []
+
+    if backend == "ecapa":
+        embeddings = _ecapa_embeddings(audio, starts, window)
+    else:
+        embeddings = _mfcc_embeddings(audio, sr, starts, window)
+    times = np.stack([starts / sr, np.minimum(starts + window, len(audio)) / sr], axis=1)
+    return times.round(3).tolist(), embeddings.tolist()
+
+def _normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-8)
+
+def _leader_clusters(embeddings, threshold):
+    """
+    Agrupamento incremental das janelas de um segmento: cada janela entra no grupo mais próximo
+    ou abre um novo. Retorna (rótulo de cada janela, centróides).
+    """
+    labels = np.empty(len(embeddings), dtype=np.int32)
+    sums, counts = [], []
+    for i, vector in enumerate(embeddings):
+        if sums:
+            centroids = _normalize(np.array(sums))
+            distances = 1 - centroids @ vector
+            best = int(np.argmin(distances))
+            if distances[best] <= threshold:
+                sums[best] += vector
+                counts[best] += 1
+                labels[i] = best
+                continue
+        sums.append(vector.copy())
+        counts.append(1)
+        labels[i] = len(sums) - 1
+    return labels, np.array(sums), np.array(counts)
+
+def _merge_clusters(sums, counts, threshold, max_speakers):
+    """
+    Agrupamento aglomerativo dos grupos de todos os segmentos (por centróide, ponderado pelo tamanho),
+    até que a menor distância passe do limite e haja no máximo max_speakers falantes.
+    Retorna o falante de cada grupo, numerados por ordem de tamanho.
+
+    A matriz de distâncias é calculada uma vez e, a cada junção, só a linha do grupo resultante é
+    recalculada; o vizinho mais próximo de cada grupo é mantido e refeito apenas quando muda.
+    """
+    n = len(sums)
+    sums = np.array(sums, dtype=np.float64)
+    centroids = _normalize(sums)
+    distances = 1 - centroids @ centroids.T
+    np.fill_diagonal(distances, np.inf)
+    nearest = np.argmin(distances, axis=1)
+    rows = np.arange(n)
+    groups = [[i] for i in range(n)]
+    active = np.ones(n, dtype=bool)
+    remaining = n
+    while remaining > 1:
+        a = int(np.argmin(distances[rows, nearest]))
+        b = int(nearest[a])
+        if distances[a, b] > threshold and remaining <= max_speakers:
+            break
+        a, b = min(a, b), max(a, b)
+        groups[a] += groups[b]
+        groups[b] = []
+        active[b] = False
+        sums[a] += sums[b]
+        centroids[a] = _normalize(sums[a:a + 1])[0]
+        remaining -= 1
+
+        distances[b, :] = np.inf
+        distances[:, b] = np.inf
+        row = 1 - centroids @ centroids[a]
+        row[~active] = np.inf
+        row[a] = np.inf
+        distances[a, :] = row
+        distances[:, a] = row
+        stale = (nearest == a) | (nearest == b)
+        nearest[stale] = np.argmin(distances[stale], axis=1)
+        closer = row < distances[rows, nearest]
+        nearest[closer] = a
+        nearest[a] = np.argmin(row)
+
+    groups = [group for group in groups if group]
+    sizes = [sum(counts[i] for i in group) for group in groups]
+    speaker_of = np.empty(len(counts), dtype=np.int32)
+    for speaker, g in enumerate(sorted(range(len(groups)), key=lambda g: -sizes[g])):
+        speaker_of[groups[g]] = speaker
+    return speaker_of
+
+def _turns(times, speakers, min_turn_seconds):
+    """
+    Junta janelas consecutivas do mesmo falante em turnos [início, fim, falante], absorvendo turnos curtos.
+    """
+    order = np.argsort(times[:, 0], kind="stable")
+    turns = []
+    for (start, end), speaker in zip(times[order], speakers[order]):
+        if turns and turns[-1][2] == speaker and start <= turns[-1][1] + HOP_SECONDS:
+            turns[-1][1] = max(turns[-1][1], end)
+        else:
+            turns.append([float(start), float(end), int(speaker)])
+
+    merged = []
+    for turn in turns:
+        if merged and (turn[1] - turn[0] < min_turn_seconds or turn[2] == merged[-1][2]):
+            merged[-1][1] = max(merged[-1][1], turn[1])
+        else:
+            merged.append(turn)
+    # Turnos sobrepostos (janelas com passo menor que a duração) terminam onde começa o seguinte
+    for previous, turn in zip(merged, merged[1:]):
+        previous[1] = min(previous[1], turn[0])
+    return [[round(float(start), 2), round(float(end), 2), speaker] for start, end, speaker in merged]
+
+def diarize_segments(segments, timelines, pool=None, progress=None, log=print, max_speakers=MAX_SPEAKERS):
+    """
+    Identifica os falantes da gravação a partir dos segmentos de áudio: embeddings de voz por janela
+    (em paralelo no pool de processos), agrupamento dentro de cada segmento e, em seguida, entre
+    os segmentos. O resultado é guardado no cache por gravação.
+
+    Retorna o índice de turnos {"speakers": [rótulos], "turns": [[início, fim, falante], ...]},
+    com os tempos na gravação original (ver audio_segmenter.segment_timelines).
+    """
+    backend = embedding_backend()
+    threshold = DISTANCE_THRESHOLDS[backend]
+    # A chave inclui as janelas de voz e a duração mínima dos turnos, que também alteram o resultado
+    settings = (WINDOW_SECONDS, HOP_SECONDS, N_MFCC, MIN_TURN_SECONDS, threshold, max_speakers)
+    cache_key = result_cache.make_key("diarizacao", backend, *(str(value) for value in settings),
+                                      *(hash_file(path) for path in segments))
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        log("Falantes encontrados no cache.")
+        if progress:
+            progress.start_stage("diarizacao", total=len(segments), done=len(segments))
+        return cached
+
+    if progress:
+        progress.start_stage("diarizacao", total=len(segments))
+    if pool is not None:
+        futures = [pool.submit(bind_job(segment_embeddings), path, backend) for path in segments]
+        results = []
+        for future in futures:
+            results.append(future.result())
+            if progress:
+                progress.advance("diarizacao")
+    else:
+        results = []
+        for path in segments:
+            results.append(segment_embeddings(path, backend))
+            if progress:
+                progress.advance("diarizacao")
+
+    all_embeddings = [np.array(embeddings, dtype=np.float32) for _, embeddings in results if embeddings]
+    if not all_embeddings:
+        index = {"speakers": [], "turns": []}
+        result_cache.set(cache_key, index)
+        return index
+
+    # Estatísticas de MFCC dependem do canal; a média da gravação é subtraída antes da comparação
+    mean = np.vstack(all_embeddings).mean(axis=0) if backend == "mfcc" else 0
+
+    times, local_labels, sums, counts = [], [], [], []
+    for (segment_times, embeddings), timeline in zip(results, timelines):
+        if not embeddings:
+            continue
+        vectors = _normalize(np.array(embeddings, dtype=np.float32) - mean)
+        labels, segment_sums, segment_counts = _leader_clusters(vectors, threshold)
+        segment_times = np.array(segment_times)
+        times.append(np.stack([_map_times(timeline["timeline"], segment_times[:, 0]),
+                               _map_times(timeline["timeline"], segment_times[:, 1])], axis=1))
+        local_labels.append(labels + len(sums))
+        sums.extend(segment_sums)
+        counts.extend(segment_counts)
+
+    speaker_of = _merge_clusters(sums, np.array(counts), threshold, max_speakers)
+    speakers = speaker_of[np.concatenate(local_labels)]
+    turns = _turns(np.vstack(times), speakers, MIN_TURN_SECONDS)
+    n_speakers = int(speakers.max()) + 1
+    index = {"speakers": [speaker_label(s) for s in range(n_speakers)], "turns": turns}
+    log(f"{n_speakers} falante(s) identificado(s) em {len(turns)} turnos.")
+    result_cache.set(cache_key, index)
+    return index
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import threading
+import inspect
+import functools
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Sem o módulo resource (ex: Windows), o pico de memória não é registrado
+    resource = None
+
+from job_workspace import JOBS_DIR
+
+# Arquivo JSON-lines com um registro por chamada de etapa; vazio desativa o trace
+TRACE_FILE = os.environ.get("ATAS_TRACE_FILE", os.path.join(JOBS_DIR, "trace.jsonl"))
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+_open_spans = contextvars.ContextVar("open_spans", default=())
+_job_totals = {}  # Valores de record() somados por job (ex: tokens), ver job_usage
+_job_totals_lock = threading.Lock()
+
+def _rss_mb():
+    """
+    Memória residente atual do processo (MB), lida de /proc no Linux.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss é informado em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _size_of(value):
+    """
+    Tamanho em bytes de uma entrada ou saída de etapa: bytes, texto e listas deles.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sum(_size_of(item) for item in value)
+    return 0
+
+def _path_size(value):
+    """
+    Tamanho em bytes de um argumento declarado como caminho: o do arquivo (ou a soma, para listas de caminhos).
+    Valores que não são caminhos (ex: áudio em bytes) são medidos como em _size_of.
+    """
+    if isinstance(value, (str, os.PathLike)):
+        return os.path.getsize(value) if os.path.isfile(value) else 0
+    if isinstance(value, (list, tuple)):
+        return sum(_path_size(item) for item in value)
+    return _size_of(value)
+
+class Metrics:
+    """
+    Agregados por etapa (chamadas, tempo, bytes, tokens e novas tentativas) expostos no formato do Prometheus.
+    Cada processo mantém seus próprios contadores; as etapas executadas em pools de processos
+    aparecem apenas no trace.
+    """
+
+    COUNTERS = ("seconds", "bytes_in", "bytes_out", "prompt_tokens", "cached_prompt_tokens", "completion_tokens",
+                "retries")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._totals = {}
+
+    def observe(self, record):
+        with self._lock:
+            key = (record["stage"], record["status"])
+            self._calls[key] = self._calls.get(key, 0) + 1
+            for counter in self.COUNTERS:
+                if record.get(counter):
+                    totals_key = (record["stage"], counter)
+                    self._totals[totals_key] = self._totals.get(totals_key, 0) + record[counter]
+
+    def render(self):
+        lines = ["# TYPE atas_stage_calls_total counter"]
+        with self._lock:
+            for (stage, status), count in sorted(self._calls.items()):
+                lines.append(f'atas_stage_calls_total{{stage="{stage}",status="{status}"}} {count}')
+            for counter in self.COUNTERS:
+                lines.append(f"# TYPE atas_stage_{counter}_total counter")
+                for (stage, name), total in sorted(self._totals.items()):
+                    if name == counter:
+                        lines.append(f'atas_stage_{counter}_total{{stage="{stage}"}} {total:g}')
+        peak = _peak_rss_mb()
+        if peak is not None:
+            lines.append("# TYPE atas_peak_rss_bytes gauge")
+            lines.append(f"atas_peak_rss_bytes {int(peak * 1024 * 1024)}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class Tracer:
+    """
+    Grava os registros das etapas em um arquivo JSON-lines, uma linha por chamada.
+    As linhas são curtas e abertas em modo append, então vários processos podem compartilhar o arquivo.
+    """
+
+    def __init__(self, path=TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        if not self.path:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+tracer = Tracer()
+
+@contextmanager
+def job_context(job_id):
+    """
+    Associa os registros gerados dentro do bloco (na thread atual) ao job informado.
+    """
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+def current_job():
+    return _current_job.get()
+
+def _run_in_job(job_id, fn, *args, **kwargs):
+    with job_context(job_id):
+        return fn(*args, **kwargs)
+
+def bind_job(fn):
+    """
+    Envolve fn para que, executada em outra thread ou processo de um pool, seus registros
+    continuem associados ao job atual. O resultado pode ser enviado a pools de processos.
+    """
+    return functools.partial(_run_in_job, current_job(), fn)
+
+def record(**values):
+    """
+    Soma valores (ex: prompt_tokens, retries) ao registro da etapa mais interna em andamento na thread atual
+    e aos totais do job atual. Os valores de uma etapa aninhada não se repetem na etapa que a chamou.
+    """
+    job = current_job()
+    if job is not None:
+        with _job_totals_lock:
+            totals = _job_totals.setdefault(job, {})
+            for name, value in values.items():
+                totals[name] = totals.get(name, 0) + value
+    spans = _open_spans.get()
+    if spans:
+        span = spans[-1]
+        for name, value in values.items():
+            span[name] = span.get(name, 0) + value
+
+def job_usage(job_id, clear=False):
+    """
+    Totais registrados com record() para o job neste processo (ex: {"prompt_tokens": ..., "completion_tokens": ...}).
+    Com clear=True, os totais do job são descartados após a leitura.
+    """
+    with _job_totals_lock:
+        totals = _job_totals.pop(job_id, {}) if clear else dict(_job_totals.get(job_id, {}))
+    return totals
+
+def traced(stage, paths=(), returns_paths=False):
+    """
+    Decorador que registra, a cada chamada da função de etapa, a duração, a memória,
+    os bytes de entrada e saída e os valores somados com record() (tokens, novas tentativas).
+
+    :param paths: nomes dos parâmetros que são caminhos de arquivo, medidos pelo tamanho do arquivo;
+        os demais textos são medidos pelo próprio conteúdo, sem acessar o disco.
+    :param returns_paths: a função retorna um caminho (ou lista de caminhos) de arquivo.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn) if paths else None
+
+        def bytes_in(args, kwargs):
+            if signature is None:
+                return sum(_size_of(value) for value in (*args, *kwargs.values()))
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            return sum(_path_size(value) if name in paths else _size_of(value)
+                       for name, value in arguments.items())
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            span = {"bytes_in": bytes_in(args, kwargs)}
+            token = _open_spans.set(_open_spans.get() + (span,))
+            rss_before = _rss_mb()
+            started = time.perf_counter()
+            status, error, result = "ok", None, None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            except Exception as e:
+                status, error = "error", str(e)
+                raise
+            finally:
+                seconds = time.perf_counter() - started
+                _open_spans.reset(token)
+                rss_after = _rss_mb()
+                entry = {
+                    "ts": time.time(),
+                    "job": current_job(),
+                    "stage": stage,
+                    "function": fn.__name__,
+                    "pid": os.getpid(),
+                    "thread": threading.current_thread().name,
+                    "status": status,
+                    "error": error,
+                    "seconds": round(seconds, 4),
+                    "bytes_out": _path_size(result) if returns_paths else _size_of(result),
+                    "rss_mb": round(rss_after, 1) if rss_after is not None else None,
+                    "rss_delta_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+                    "peak_rss_mb": round(_peak_rss_mb(), 1) if resource is not None else None,
+                    **span,
+                }
+                tracer.write(entry)
+                metrics.observe(entry)
+        return wrapper
+    return decorator
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Expõe os agregados do processo em http://host:port/metrics, no formato de texto do Prometheus.
+    Por padrão só aceita conexões locais; use host="0.0.0.0" para expor a outras máquinas.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Métricas disponíveis em http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+
+from job_workspace import JOBS_DIR, criar_job
+
+QUEUE_DB = os.path.join(JOBS_DIR, "queue.db")
+
+# Estados possíveis de um job na fila
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_file TEXT,
+    file_type TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    worker TEXT,
+    pdf_path TEXT,
+    error TEXT,
+    progress TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+class JobQueue:
+    """
+    Fila persistente de jobs em SQLite, compartilhada entre a aplicação (que enfileira e consulta)
+    e os processos de worker (que reservam e executam os jobs).
+    """
+
+    def __init__(self, db_path=QUEUE_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, input_file=None, file_type=None, manifest=None):
+        """
+        Enfileira um job. Sem um manifesto já criado, um novo diretório de trabalho é criado para ele.
+        Retorna o manifesto do job.
+        """
+        manifest = manifest or criar_job(input_file, file_type)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, input_file, file_type, created_at) VALUES (?, ?, ?, ?, ?)",
+                (manifest.job_id, QUEUED, manifest.data["input_file"], manifest.data["file_type"], time.time()))
+        return manifest
+
+    def claim(self, worker_id):
+        """
+        Reserva atomicamente o job mais antigo da fila para o worker. Retorna o job_id ou None.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                               (QUEUED,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute("UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                         (RUNNING, worker_id, now, now, row["job_id"]))
+            conn.execute("COMMIT")
+            return row["job_id"]
+
+    def update_progress(self, job_id, progress):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE job_id = ?",
+                         (json.dumps(progress, ensure_ascii=False), time.time(), job_id))
+
+    def heartbeat(self, job_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def complete(self, job_id, pdf_path):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, pdf_path = ?, finished_at = ? WHERE job_id = ?",
+                         (DONE, pdf_path, time.time(), job_id))
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                         (FAILED, error, time.time(), job_id))
+
+    def requeue(self, job_id):
+        """
+        Devolve um job à fila (ex: interrompido por uma falha do worker, não do próprio job).
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, worker = NULL, error = NULL WHERE job_id = ?", (QUEUED, job_id))
+
+    def requeue_stale(self, max_silence_seconds=300):
+        """
+        Devolve à fila os jobs em execução cujo worker parou de enviar progresso (ex: processo encerrado).
+        O job retomado reaproveita as etapas já registradas no manifesto.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                                  (QUEUED, RUNNING, time.time() - max_silence_seconds))
+            return cursor.rowcount
+
+    def get(self, job_id):
+        """
+        Retorna o estado do job como dicionário (com o progresso decodificado) ou None se não existir.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"]) if job["progress"] else {}
+        return job
+
+    def result_pdf(self, job_id):
+        """
+        Caminho do PDF gerado para o job, ou None se o job ainda não terminou com sucesso.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] != DONE:
+            return None
+        return job["pdf_path"]
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from model_functions import (criar_pastas, extract_and_split_audio_from_video,
+                             process_audio_mp3, process_audio_wav, combine_meeting_parts)
+from pipeline import processar_segmentos
+from text_chunker import split_text_by_tokens, split_table_by_tokens
+from summarizer import summarize_parts, reduce_minutes, generate_final_outputs
+from audio_segmenter import (split_audio_on_silence, split_stream_on_silence, stitch_transcriptions,
+                             segment_timelines, mp4_streamable, MAX_SECONDS, STDIN_BLOCK_BYTES)
+from audio_encoding import UPLOAD_CODEC, upload_segment_seconds
+from transcript_store import TranscriptTable, TRANSCRIPT_FORMAT
+from diarization import diarize_segments, DIARIZATION_ENABLED
+from meeting_index import index_job
+from progress import ProgressTracker
+from cache import result_cache
+from pdf_generator import gerar_pdf_resumo_ata
+from folder_delete import clean_job_folder
+from instrumentation import job_context, bind_job, job_usage
+from transcription_backends import get_transcriber
+
+def salvar_texto(caminho, texto):
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(texto)
+
+def ler_texto(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return f.read()
+
+def salvar_json(caminho, dados):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False)
+
+def ler_json(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def ler_transcricao_segmento(caminho):
+    """
+    Lê o resultado salvo de um segmento; jobs anteriores aos timestamps guardavam apenas o texto (.txt).
+    """
+    if caminho.endswith(".txt"):
+        return {"text": ler_texto(caminho), "segments": None, "words": None}
+    return ler_json(caminho)
+
+def log_token_usage(job_id, log=print):
+    """
+    Informa os tokens consumidos pelo job nas chamadas de chat desta execução.
+    """
+    usage = job_usage(job_id, clear=True)
+    if usage.get("prompt_tokens") or usage.get("completion_tokens"):
+        log(f"Tokens: {usage.get('prompt_tokens', 0)} de entrada ({usage.get('cached_prompt_tokens', 0)} do cache "
+            f"de prompts da API) e {usage.get('completion_tokens', 0)} de saída.")
+
+def segment_input(file_name, file_type, pastas):
+    """
+    Divide a entrada (vídeo, MP3 ou WAV) em segmentos de áudio conforme o tipo do arquivo.
+    """
+    if file_type == "video":
+        print("Processando arquivo de vídeo...")
+        return extract_and_split_audio_from_video(file_name, pastas["audio_segments"])
+    if file_type == "mp3":
+        print("Processando arquivo MP3...")
+        cleaned_audio_path = process_audio_mp3(file_name, pastas["cleaned_mp3"])
+        # O áudio limpo também é dividido nas pausas para ser transcrito em paralelo
+        return split_audio_on_silence(cleaned_audio_path, pastas["audio_segments"])
+    if file_type == "wav":
+        print("Processando arquivo WAV...")
+        return process_audio_wav(file_name, pastas["audio_segments"])
+    raise ValueError(f"Tipo de arquivo não suportado: {file_type}")
+
+def spool_upload(stream, manifest, file_name):
+    """
+    Grava um upload (objeto binário, ex: arquivo enviado ao Streamlit) na pasta de upload do job, em blocos,
+    e o registra no manifesto; a extração do áudio e a segmentação ficam com o worker (ver segment_upload).
+    """
+    pastas = criar_pastas(manifest.job_dir)
+    upload_path = os.path.join(pastas["upload"], os.path.basename(file_name))
+    with open(upload_path, "wb") as f:
+        shutil.copyfileobj(stream, f, STDIN_BLOCK_BYTES)
+    manifest.mark_done("upload", upload_path)
+    return upload_path
+
+def segment_upload(upload_path, file_type, pastas, max_segment_size_mb=24, codec=UPLOAD_CODEC):
+    """
+    Divide um upload gravado na pasta do job (ver spool_upload) em segmentos cortados nas pausas,
+    enviando-o ao ffmpeg pela entrada padrão: a gravação é lida uma única vez, sem cópias intermediárias.
+
+    MP4 com o índice no fim do arquivo não pode ser lido em fluxo; nesse caso o ffmpeg lê o próprio arquivo.
+    """
+    max_seconds = min(MAX_SECONDS, upload_segment_seconds(max_segment_size_mb, codec))
+    with open(upload_path, "rb") as stream:
+        if file_type == "video" and not mp4_streamable(stream):
+            print("MP4 com o índice no fim do arquivo; segmentando a partir do arquivo gravado.")
+            return split_audio_on_silence(upload_path, pastas["audio_segments"], max_seconds=max_seconds)
+        return split_stream_on_silence(stream, pastas["audio_segments"], max_seconds=max_seconds,
+                                       name=os.path.basename(upload_path))
+
+def _join_diarization(future, manifest, pastas, progress, log):
+    """
+    Aguarda a identificação dos falantes iniciada junto com a transcrição e registra o índice de turnos
+    no manifesto. Retorna o índice ou None se a identificação falhar.
+    """
+    try:
+        speakers = future.result()
+    except Exception as e:
+        log(f"Falha na identificação dos falantes ({e}); a transcrição seguirá sem eles.")
+        speakers = None
+    else:
+        speakers_file = os.path.join(pastas["transcricao"], "speakers.json")
+        salvar_json(speakers_file, speakers)
+        manifest.mark_done("diarizacao", speakers_file)
+    progress.complete_stage("diarizacao")
+    return speakers
+
+def run_job(manifest, progress=None, keep_intermediates=False, pool_cpu=None, pool_api=None, pool_local=None):
+    """
+    Executa o pipeline completo de um job (segmentação, redução de ruído, transcrição, atas e PDF),
+    pulando as etapas já registradas como concluídas no manifesto. Retorna o caminho do PDF.
+
+    :param pool_cpu: pool de processos compartilhado para o ffmpeg e a redução de ruído (ex: modo em lote).
+    :param pool_api: pool compartilhado para as chamadas ao Whisper e ao GPT.
+    :param pool_local: pool de processos compartilhado para a transcrição local (ver transcription_backends).
+
+    O mecanismo de transcrição é o registrado no manifesto ("transcription_backend") ou o padrão.
+    """
+    # Os registros de instrumentação das etapas ficam associados ao job
+    with job_context(manifest.job_id):
+        return _run_job(manifest, progress, keep_intermediates, pool_cpu, pool_api, pool_local)
+
+def _run_job(manifest, progress, keep_intermediates, pool_cpu, pool_api, pool_local):
+    progress = progress or ProgressTracker()
+    log = progress.message
+    file_name, file_type = manifest.data["input_file"], manifest.data["file_type"]
+    # Os contadores do cache são do processo inteiro; o job registra só a diferença desde o seu início
+    cache_start = result_cache.stats()
+
+    if manifest.is_done("pdf"):
+        log(f"Job '{manifest.job_id}' já concluído: {manifest.get_output('pdf')}")
+        return manifest.get_output("pdf")
+
+    # Cria as pastas necessárias dentro do diretório do job
+    pastas = criar_pastas(manifest.job_dir)
+
+    if manifest.is_done("segmentacao"):
+        segments = manifest.get_output("segmentacao")
+        log(f"Segmentação já concluída anteriormente ({len(segments)} arquivos).")
+    else:
+        progress.start_stage("segmentacao", total=1)
+        if manifest.is_done("upload"):
+            # Upload gravado pela aplicação na pasta do job, enviado ao ffmpeg em fluxo
+            segment, args = segment_upload, (manifest.get_output("upload"), file_type, pastas)
+        else:
+            segment, args = segment_input, (file_name, file_type, pastas)
+        if pool_cpu is not None:
+            segments = pool_cpu.submit(bind_job(segment), *args).result()
+        else:
+            segments = segment(*args)
+        manifest.mark_done("segmentacao", segments)
+    progress.complete_stage("segmentacao")
+
+    log(f"Total de arquivos a serem processados: {len(segments)}")
+
+    # Identificação dos falantes (local, em CPU), opcional: roda em paralelo com a transcrição e só é
+    # aguardada ao montar a tabela; sem ela, a transcrição segue sem falantes
+    speakers, diarization_future = None, None
+    if manifest.is_done("diarizacao"):
+        speakers = ler_json(manifest.get_output("diarizacao"))
+        log(f"Identificação dos falantes já concluída anteriormente ({len(speakers['speakers'])} falantes).")
+    elif DIARIZATION_ENABLED and not manifest.is_done("transcricao"):
+        diarization_pool = ThreadPoolExecutor(max_workers=1)
+        diarization_future = diarization_pool.submit(bind_job(diarize_segments), segments,
+                                                     segment_timelines(segments), pool=pool_cpu,
+                                                     progress=progress, log=log)
+        diarization_pool.shutdown(wait=False)
+
+    transcript = None
+    if manifest.is_done("transcricao"):
+        transcription_output = manifest.get_output("transcricao")
+        if transcription_output.endswith(".txt"):
+            # Jobs anteriores à tabela de transcrição guardavam apenas o texto corrido
+            full_transcription = ler_texto(transcription_output)
+        else:
+            transcript = TranscriptTable.load(transcription_output)
+        log("Transcrição já concluída anteriormente.")
+    else:
+        # Segmentos transcritos em uma execução anterior deste job não são reenviados
+        existing = {idx: ler_transcricao_segmento(manifest.get_output("transcricao", idx))
+                    for idx in range(len(segments)) if manifest.is_done("transcricao", idx)}
+
+        def salvar_transcricao_segmento(idx, result):
+            segment_file = os.path.join(pastas["transcricao"], f"segment_{idx+1}.json")
+            salvar_json(segment_file, result)
+            manifest.mark_done("transcricao", segment_file, item=idx)
+
+        # Redução de ruído e transcrição dos segmentos em paralelo, preservando a ordem original
+        transcriptions, failures = processar_segmentos(segments, log=log, progress=progress,
+                                             transcricoes_existentes=existing,
+                                             ao_transcrever=salvar_transcricao_segmento,
+                                             pool_cpu=pool_cpu, pool_api=pool_api, pool_local=pool_local,
+                                             transcriber=get_transcriber(manifest.data.get("transcription_backend")))
+
+        if failures:
+            details = "; ".join(f"segmento {idx + 1}: {error}" for idx, error in sorted(failures.items()))
+            raise RuntimeError(f"Falha em {len(failures)} de {len(segments)} segmentos ({details}). "
+                               f"Retome o job '{manifest.job_id}' para reprocessar apenas esses segmentos.")
+
+        if diarization_future is not None:
+            speakers = _join_diarization(diarization_future, manifest, pastas, progress, log)
+
+        # Tabelas com os tempos de cada trecho e palavra na gravação original
+        timelines = segment_timelines(segments)
+        transcript = TranscriptTable.from_results(transcriptions, timelines)
+        words = TranscriptTable.from_results(transcriptions, timelines, level="words")
+        if speakers:
+            transcript.assign_speakers(speakers)
+            words.assign_speakers(speakers)
+        if len(words):
+            words.save(os.path.join(pastas["transcricao"], f"transcript_words.{TRANSCRIPT_FORMAT}"))
+
+        # O texto corrido continua disponível para leitura
+        salvar_texto(os.path.join(pastas["transcricao"], "full_transcription.txt"),
+                     stitch_transcriptions([result["text"] for result in transcriptions],
+                                           [timeline["overlap_seconds"] for timeline in timelines]))
+        transcription_file = transcript.save(os.path.join(pastas["transcricao"], f"transcript.{TRANSCRIPT_FORMAT}"))
+        manifest.mark_done("transcricao", transcription_file)
+
+        log(f"Transcrição concluída e salva em '{transcription_file}' ({len(transcript)} trechos).")
+
+    # Divide a transcrição em partes que cabem no contexto do modelo, contando tokens;
+    # com a tabela, as partes seguem os trechos e levam o intervalo de tempo que cobrem
+    log("Dividindo a transcrição em partes...")
+    if transcript is not None:
+        table_parts = split_table_by_tokens(transcript, turns=speakers["turns"] if speakers else None)
+        transcription_parts = [part["text"] for part in table_parts]
+        time_ranges = [(part["start"], part["end"]) for part in table_parts]
+    else:
+        transcription_parts = split_text_by_tokens(full_transcription)
+        time_ranges = None
+
+    # Atas parciais geradas em paralelo; as já concluídas neste job são reaproveitadas
+    existing_summaries = {i: ler_texto(manifest.get_output("atas_parciais", i))
+                          for i in range(len(transcription_parts)) if manifest.is_done("atas_parciais", i)}
+
+    def salvar_ata_parcial(i, summary):
+        # Salvar a ata na pasta 'atas_parciais'
+        file_name = os.path.join(pastas["atas"], f"ata_parte_{i+1}.txt")
+        salvar_texto(file_name, summary)
+        manifest.mark_done("atas_parciais", file_name, item=i)
+        log(f"Ata Parte {i+1} salva em '{file_name}'.")
+
+    final_summaries = summarize_parts(transcription_parts, existing=existing_summaries,
+                                      on_done=salvar_ata_parcial, log=log, progress=progress, pool=pool_api,
+                                      time_ranges=time_ranges)
+
+    log("Consolidando a ata final...")
+    final_ata = combine_meeting_parts(final_summaries)
+    ata_final_file = os.path.join(pastas["ata_final"], "ata_final_completa.txt")
+    salvar_texto(ata_final_file, final_ata)
+    log(f"Ata final salva em '{ata_final_file}'.")
+
+    need_summary = not manifest.is_done("resumo_extenso")
+    need_minutes = not manifest.is_done("ata_consolidada")
+    full_summary = None if need_summary else ler_texto(manifest.get_output("resumo_extenso"))
+    aggregated_minutes = None if need_minutes else ler_texto(manifest.get_output("ata_consolidada"))
+
+    if need_summary or need_minutes:
+        # Reduz as atas em árvore até caberem em uma chamada e gera as duas saídas finais (em uma chamada
+        # combinada ou em paralelo), repassando o texto para os consumidores do progresso
+        meeting_parts = reduce_minutes(final_summaries, log=log, progress=progress, pool=pool_api)
+        log("Gerando resumo extenso e ata consolidada...")
+        if need_summary:
+            progress.start_stage("resumo_extenso", total=1)
+        if need_minutes:
+            progress.start_stage("ata_consolidada", total=1)
+        new_summary, new_minutes = generate_final_outputs(meeting_parts, need_summary=need_summary,
+                                                          need_minutes=need_minutes, on_token=progress.token,
+                                                          pool=pool_api, log=log,
+                                                          on_reset=progress.reset_tokens)
+        if need_summary:
+            full_summary = new_summary
+            summary_file = os.path.join(pastas["resumo_final"], "resumo_extenso.txt")
+            salvar_texto(summary_file, full_summary)
+            manifest.mark_done("resumo_extenso", summary_file)
+            progress.complete_stage("resumo_extenso")
+            log(f"Resumo extenso salvo em '{summary_file}'.")
+        if need_minutes:
+            aggregated_minutes = new_minutes
+            aggregated_file = os.path.join(pastas["ata_final"], "ata_consolidada.txt")
+            salvar_texto(aggregated_file, aggregated_minutes)
+            manifest.mark_done("ata_consolidada", aggregated_file)
+            progress.complete_stage("ata_consolidada")
+            log(f"Ata consolidada salva em '{aggregated_file}'.")
+
+    progress.start_stage("pdf", total=1)
+    pdf_path = gerar_pdf_resumo_ata(full_summary, aggregated_minutes, "resumo_e_ata.pdf",
+                                    pasta_saida=os.path.join(manifest.job_dir, "pdf"))
+    manifest.mark_done("pdf", pdf_path)
+    progress.complete_stage("pdf")
+
+    cache_stats = {name: count - cache_start[name] for name, count in result_cache.stats().items()}
+    log(f"Cache: {cache_stats['hits']} acertos, {cache_stats['misses']} falhas.")
+    log_token_usage(manifest.job_id, log)
+
+    # Transcrição e atas entram no índice de busca antes da remoção dos arquivos intermediários
+    index_job(manifest, time_ranges=time_ranges, log=log)
+
+    # Remove apenas os arquivos intermediários deste job, mantendo o manifesto e o PDF
+    if not keep_intermediates:
+        clean_job_folder(manifest.job_dir)
+    return pdf_path
+
+def stream_job(manifest, keep_intermediates=False, pool_cpu=None, pool_api=None, pool_local=None):
+    """
+    Executa o job em uma thread e devolve o fluxo de eventos de progresso (ver progress.ProgressTracker).
+    O último evento tem tipo "done", com o caminho do PDF em "result" ou a mensagem de erro em "error".
+    Os pools, quando informados, são os do worker aquecido (ver worker.worker_loop) e não são encerrados.
+    """
+    progress = ProgressTracker()
+
+    def worker():
+        try:
+            progress.finish(result=run_job(manifest, progress, keep_intermediates, pool_cpu=pool_cpu,
+                                           pool_api=pool_api, pool_local=pool_local))
+        except Exception as e:
+            progress.finish(error=str(e))
+
+    threading.Thread(target=worker, name=f"job-{manifest.job_id}", daemon=True).start()
+    return progress.events()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import uuid
+import threading
+from datetime import datetime
+
+# Pasta raiz onde cada job recebe seu próprio diretório de trabalho
+JOBS_DIR = "jobs"
+MANIFEST_FILE = "manifest.json"
+
+def novo_job_id():
+    """
+    Gera um identificador de job legível e único (data/hora + sufixo aleatório).
+    """
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+def job_dir_for(job_id, jobs_dir=JOBS_DIR):
+    return os.path.join(jobs_dir, job_id)
+
+class JobManifest:
+    """
+    Registra, em um arquivo JSON dentro do diretório do job, quais etapas
+    (e quais segmentos ou partes de cada etapa) já foram concluídas.
+
+    Os caminhos de saída são gravados relativos ao diretório do job.
+    """
+
+    def __init__(self, job_dir, data):
+        self.job_dir = job_dir
+        self.data = data
+        self._lock = threading.Lock()
+
+    @property
+    def job_id(self):
+        return self.data["job_id"]
+
+    @classmethod
+    def create(cls, job_dir, job_id, **metadata):
+        data = {
+            "job_id": job_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "stages": {},
+        }
+        data.update(metadata)
+        manifest = cls(job_dir, data)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, job_dir):
+        with open(os.path.join(job_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return cls(job_dir, json.load(f))
+
+    def save(self):
+        path = os.path.join(self.job_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _stage(self, stage):
+        return self.data["stages"].setdefault(stage, {"done": False, "items": {}})
+
+    def is_done(self, stage, item=None):
+        stage_data = self.data["stages"].get(stage)
+        if stage_data is None:
+            return False
+        if item is None:
+            return stage_data["done"]
+        return str(item) in stage_data["items"]
+
+    def get_output(self, stage, item=None):
+        """
+        Retorna a saída registrada para a etapa (ou item), convertendo caminhos para o diretório do job.
+        """
+        stage_data = self.data["stages"][stage]
+        output = stage_data["output"] if item is None else stage_data["items"][str(item)]
+        return self._resolve(output)
+
+    def mark_done(self, stage, output=None, item=None):
+        """
+        Marca a etapa inteira (item=None) ou apenas um item dela como concluído e persiste o manifesto.
+        """
+        with self._lock:
+            stage_data = self._stage(stage)
+            if item is None:
+                stage_data["done"] = True
+                stage_data["output"] = self._relativize(output)
+            else:
+                stage_data["items"][str(item)] = self._relativize(output)
+            self.save()
+
+    def _relativize(self, output):
+        if isinstance(output, list):
+            return [self._relativize(o) for o in output]
+        if isinstance(output, str) and output.startswith(self.job_dir + os.sep):
+            return os.path.relpath(output, self.job_dir)
+        return output
+
+    def _resolve(self, output):
+        if isinstance(output, list):
+            return [self._resolve(o) for o in output]
+        if isinstance(output, str) and not os.path.isabs(output):
+            return os.path.join(self.job_dir, output)
+        return output
+
+def criar_job(input_file=None, file_type=None, job_id=None, jobs_dir=JOBS_DIR, **metadata):
+    """
+    Cria o diretório de trabalho de um novo job com seu manifesto.
+    Os demais argumentos (ex: transcription_backend) são gravados no manifesto.
+    """
+    job_id = job_id or novo_job_id()
+    job_dir = job_dir_for(job_id, jobs_dir)
+    os.makedirs(job_dir, exist_ok=True)
+    print(f"Job '{job_id}' criado em '{job_dir}'.")
+    return JobManifest.create(job_dir, job_id, input_file=input_file, file_type=file_type, **metadata)
+
+def retomar_job(job_id, jobs_dir=JOBS_DIR):
+    """
+    Carrega o manifesto de um job existente para continuar a partir da última etapa concluída.
+    """
+    job_dir = job_dir_for(job_id, jobs_dir)
+    if not os.path.exists(os.path.join(job_dir, MANIFEST_FILE)):
+        raise FileNotFoundError(f"Job '{job_id}' não encontrado em '{jobs_dir}'.")
+    print(f"Retomando job '{job_id}' a partir de '{job_dir}'.")
+    return JobManifest.load(job_dir)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import types
+import importlib
+import importlib.util
+
+class LazyModule(types.ModuleType):
+    """
+    Módulo importado apenas no primeiro acesso a um de seus atributos (ex: librosa.load), para que
+    a CLI e a aplicação não paguem a importação das dependências pesadas antes da etapa que as usa.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        # O sistema de importação já serializa importações concorrentes do mesmo módulo
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "carregado" if self._module is not None else "não carregado"
+        return f"<módulo adiado '{self.__name__}' ({state})>"
+
+def lazy_import(name, optional=False):
+    """
+    Retorna um LazyModule para o módulo (ex: "librosa" ou "reportlab.platypus").
+
+    Com optional=True, retorna None quando o pacote não está instalado, sem importá-lo, como as
+    importações opcionais em try/except ImportError.
+    """
+    if optional and importlib.util.find_spec(name.partition(".")[0]) is None:
+        return None
+    return LazyModule(name)
+
+def preload(*modules):
+    """
+    Importa de imediato os módulos adiados (ex: ao aquecer um processo de worker).
+    """
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
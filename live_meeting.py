@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import socket
+import threading
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from model_functions import criar_pastas, summarize_text_as_minutes
+from pipeline import processar_segmentos, estimar_ruido, MAX_WORKERS_DENOISE, MAX_WORKERS_TRANSCRICAO
+from summarizer import reduce_minutes, generate_final_outputs, MAX_REDUCE_INPUT_CHARS
+from text_chunker import split_table_by_tokens
+from audio_segmenter import SilenceSegmenter, stitch_transcriptions, SAMPLE_RATE, READ_BLOCK_BYTES
+from transcript_store import TranscriptTable, TRANSCRIPT_FORMAT, format_timestamp
+from transcription_backends import get_transcriber, MAX_WORKERS_LOCAL
+from job_workspace import criar_job, JOBS_DIR
+from job_runner import salvar_texto, salvar_json, log_token_usage
+from progress import ProgressTracker
+from pdf_generator import gerar_pdf_resumo_ata
+from folder_delete import clean_job_folder
+from meeting_index import index_job
+from instrumentation import job_context, bind_job
+from lazy_imports import lazy_import
+
+ffmpeg = lazy_import("ffmpeg")
+
+# Segmentos mais curtos que no processamento de arquivos, para que a transcrição acompanhe a reunião
+LIVE_TARGET_SECONDS = 60
+LIVE_MIN_SECONDS = 30
+LIVE_MAX_SECONDS = 120
+LIVE_PART_SECONDS = 600  # Trecho da gravação coberto por cada ata parcial gerada durante a reunião
+LIVE_IDLE_SECONDS = 30  # Um arquivo que para de crescer por este tempo é considerado encerrado
+POLL_INTERVAL_SECONDS = 0.5
+MAX_LIVE_SEGMENTS = 4  # Segmentos em transcrição ao mesmo tempo
+
+def follow_file(path, idle_seconds=LIVE_IDLE_SECONDS, poll_interval=POLL_INTERVAL_SECONDS):
+    """
+    Lê um arquivo que ainda está sendo gravado, como 'tail -f', até que ele pare de crescer por idle_seconds.
+    """
+    with open(path, "rb") as f:
+        idle_since = time.monotonic()
+        while True:
+            block = f.read(READ_BLOCK_BYTES)
+            if block:
+                idle_since = time.monotonic()
+                yield block
+            elif time.monotonic() - idle_since >= idle_seconds:
+                return
+            else:
+                time.sleep(poll_interval)
+
+def read_stream(stream):
+    """
+    Lê um fluxo (ex: pipe na entrada padrão) até ser fechado.
+    """
+    return iter(lambda: stream.read(READ_BLOCK_BYTES), b"")
+
+def listen_socket(host, port):
+    """
+    Aguarda uma conexão TCP local e lê o áudio enviado por ela até a conexão ser fechada.
+    """
+    with socket.create_server((host, port)) as server:
+        print(f"Aguardando o áudio da reunião em {host}:{port}...")
+        connection, address = server.accept()
+        print(f"Conexão recebida de {address[0]}:{address[1]}.")
+        with connection:
+            yield from iter(lambda: connection.recv(READ_BLOCK_BYTES), b"")
+
+def open_source(source):
+    """
+    Abre a fonte do áudio ao vivo: "-" (entrada padrão), "tcp://host:porta" ou o caminho de um arquivo em gravação.
+    """
+    if source == "-":
+        return read_stream(sys.stdin.buffer)
+    if source.startswith("tcp://"):
+        host, _, port = source[len("tcp://"):].rpartition(":")
+        return listen_socket(host or "127.0.0.1", int(port))
+    return follow_file(source)
+
+class LiveMeeting:
+    """
+    Processa uma reunião enquanto ela acontece: o áudio recebido é decodificado pelo ffmpeg e cortado
+    nas pausas, cada segmento é transcrito assim que fica pronto e, a cada part_seconds de gravação,
+    uma ata parcial é gerada e incorporada ao agregado das atas (reduzido quando passa do limite).
+
+    Quando o fluxo termina restam apenas o último trecho, as saídas finais e o PDF.
+    """
+
+    def __init__(self, manifest, progress, pastas, transcriber, pool_cpu, pool_api, pool_local,
+                 part_seconds=LIVE_PART_SECONDS):
+        self.manifest = manifest
+        self.progress = progress
+        self.pastas = pastas
+        self.transcriber = transcriber
+        self.pool_cpu = pool_cpu
+        self.pool_api = pool_api
+        self.pool_local = pool_local
+        self.part_seconds = part_seconds
+
+        self._lock = threading.Lock()
+        self._noise_lock = threading.Lock()
+        self._noise = None  # (perfil, hash) do ruído, estimado uma única vez a partir do primeiro segmento
+        self.segments = []  # Metadados dos segmentos (ver audio_segmenter.SilenceSegmenter)
+        self._results = {}  # Transcrições concluídas fora de ordem
+        self._ordered = []  # Transcrições na ordem dos segmentos, até a primeira ainda pendente
+        self._failures = {}
+        self._part_start = 0.0
+        self._part_count = 0
+        self._minutes = []  # Agregado das atas parciais, na ordem da reunião
+        self._errors = []
+        self._segment_futures = []
+        # Uma única thread incorpora as atas parciais ao agregado, na ordem em que foram pedidas
+        self._aggregator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-agregado")
+        self._segment_pool = ThreadPoolExecutor(max_workers=MAX_LIVE_SEGMENTS, thread_name_prefix="live-segmento")
+
+    def add_segment(self, segment):
+        idx = len(self.segments)
+        self.segments.append(segment)
+        self.progress.message(f"Segmento {idx+1} gravado ({format_timestamp(segment['start_seconds'])} a "
+                              f"{format_timestamp(segment['end_seconds'])}). Transcrevendo...")
+        self._segment_futures.append(self._segment_pool.submit(bind_job(self._transcribe_segment), idx, segment))
+
+    def _noise_profile(self):
+        with self._noise_lock:
+            if self._noise is None:
+                self._noise = estimar_ruido(self.segments[0]["path"])
+            return self._noise
+
+    def _transcribe_segment(self, idx, segment):
+        transcriptions, failures = processar_segmentos([segment["path"]], log=lambda text: None,
+                                                       pool_cpu=self.pool_cpu, pool_api=self.pool_api,
+                                                       pool_local=self.pool_local, transcriber=self.transcriber,
+                                                       ruido=self._noise_profile())
+        with self._lock:
+            if failures:
+                self._failures[idx] = failures[0]
+                self.progress.message(f"Falha ao transcrever o segmento {idx+1}: {failures[0]}")
+                return
+            segment_file = os.path.join(self.pastas["transcricao"], f"segment_{idx+1}.json")
+            salvar_json(segment_file, transcriptions[0])
+            self.manifest.mark_done("transcricao", segment_file, item=idx)
+            self.progress.advance("transcricao")
+            self._results[idx] = transcriptions[0]
+            while len(self._ordered) in self._results:
+                self._ordered.append(self._results.pop(len(self._ordered)))
+            covered_until = self.segments[len(self._ordered) - 1]["end_seconds"] if self._ordered else 0.0
+            if covered_until - self._part_start >= self.part_seconds:
+                self._submit_parts(covered_until)
+
+    def _table(self):
+        timelines = [{"timeline": segment["timeline"], "duration_seconds": segment["duration_seconds"]}
+                     for segment in self.segments[:len(self._ordered)]]
+        return TranscriptTable.from_results(self._ordered, timelines)
+
+    def _submit_parts(self, until):
+        """
+        Envia para ata parcial o trecho da transcrição entre o fim da última parte e until (segundos).
+        """
+        window = self._table().between(self._part_start, until)
+        self._part_start = until
+        if not len(window):
+            return
+        for part in split_table_by_tokens(window):
+            i = self._part_count
+            self._part_count += 1
+            self.progress.message(f"Gerando a ata da Parte {i+1} ({format_timestamp(part['start'])} a "
+                                  f"{format_timestamp(part['end'])})...")
+            future = self.pool_api.submit(bind_job(summarize_text_as_minutes), part["text"], i + 1,
+                                          time_range=(part["start"], part["end"]))
+            self._aggregator.submit(bind_job(self._aggregate), i, future)
+
+    def _aggregate(self, i, future):
+        try:
+            summary = future.result()
+            file_name = os.path.join(self.pastas["atas"], f"ata_parte_{i+1}.txt")
+            salvar_texto(file_name, summary)
+            self.manifest.mark_done("atas_parciais", file_name, item=i)
+            self.progress.advance("atas_parciais")
+            self.progress.partial("atas_parciais", i, summary)
+            self._minutes.append(summary)
+            # Mantém o agregado com folga abaixo do limite, para que a consolidação final seja uma única chamada
+            if len("\n".join(self._minutes)) > MAX_REDUCE_INPUT_CHARS:
+                self._minutes = reduce_minutes(self._minutes, max_input_chars=MAX_REDUCE_INPUT_CHARS // 2,
+                                               log=self.progress.message, pool=self.pool_api)
+        except Exception as e:
+            self._errors.append(f"ata parcial {i+1}: {e}")
+
+    def close(self):
+        self._segment_pool.shutdown(wait=True)
+        self._aggregator.shutdown(wait=True)
+
+    def finish(self):
+        """
+        Aguarda os segmentos e atas pendentes e gera a última ata parcial (o trecho final da reunião).
+        Retorna o agregado das atas.
+        """
+        for future in self._segment_futures:
+            future.result()
+        if self._failures:
+            details = "; ".join(f"segmento {idx + 1}: {error}" for idx, error in sorted(self._failures.items()))
+            raise RuntimeError(f"Falha em {len(self._failures)} de {len(self.segments)} segmentos ({details}).")
+        self._submit_parts(float("inf"))
+        self._aggregator.shutdown(wait=True)
+        if self._errors:
+            raise RuntimeError("; ".join(self._errors))
+
+        transcript = self._table()
+        salvar_texto(os.path.join(self.pastas["transcricao"], "full_transcription.txt"),
+                     stitch_transcriptions([result["text"] for result in self._ordered],
+                                           [segment["overlap_seconds"] for segment in self.segments]))
+        transcription_file = transcript.save(os.path.join(self.pastas["transcricao"],
+                                                          f"transcript.{TRANSCRIPT_FORMAT}"))
+        self.manifest.mark_done("segmentacao", [segment["path"] for segment in self.segments])
+        self.manifest.mark_done("transcricao", transcription_file)
+        self.manifest.mark_done("atas_parciais")
+        return self._minutes
+
+def _decode(blocks, process):
+    """
+    Copia os blocos da fonte para a entrada do ffmpeg; ao fim da fonte, fecha a entrada para encerrar a decodificação.
+    """
+    try:
+        for block in blocks:
+            process.stdin.write(block)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+def run_live_meeting(source, progress=None, keep_intermediates=False, transcription_backend=None,
+                     part_seconds=LIVE_PART_SECONDS, max_workers_denoise=MAX_WORKERS_DENOISE,
+                     max_workers_api=MAX_WORKERS_TRANSCRICAO, jobs_dir=JOBS_DIR):
+    """
+    Gera a ata de uma reunião em andamento a partir de um fluxo de áudio em qualquer formato
+    que o ffmpeg decodifique (ver open_source). Retorna o caminho do PDF.
+    """
+    progress = progress or ProgressTracker()
+    manifest = criar_job(source, "live", jobs_dir=jobs_dir, transcription_backend=transcription_backend)
+    with job_context(manifest.job_id):
+        return _run_live_meeting(manifest, open_source(source), progress, keep_intermediates, part_seconds,
+                                 max_workers_denoise, max_workers_api)
+
+def _run_live_meeting(manifest, blocks, progress, keep_intermediates, part_seconds, max_workers_denoise,
+                      max_workers_api):
+    log = progress.message
+    pastas = criar_pastas(manifest.job_dir)
+    transcriber = get_transcriber(manifest.data.get("transcription_backend"))
+
+    with ExitStack() as stack:
+        pool_cpu = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers_denoise))
+        pool_api = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers_api))
+        pool_local = None
+        if transcriber.runs_in_process:
+            pool_local = stack.enter_context(ProcessPoolExecutor(max_workers=MAX_WORKERS_LOCAL,
+                                                                 initializer=transcriber.warm_up))
+        meeting = LiveMeeting(manifest, progress, pastas, transcriber, pool_cpu, pool_api, pool_local, part_seconds)
+        # Encerrado antes dos pools, que ainda recebem os segmentos e atas pendentes
+        stack.callback(meeting.close)
+        segmenter = SilenceSegmenter(pastas["audio_segments"], target_seconds=LIVE_TARGET_SECONDS,
+                                     min_seconds=LIVE_MIN_SECONDS, max_seconds=LIVE_MAX_SECONDS)
+
+        progress.start_stage("transcricao")
+        progress.start_stage("atas_parciais")
+        process = (
+            ffmpeg.input("pipe:")
+            .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=str(SAMPLE_RATE))
+            .global_args("-loglevel", "error")
+            .run_async(pipe_stdin=True, pipe_stdout=True)
+        )
+        feeder = threading.Thread(target=_decode, args=(blocks, process), name="live-entrada", daemon=True)
+        feeder.start()
+        try:
+            for block in iter(lambda: process.stdout.read(READ_BLOCK_BYTES), b""):
+                segmenter.feed(block)
+                for segment in segmenter.segments[len(meeting.segments):]:
+                    meeting.add_segment(segment)
+        finally:
+            process.stdout.close()
+            return_code = process.wait()
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg falhou ao decodificar o áudio ao vivo (código {return_code}).")
+        for segment in segmenter.finish()[len(meeting.segments):]:
+            meeting.add_segment(segment)
+
+        ended_at = time.monotonic()
+        log("Fim da gravação. Concluindo as atas pendentes...")
+        minutes = meeting.finish()
+        progress.complete_stage("transcricao")
+        progress.complete_stage("atas_parciais")
+
+        meeting_parts = reduce_minutes(minutes, log=log, progress=progress, pool=pool_api)
+        log("Gerando resumo extenso e ata consolidada...")
+        progress.start_stage("resumo_extenso", total=1)
+        progress.start_stage("ata_consolidada", total=1)
+        full_summary, aggregated_minutes = generate_final_outputs(meeting_parts, on_token=progress.token,
+                                                                  pool=pool_api, log=log,
+                                                                  on_reset=progress.reset_tokens)
+
+    summary_file = os.path.join(pastas["resumo_final"], "resumo_extenso.txt")
+    salvar_texto(summary_file, full_summary)
+    manifest.mark_done("resumo_extenso", summary_file)
+    progress.complete_stage("resumo_extenso")
+    aggregated_file = os.path.join(pastas["ata_final"], "ata_consolidada.txt")
+    salvar_texto(aggregated_file, aggregated_minutes)
+    manifest.mark_done("ata_consolidada", aggregated_file)
+    progress.complete_stage("ata_consolidada")
+
+    progress.start_stage("pdf", total=1)
+    pdf_path = gerar_pdf_resumo_ata(full_summary, aggregated_minutes, "resumo_e_ata.pdf",
+                                    pasta_saida=os.path.join(manifest.job_dir, "pdf"))
+    manifest.mark_done("pdf", pdf_path)
+    progress.complete_stage("pdf")
+    log(f"PDF gerado {time.monotonic() - ended_at:.1f}s após o fim da gravação.")
+    log_token_usage(manifest.job_id, log)
+    index_job(manifest, log=log)
+
+    if not keep_intermediates:
+        clean_job_folder(manifest.job_dir)
+    return pdf_path
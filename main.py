@@ -1,122 +1,120 @@
-from model_functions import (upload_file, criar_pastas, extract_and_split_audio_from_video, 
-                       process_audio_mp3, process_audio_wav, process_audio,
-                       transcribe_audio, split_text_by_length, summarize_text_as_minutes, 
-                       read_meeting_parts_from_directory, combine_meeting_parts,
-                       generate_full_summary, generate_aggregated_minutes)
-
-from pdf_generator import gerar_pdf_resumo_ata
-from folder_delete import  clean_folders_except_pdf
+from model_functions import upload_file
+from job_workspace import criar_job, retomar_job
+from job_runner import stream_job
+from progress import TerminalPrinter, ProgressTracker
+from batch import collect_inputs, run_batch, MAX_JOBS, MAX_WORKERS_API
+from api_client import api, WHISPER_REQUESTS_PER_MINUTE, CHAT_REQUESTS_PER_MINUTE, CHAT_TOKENS_PER_MINUTE
+from pipeline import MAX_WORKERS_DENOISE
+from instrumentation import start_metrics_server
+from transcription_backends import TRANSCRIBERS, TRANSCRIPTION_BACKEND
+from live_meeting import run_live_meeting, LIVE_PART_SECONDS
+from meeting_index import MeetingIndex, KINDS, index_jobs_dir, format_hit
+import argparse
 import os
-
-def main():
-    # Cria as pastas necessárias
-    criar_pastas()
-
-    print("### Upload do arquivo ###")
-    file_name, file_type = upload_file()
-
-    if not file_name:
-        print("Nenhum arquivo válido foi carregado.")
+import time
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geração automática de atas de reuniões.")
+    parser.add_argument("arquivo", nargs="?",
+                        help="Caminho do arquivo (MP4, MP3 ou WAV). Se omitido, será solicitado.")
+    parser.add_argument("--resume", metavar="JOB_ID",
+                        help="Retoma um job interrompido, pulando as etapas já concluídas.")
+    parser.add_argument("--manter-intermediarios", action="store_true",
+                        help="Não remove os arquivos intermediários do job ao final.")
+    parser.add_argument("--lote", metavar="DIR_OU_GLOB",
+                        help="Processa todos os arquivos MP4, MP3 e WAV de um diretório ou padrão glob, "
+                             "gerando um PDF por arquivo e um relatório do lote.")
+    parser.add_argument("--ao-vivo", metavar="FONTE",
+                        help="Gera as atas durante a reunião a partir de um fluxo de áudio: arquivo ainda em "
+                             "gravação, '-' para a entrada padrão ou tcp://host:porta.")
+    parser.add_argument("--parte-minutos", type=float, default=LIVE_PART_SECONDS / 60,
+                        help="Minutos de gravação cobertos por cada ata parcial no modo ao vivo.")
+    parser.add_argument("--buscar", metavar="CONSULTA",
+                        help="Busca nas transcrições e atas das reuniões já processadas.")
+    parser.add_argument("--tipo", choices=sorted(KINDS), action="append",
+                        help="Restringe a busca a um tipo de documento (pode ser repetido).")
+    parser.add_argument("--limite", type=int, default=10, help="Número máximo de resultados da busca.")
+    parser.add_argument("--reindexar", action="store_true",
+                        help="Indexa para busca os jobs existentes que mantiveram os arquivos intermediários.")
+    parser.add_argument("--jobs", type=int, default=MAX_JOBS,
+                        help="Gravações processadas ao mesmo tempo no modo em lote.")
+    parser.add_argument("--workers-cpu", type=int, default=MAX_WORKERS_DENOISE,
+                        help="Processos compartilhados para ffmpeg e redução de ruído no modo em lote.")
+    parser.add_argument("--workers-api", type=int, default=MAX_WORKERS_API,
+                        help="Chamadas simultâneas à API somando todas as gravações do lote.")
+    parser.add_argument("--rpm-whisper", type=int, default=WHISPER_REQUESTS_PER_MINUTE,
+                        help="Limite de requisições por minuto à API Whisper, somando todas as chamadas.")
+    parser.add_argument("--rpm-chat", type=int, default=CHAT_REQUESTS_PER_MINUTE,
+                        help="Limite de requisições por minuto ao modelo de chat.")
+    parser.add_argument("--tpm-chat", type=int, default=CHAT_TOKENS_PER_MINUTE,
+                        help="Limite de tokens por minuto ao modelo de chat.")
+    parser.add_argument("--transcricao", choices=sorted(TRANSCRIBERS), default=TRANSCRIPTION_BACKEND,
+                        help="Mecanismo de transcrição: API Whisper ou modelo local (faster-whisper).")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Expõe as métricas das etapas no formato do Prometheus em http://127.0.0.1:PORTA/metrics.")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    api.configure(whisper_rpm=args.rpm_whisper, chat_rpm=args.rpm_chat, chat_tpm=args.tpm_chat)
+
+    if args.reindexar:
+        print(f"{index_jobs_dir()} jobs indexados para busca.")
+        if not args.buscar:
+            return
+
+    if args.buscar:
+        inicio = time.perf_counter()
+        hits = MeetingIndex().search(args.buscar, limit=args.limite, kinds=args.tipo)
+        elapsed_ms = (time.perf_counter() - inicio) * 1000
+        for position, hit in enumerate(hits, 1):
+            print(format_hit(position, hit))
+        print(f"{len(hits)} resultado(s) em {elapsed_ms:.1f} ms.")
         return
 
-    if file_type == "video":
-        print("Processando arquivo de vídeo...")
-        segments = extract_and_split_audio_from_video(file_name)
-    elif file_type == "mp3":
-        print("Processando arquivo MP3...")
-        output_dir = "audio_mp3_processado"
-        cleaned_audio_path = process_audio_mp3(file_name, output_dir)
-        segments = [cleaned_audio_path]  # Como é um arquivo único, não precisa dividir
-    elif file_type == "wav":
-        print("Processando arquivo WAV...")
-        output_folder = "segmentos_audio"
-        segments = process_audio_wav(file_name, output_folder)
-
-    print(f"Total de arquivos a serem processados: {len(segments)}")
-
-    cleaned_audio_dir = "audio_limpo"  # Pasta onde os áudios limpos serão salvos
-    if not os.path.exists(cleaned_audio_dir):
-        os.makedirs(cleaned_audio_dir)
-
-    full_transcription = ""
-    for idx, segment_path in enumerate(segments):
-        print(f"Processando segmento {idx+1}/{len(segments)}...")
-        cleaned_audio_path = process_audio(segment_path, cleaned_audio_dir)
-        transcription = transcribe_audio(cleaned_audio_path)
-        full_transcription += transcription + "\n"
-
-    with open(os.path.join("transcricoes", "full_transcription.txt"), "w", encoding="utf-8") as f:
-        f.write(full_transcription)
-
-    print("Transcrição concluída e salva em 'transcricoes/full_transcription.txt'.")
-
-    atas_dir = "atas_parciais"
-    if not os.path.exists(atas_dir):
-        os.makedirs(atas_dir)
+    if args.lote:
+        inputs = collect_inputs(args.lote)
+        if not inputs:
+            print(f"Nenhum arquivo MP4, MP3 ou WAV encontrado em '{args.lote}'.")
+            return
+        print(f"### Lote com {len(inputs)} arquivos ###")
+        run_batch(inputs, max_jobs=args.jobs, max_workers_cpu=args.workers_cpu, max_workers_api=args.workers_api,
+                  keep_intermediates=args.manter_intermediarios, transcription_backend=args.transcricao)
+        return
 
-    # Simulação de uma transcrição muito longa
-    print("Verificando o tamanho da transcrição...")
-    max_char_limit = 8000
+    if args.ao_vivo:
+        progress = ProgressTracker(on_event=TerminalPrinter())
+        try:
+            pdf_path = run_live_meeting(args.ao_vivo, progress, keep_intermediates=args.manter_intermediarios,
+                                        transcription_backend=args.transcricao,
+                                        part_seconds=args.parte_minutos * 60)
+        except Exception as e:
+            print(f"Erro durante o processamento: {e}")
+            return
+        print(f"PDF gerado: {pdf_path}")
+        return
 
-    # Dividir a transcrição se necessário
-    if len(full_transcription) > max_char_limit:
-        transcription_parts = split_text_by_length(full_transcription, max_char_limit)
+    if args.resume:
+        manifest = retomar_job(args.resume)
     else:
-        transcription_parts = [full_transcription]
-
-    final_summaries = []
-    for i, part in enumerate(transcription_parts):
-        print(f"Gerando a ata da Parte {i+1}/{len(transcription_parts)}...")
-        summary = summarize_text_as_minutes(part, part_number=i+1)
-        final_summaries.append(summary)
-        print(f"Ata da Parte {i+1} concluída.\n")
-
-    # Salvar as atas na pasta 'atas_parciais'
-    for i, summary in enumerate(final_summaries):
-        file_name = os.path.join(atas_dir, f"ata_parte_{i+1}.txt")
-        with open(file_name, "w", encoding="utf-8") as f:
-            f.write(summary)
-        print(f"Ata Parte {i+1} salva em '{file_name}'.")
-
-    # Exibição das atas finais
-    print("\n### Atas Finais da Reunião ###")
-    for i, summary in enumerate(final_summaries):
-        print(f"\n### Ata Parte {i+1} ###\n")
-        print(summary)
-
-    directory_path = "atas_parciais"
+        print("### Upload do arquivo ###")
+        file_name, file_type = upload_file([args.arquivo] if args.arquivo else None)
 
-    print("Lendo arquivos do diretório...")
-    meeting_parts = read_meeting_parts_from_directory(directory_path)
+        if not file_name:
+            print("Nenhum arquivo válido foi carregado.")
+            return
 
-    print("Consolidando a ata final...")
-    final_ata = combine_meeting_parts(meeting_parts)
-    print("Gerando resumo extenso e detalhado...")
-    full_summary = generate_full_summary("\n".join(meeting_parts))
-    print("Gerando ata consolidada...")
-    aggregated_minutes = generate_aggregated_minutes("\n".join(meeting_parts))
+        manifest = criar_job(os.path.abspath(file_name), file_type, transcription_backend=args.transcricao)
 
-    with open(os.path.join("ata_final", "ata_final_completa.txt"), "w", encoding="utf-8") as f:
-        f.write(final_ata)
-    print("Ata final salva em 'ata_final/ata_final_completa.txt'.")
+    # O pipeline roda em segundo plano; o terminal consome o fluxo de eventos de progresso
+    printer = TerminalPrinter()
+    for event in stream_job(manifest, keep_intermediates=args.manter_intermediarios):
+        printer(event)
 
-    with open(os.path.join("resumo_final", "resumo_extenso.txt"), "w", encoding="utf-8") as f:
-        f.write(full_summary)
-    print("Resumo extenso salvo em 'resumo_final/resumo_extenso.txt'.")
-
-    with open(os.path.join("ata_final", "ata_consolidada.txt"), "w", encoding="utf-8") as f:
-        f.write(aggregated_minutes)
-    print("Ata consolidada salva em 'ata_final/ata_consolidada.txt'.")
-
-    print("\n### Resumo Extenso e Detalhado ###\n")
-    print(full_summary)
-
-    print("\n### Ata Consolidada ###\n")
-    print(aggregated_minutes)
-
-    gerar_pdf_resumo_ata(full_summary, aggregated_minutes, "resumo_e_ata.pdf")
+    if event["error"]:
+        print(f"Para tentar novamente a partir da última etapa concluída: --resume {manifest.job_id}")
+    else:
+        print(f"PDF gerado: {event['result']}")
 
-    clean_folders_except_pdf()
-    
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import time
+import sqlite3
+import unicodedata
+from contextlib import contextmanager
+
+from job_workspace import JOBS_DIR, MANIFEST_FILE, JobManifest
+from transcript_store import TranscriptTable, format_timestamp, speaker_label
+
+# Índice de busca das reuniões processadas, mantido fora dos diretórios dos jobs (que são limpos ao final)
+INDEX_DB = os.environ.get("ATAS_INDICE", os.path.join(JOBS_DIR, "indice.db"))
+
+PASSAGE_SECONDS = 30  # Trechos da transcrição indexados juntos (quebrados também na troca de falante)
+SNIPPET_WORDS = 24  # Palavras exibidas em torno da ocorrência nos resultados
+
+# Tipos de documento indexados por reunião, com o nome exibido nos resultados
+KINDS = {
+    "transcricao": "transcrição",
+    "ata_parcial": "ata parcial",
+    "ata_consolidada": "ata consolidada",
+    "resumo_extenso": "resumo extenso",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    meeting_id TEXT PRIMARY KEY,
+    title TEXT,
+    created_at TEXT,
+    indexed_at REAL NOT NULL,
+    duration_seconds REAL,
+    speakers INTEGER,
+    pdf_path TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    meeting_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    part INTEGER,
+    start_seconds REAL,
+    end_seconds REAL,
+    speaker TEXT,
+    text TEXT NOT NULL,
+    terms TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_meeting ON documents (meeting_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    terms, content='documents', content_rowid='doc_id', tokenize='unicode61 remove_diacritics 2', prefix='3'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, terms) VALUES (new.doc_id, new.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, terms) VALUES ('delete', old.doc_id, old.terms);
+END;
+"""
+
+# Palavras frequentes demais para distinguir reuniões
+STOPWORDS = set("""a ao aos as com como da das de do dos e ela ele em entre era essa esse esta este eu foi for
+ha isso isto ja la lhe mais mas me mesmo muito na nao nas nem no nos o os ou para pela pelas pelo pelos por qual
+quando que se sem ser seu sua so sao tambem te tem um uma voce""".split())
+
+# Sufixos removidos pelo radicalizador (do mais longo para o mais curto): plural, gênero, grau e formas verbais
+SUFFIXES = ("amentos", "imentos", "amento", "imento", "idades", "adoras", "adores", "ancias", "encias", "mente",
+            "idade", "adora", "ancia", "encia", "acoes", "icoes", "ador", "acao", "icao", "ados", "adas", "idos",
+            "idas", "ando", "endo", "indo", "aram", "eram", "iram", "avam", "aria", "eria", "iria", "amos", "emos",
+            "imos", "oes", "ado", "ada", "ido", "ida", "ava", "ais", "eis", "ao", "ar", "er", "ir", "ou", "eu", "iu",
+            "es", "as", "os", "a", "e", "o", "s")
+MIN_STEM_LENGTH = 3
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def _fold(text):
+    """
+    Minúsculas e sem acentos, como o tokenizador do índice (unicode61 com remove_diacritics).
+    """
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def stem(word):
+    """
+    Radical aproximado de uma palavra em português (já sem acentos), para que flexões como
+    "decidiu" / "decidido" / "decidir" ou "decisoes" / "decisao" sejam encontradas pela mesma busca.
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+def index_terms(text):
+    """
+    Termos indexados de um texto: radicais das palavras, sem as palavras frequentes.
+    """
+    return [stem(w) for w in WORD_PATTERN.findall(_fold(text)) if w not in STOPWORDS]
+
+def _fts_query(query):
+    """
+    Converte a consulta do usuário em uma expressão FTS5: todos os termos, cada um como prefixo.
+    """
+    return " ".join(f'"{term}"*' for term in dict.fromkeys(index_terms(query)))
+
+def _snippet(text, terms, words=SNIPPET_WORDS):
+    """
+    Trecho do documento original em torno da primeira palavra que corresponde a algum termo da consulta.
+    """
+    tokens = text.split()
+    hit = next((i for i, token in enumerate(tokens)
+                if any(t.startswith(term) for t in index_terms(token) for term in terms)), 0)
+    first = max(hit - words // 3, 0)
+    snippet = " ".join(tokens[first:first + words])
+    return ("…" if first > 0 else "") + snippet + ("…" if first + words < len(tokens) else "")
+
+def transcript_passages(transcript, passage_seconds=PASSAGE_SECONDS):
+    """
+    Agrupa as linhas da tabela de transcrição em trechos de até passage_seconds do mesmo falante.
+    Retorna uma lista de {"start", "end", "speaker", "text"}.
+    """
+    passages = []
+    for start, end, text, speaker in zip(transcript.start, transcript.end, transcript.text, transcript.speaker):
+        if not text:
+            continue
+        current = passages[-1] if passages else None
+        if current is None or current["speaker"] != speaker or start - current["start"] >= passage_seconds:
+            passages.append({"start": float(start), "end": float(end), "speaker": speaker, "text": [text]})
+        else:
+            current["end"] = float(end)
+            current["text"].append(text)
+    for passage in passages:
+        passage["text"] = " ".join(passage["text"])
+        passage["speaker"] = speaker_label(passage["speaker"]) if passage["speaker"] >= 0 else None
+    return passages
+
+class MeetingIndex:
+    """
+    Índice de busca em texto completo (SQLite FTS5) da transcrição, das atas parciais, da ata
+    consolidada e do resumo de cada reunião, com os metadados da reunião.
+
+    O texto original fica na tabela documents; o índice guarda os radicais das palavras (ver stem),
+    para que a busca encontre as flexões dos termos em português.
+    """
+
+    def __init__(self, db_path=INDEX_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def index_meeting(self, meeting_id, documents, title=None, created_at=None, duration_seconds=None,
+                      speakers=None, pdf_path=None):
+        """
+        Indexa (ou reindexa, substituindo a versão anterior) os documentos de uma reunião.
+
+        :param documents: lista de {"kind", "text"} com, opcionalmente, "part", "start", "end" e "speaker".
+        """
+        rows = [(meeting_id, doc["kind"], doc.get("part"), doc.get("start"), doc.get("end"), doc.get("speaker"),
+                 doc["text"], " ".join(index_terms(doc["text"]))) for doc in documents if doc["text"].strip()]
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM documents WHERE meeting_id = ?", (meeting_id,))
+            conn.execute("INSERT OR REPLACE INTO meetings (meeting_id, title, created_at, indexed_at, duration_seconds, "
+                         "speakers, pdf_path) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (meeting_id, title, created_at, time.time(), duration_seconds, speakers, pdf_path))
+            conn.executemany("INSERT INTO documents (meeting_id, kind, part, start_seconds, end_seconds, speaker, "
+                             "text, terms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        return len(rows)
+
+    def remove(self, meeting_id):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM documents WHERE meeting_id = ?", (meeting_id,))
+            conn.execute("DELETE FROM meetings WHERE meeting_id = ?", (meeting_id,))
+            conn.execute("COMMIT")
+
+    def search(self, query, limit=10, kinds=None, meeting_id=None):
+        """
+        Busca os documentos que contêm todos os termos da consulta, ordenados por relevância (BM25).
+
+        Retorna uma lista de dicionários com meeting_id, title, created_at, kind, part, start, end,
+        timestamp (hh:mm:ss na gravação, quando conhecido), speaker, score e snippet.
+        """
+        expression = _fts_query(query)
+        if not expression:
+            return []
+        sql = ("SELECT d.*, m.title, m.created_at, bm25(documents_fts) AS score FROM documents_fts "
+               "JOIN documents d ON d.doc_id = documents_fts.rowid JOIN meetings m ON m.meeting_id = d.meeting_id "
+               "WHERE documents_fts MATCH ?")
+        params = [expression]
+        if kinds:
+            sql += f" AND d.kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        if meeting_id:
+            sql += " AND d.meeting_id = ?"
+            params.append(meeting_id)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        terms = list(dict.fromkeys(index_terms(query)))
+        return [{
+            "meeting_id": row["meeting_id"],
+            "title": row["title"],
+            "created_at": row["created_at"],
+            "kind": row["kind"],
+            "part": row["part"],
+            "start": row["start_seconds"],
+            "end": row["end_seconds"],
+            "timestamp": format_timestamp(row["start_seconds"]) if row["start_seconds"] is not None else None,
+            "speaker": row["speaker"],
+            "score": -row["score"],
+            "snippet": _snippet(row["text"], terms),
+        } for row in rows]
+
+    def stats(self):
+        with self._connect() as conn:
+            meetings = conn.execute("SELECT COUNT(*) FROM meetings").fetchone()[0]
+            documents = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"meetings": meetings, "documents": documents}
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _output(manifest, stage, item=None):
+    """
+    Caminho da saída registrada no manifesto, se a etapa foi concluída e o arquivo ainda existe.
+    """
+    if not manifest.is_done(stage, item):
+        return None
+    path = manifest.get_output(stage, item)
+    return path if isinstance(path, str) and os.path.exists(path) else None
+
+def job_documents(manifest, time_ranges=None):
+    """
+    Documentos indexáveis de um job a partir das saídas registradas no manifesto.
+    Retorna (documentos, metadados da reunião).
+    """
+    documents, metadata = [], {}
+    transcription_path = _output(manifest, "transcricao")
+    if transcription_path and transcription_path.endswith(".txt"):
+        documents.append({"kind": "transcricao", "text": _read(transcription_path)})
+    elif transcription_path:
+        transcript = TranscriptTable.load(transcription_path)
+        for passage in transcript_passages(transcript):
+            documents.append({"kind": "transcricao", **passage})
+        if len(transcript):
+            metadata["duration_seconds"] = float(transcript.end.max())
+            metadata["speakers"] = int(transcript.speaker.max()) + 1 if transcript.has_speakers() else None
+
+    stage_data = manifest.data["stages"].get("atas_parciais", {"items": {}})
+    for item in sorted(stage_data["items"], key=int):
+        path = _output(manifest, "atas_parciais", item)
+        if path:
+            document = {"kind": "ata_parcial", "part": int(item) + 1, "text": _read(path)}
+            if time_ranges and int(item) < len(time_ranges):
+                document["start"], document["end"] = time_ranges[int(item)]
+            documents.append(document)
+
+    for stage in ("ata_consolidada", "resumo_extenso"):
+        path = _output(manifest, stage)
+        if path:
+            documents.append({"kind": stage, "text": _read(path)})
+
+    metadata["pdf_path"] = _output(manifest, "pdf")
+    return documents, metadata
+
+def index_job(manifest, time_ranges=None, index=None, log=print):
+    """
+    Indexa as saídas de um job concluído (chamado antes da remoção dos arquivos intermediários).
+    Falhas são apenas registradas: o índice não impede a entrega da ata.
+
+    :param time_ranges: intervalo (início, fim) de cada ata parcial na gravação, quando conhecido.
+    """
+    try:
+        documents, metadata = job_documents(manifest, time_ranges)
+        if not documents:
+            return 0
+        count = (index or MeetingIndex()).index_meeting(
+            manifest.job_id, documents, title=os.path.basename(manifest.data.get("input_file") or ""),
+            created_at=manifest.data.get("created_at"), **metadata)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        log(f"Não foi possível indexar o job '{manifest.job_id}' para busca: {e}")
+        return 0
+    log(f"Job '{manifest.job_id}' indexado para busca ({count} documentos).")
+    return count
+
+def index_jobs_dir(jobs_dir=JOBS_DIR, index=None, log=print):
+    """
+    Indexa os jobs já existentes em jobs_dir cujos arquivos intermediários foram mantidos
+    (ex: --manter-intermediarios). Retorna o número de jobs indexados.
+    """
+    index = index or MeetingIndex()
+    indexed = 0
+    for name in sorted(os.listdir(jobs_dir)) if os.path.isdir(jobs_dir) else []:
+        job_dir = os.path.join(jobs_dir, name)
+        if os.path.exists(os.path.join(job_dir, MANIFEST_FILE)):
+            indexed += bool(index_job(JobManifest.load(job_dir), index=index, log=log))
+    return indexed
+
+def format_hit(position, hit):
+    """
+    Formata um resultado da busca para o terminal.
+    """
+    where = KINDS.get(hit["kind"], hit["kind"])
+    if hit["part"]:
+        where += f" {hit['part']}"
+    if hit["timestamp"]:
+        where += f", {hit['timestamp']}"
+    if hit["speaker"]:
+        where += f", {hit['speaker']}"
+    header = f"{position}. {hit['title'] or hit['meeting_id']} [{hit['meeting_id']}] {hit['created_at'] or ''}"
+    return f"{header.rstrip()} — {where}\n   {hit['snippet']}"
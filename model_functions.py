@@ -1,19 +1,42 @@
 # -*- coding: utf-8 -*-
 import os
-from openai import OpenAI
-import ffmpeg
-import librosa
-import noisereduce as nr
-import soundfile as sf
-from pydub import AudioSegment
+import wave
 import glob
+import json
+import hashlib
+from cache import result_cache
+from audio_encoding import UPLOAD_CODEC, upload_segment_seconds
+from audio_segmenter import split_audio_on_silence, MAX_SECONDS
+from denoise import load_audio, reduce_noise, denoise_file_to_bytes
+from instrumentation import traced, record
+from api_client import api
+from transcript_store import format_timestamp
+from lazy_imports import lazy_import
 
-# chave da API OpenAI
-client = OpenAI(api_key="")  
+# Dependências de áudio importadas apenas na etapa que as usa
+ffmpeg = lazy_import("ffmpeg")
+sf = lazy_import("soundfile")
+pydub = lazy_import("pydub")
 
-def criar_pastas():
+def set_client(new_client):
+    """
+    Substitui o cliente assíncrono usado nas chamadas à API (ex: cliente falso dos benchmarks).
+    Retorna o cliente anterior.
+    """
+    return api.set_client(new_client)
+
+# Modelos e parâmetros usados nas chamadas à API (também compõem as chaves do cache)
+WHISPER_MODEL = "whisper-1"
+TRANSCRIPTION_LANGUAGE = "pt"
+CHAT_MODEL = "gpt-4"
+CHAT_TEMPERATURE = 0.5
+
+def criar_pastas(base_dir="."):
     """
     Cria todas as pastas necessárias para o processamento, organizadas por tipo de arquivo.
+
+    :param base_dir: diretório onde as pastas serão criadas (ex: o diretório de trabalho de um job).
+    :return: dicionário com o caminho de cada pasta.
     """
     pastas = {
         "upload": "arquivos_upload",  # Pasta para o arquivo de upload (ex: video_teste_medio.mp4)
@@ -27,12 +50,14 @@ def criar_pastas():
         "outros": "outros_arquivos"  # Pasta para outros arquivos gerados
     }
 
+    pastas = {nome: os.path.normpath(os.path.join(base_dir, caminho)) for nome, caminho in pastas.items()}
     for nome_pasta, caminho_pasta in pastas.items():
         if not os.path.exists(caminho_pasta):
             os.makedirs(caminho_pasta)
             print(f"Pasta '{caminho_pasta}' criada com sucesso para armazenar {nome_pasta}.")
         else:
             print(f"Pasta '{caminho_pasta}' já existe para armazenar {nome_pasta}.")
+    return pastas
 
 def upload_file(file_paths=None):
     """
@@ -79,29 +104,125 @@ def check_file_size(audio_path, max_size_mb=25):
     print(f"Tamanho do arquivo: {file_size_mb:.2f} MB")
     return file_size_mb <= max_size_mb
 
-def extract_and_split_audio_from_video(video_path, output_folder="segmentos_audio", max_segment_size_mb=24):
+@traced("extract_split", paths=("video_path",), returns_paths=True)
+def extract_and_split_audio_from_video(video_path, output_folder="segmentos_audio", max_segment_size_mb=24,
+                                       use_segment_muxer=True, codec=UPLOAD_CODEC, silence_aware=True):
     """
     Extrai o áudio do vídeo e divide em segmentos menores que 24 MB.
+
+    Com silence_aware=True (padrão) o áudio decodificado é cortado nas pausas da fala em segmentos
+    de poucos minutos (ver audio_segmenter). Caso contrário, com use_segment_muxer=True o ffmpeg
+    grava segmentos de duração fixa diretamente (muxer 'segment'), sem gerar o arquivo intermediário
+    full_audio.wav. A duração dos segmentos é limitada pelo tamanho do áudio codificado para envio (codec).
     """
+    os.makedirs(output_folder, exist_ok=True)
+    max_segment_seconds = upload_segment_seconds(max_segment_size_mb, codec)
+    if silence_aware:
+        return split_audio_on_silence(video_path, output_folder, max_seconds=min(MAX_SECONDS, max_segment_seconds))
+    if use_segment_muxer:
+        return extract_audio_segments_with_ffmpeg(video_path, output_folder, max_segment_seconds)
+
     #print("Extraindo áudio do vídeo...")
     audio_output_path = os.path.join(output_folder, "full_audio.wav")
     ffmpeg.input(video_path).output(audio_output_path, format='wav', acodec='pcm_s16le', ar='16000').run(quiet=True, overwrite_output=True)
     #print(f"Áudio extraído: {audio_output_path}")
 
     # Verificar e dividir o áudio
-    return split_audio_into_segments(audio_output_path, output_folder, max_segment_size_mb)
+    return split_audio_into_segments(audio_output_path, output_folder, max_segment_size_mb,
+                                     max_segment_seconds=max_segment_seconds)
+
+def extract_audio_segments_with_ffmpeg(video_path, output_folder, segment_time, sample_rate=16000):
+    """
+    Extrai o áudio do vídeo já dividido em segmentos WAV (PCM 16 bits) de segment_time segundos
+    usando o muxer 'segment' do ffmpeg.
+    """
+    # Remove segmentos de execuções anteriores para não misturá-los com os novos
+    for old_segment in glob.glob(os.path.join(output_folder, "segment_*.wav")):
+        os.remove(old_segment)
 
-def split_audio_into_segments(audio_path, output_folder, max_segment_size_mb):
+    print(f"Extraindo e dividindo áudio: {video_path} (segmentos de {segment_time}s)")
+    pattern = os.path.join(output_folder, "segment_%d.wav")
+    (
+        ffmpeg.input(video_path)
+        .output(pattern, format='segment', segment_time=segment_time, segment_start_number=1,
+                reset_timestamps=1, vn=None, acodec='pcm_s16le', ar=str(sample_rate))
+        .run(quiet=True, overwrite_output=True)
+    )
+
+    segments = sorted(glob.glob(os.path.join(output_folder, "segment_*.wav")),
+                      key=lambda p: int(os.path.basename(p)[len("segment_"):-len(".wav")]))
+    for segment_path in segments:
+        print(f"Segmento criado: {segment_path} (Tamanho: {os.path.getsize(segment_path) / (1024 * 1024):.2f} MB)")
+    return segments
+
+@traced("split", paths=("audio_path",), returns_paths=True)
+def split_audio_into_segments(audio_path, output_folder, max_segment_size_mb, block_frames=65536,
+                              max_segment_seconds=None):
     """
     Divide o áudio extraído em segmentos de até 24MB.
+
+    O WAV é lido em blocos de quadros PCM e cada segmento é gravado de forma incremental,
+    de modo que o uso de memória não depende da duração do áudio.
+
+    :param max_segment_seconds: duração máxima de cada segmento; quando informada, substitui
+        o cálculo baseado no tamanho do PCM (ex: segmentos dimensionados pelo áudio codificado).
     """
     print(f"Dividindo áudio: {audio_path}")
-    audio = AudioSegment.from_wav(audio_path)
+    os.makedirs(output_folder, exist_ok=True)
+
+    try:
+        wav_in = wave.open(audio_path, "rb")
+    except (wave.Error, EOFError) as e:
+        # Formatos não suportados pelo módulo wave (ex: float, WAVE_FORMAT_EXTENSIBLE)
+        print(f"Leitura em blocos indisponível para este WAV ({e}). Usando pydub.")
+        return split_audio_into_segments_pydub(audio_path, output_folder, max_segment_size_mb, max_segment_seconds)
+
+    segments = []
+    with wav_in:
+        params = wav_in.getparams()
+        frame_size = params.sampwidth * params.nchannels
+
+        # Calcular a duração do segmento baseado no tamanho máximo
+        bytes_per_second = params.framerate * frame_size
+        max_duration_ms = int((max_segment_size_mb * 1024 * 1024) / bytes_per_second * 1000)
+        if max_segment_seconds:
+            max_duration_ms = int(max_segment_seconds * 1000)
+        frames_per_segment = max(1, max_duration_ms * params.framerate // 1000)
+
+        while True:
+            block = wav_in.readframes(min(block_frames, frames_per_segment))
+            if not block:
+                break
+
+            segment_path = os.path.join(output_folder, f"segment_{len(segments) + 1}.wav")
+            with wave.open(segment_path, "wb") as wav_out:
+                wav_out.setparams(params)
+                written = 0
+                while block:
+                    wav_out.writeframesraw(block)
+                    written += len(block) // frame_size
+                    if written >= frames_per_segment:
+                        break
+                    block = wav_in.readframes(min(block_frames, frames_per_segment - written))
+
+            segments.append(segment_path)
+            print(f"Segmento criado: {segment_path} (Tamanho: {os.path.getsize(segment_path) / (1024 * 1024):.2f} MB)")
+
+    return segments
+
+def split_audio_into_segments_pydub(audio_path, output_folder, max_segment_size_mb, max_segment_seconds=None):
+    """
+    Divide o áudio em segmentos carregando o arquivo inteiro com o pydub.
+    Usado apenas para WAVs que o módulo wave não consegue ler.
+    """
+    audio = pydub.AudioSegment.from_wav(audio_path)
     os.makedirs(output_folder, exist_ok=True)
 
     # Calcular a duração do segmento baseado no tamanho máximo
     bytes_per_second = len(audio.raw_data) / (len(audio) / 1000)
     max_duration_ms = (max_segment_size_mb * 1024 * 1024) / bytes_per_second * 1000
+    if max_segment_seconds:
+        max_duration_ms = max_segment_seconds * 1000
 
     segments = []
     for i, start_ms in enumerate(range(0, len(audio), int(max_duration_ms))):
@@ -113,30 +234,38 @@ def split_audio_into_segments(audio_path, output_folder, max_segment_size_mb):
 
     return segments
 
+@traced("denoise", paths=("mp3_path",), returns_paths=True)
 def process_audio_mp3(mp3_path, output_dir):
     """
     Processa o áudio MP3, reduzindo ruído e salvando o arquivo limpo.
+    O MP3 é decodificado uma única vez em 16 kHz mono, taxa usada pelo Whisper.
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     print(f"Reduzindo ruído: {mp3_path}")
-    audio_data, sr = librosa.load(mp3_path, sr=None)
-    reduced_noise = nr.reduce_noise(y=audio_data, sr=sr)
+    audio_data, sr = load_audio(mp3_path)
+    reduced_noise, _ = reduce_noise(audio_data, sr)
 
-    output_audio_path = os.path.join(output_dir, f"cleaned_{os.path.basename(mp3_path)}")
-    sf.write(output_audio_path, reduced_noise, sr)
+    output_audio_path = os.path.join(output_dir, f"cleaned_{os.path.splitext(os.path.basename(mp3_path))[0]}.wav")
+    sf.write(output_audio_path, reduced_noise, sr, subtype="PCM_16")
     print(f"Áudio limpo salvo em: {output_audio_path}")
     return output_audio_path
 
-def process_audio_wav(wav_path, output_folder):
+def process_audio_wav(wav_path, output_folder, codec=UPLOAD_CODEC, silence_aware=True):
     """
-    Processa o áudio WAV diretamente dividindo-o em segmentos menores de 24 MB.
+    Processa o áudio WAV diretamente dividindo-o em segmentos menores de 24 MB
+    (medidos no codec de envio à API), cortados nas pausas da fala quando silence_aware=True.
     """
+    max_segment_seconds = upload_segment_seconds(24, codec)
+    if silence_aware:
+        return split_audio_on_silence(wav_path, output_folder, max_seconds=min(MAX_SECONDS, max_segment_seconds))
+
     print(f"Dividindo WAV diretamente: {wav_path}")
-    return split_audio_into_segments(wav_path, output_folder, 24)
+    return split_audio_into_segments(wav_path, output_folder, 24, max_segment_seconds=max_segment_seconds)
 
-def process_audio(audio_path, output_dir):
+@traced("denoise", paths=("audio_path",), returns_paths=True)
+def process_audio(audio_path, output_dir, noise_profile=None):
     """
     Reduz ruído no áudio e salva em um diretório específico.
     """
@@ -144,73 +273,168 @@ def process_audio(audio_path, output_dir):
         os.makedirs(output_dir)
 
     print(f"Reduzindo ruído: {audio_path}")
-    audio_data, sr = librosa.load(audio_path, sr=None)
-    reduced_noise = nr.reduce_noise(y=audio_data, sr=sr)
-
     output_audio_path = os.path.join(output_dir, f"cleaned_{os.path.basename(audio_path)}")
-    sf.write(output_audio_path, reduced_noise, sr)
+    with open(output_audio_path, "wb") as f:
+        f.write(denoise_file_to_bytes(audio_path, noise_profile))
     print(f"Áudio limpo salvo em: {output_audio_path}")
     return output_audio_path
 
+# Solicita também o tempo de cada palavra (além dos trechos) nas transcrições
+WORD_TIMESTAMPS = True
+
+@traced("whisper_request", paths=("audio",))
+def request_transcription_detailed(audio, file_name=None):
+    """
+    Envia o áudio para a API Whisper da OpenAI e retorna {"text", "segments", "words"}, com os tempos
+    (em segundos, relativos ao áudio enviado) de cada trecho e palavra. Falhas temporárias são repetidas
+    pela camada de API (ver api_client); falhas definitivas levantam ApiCallError para o chamador.
+
+    :param audio: caminho do arquivo ou bytes do áudio já codificado em memória.
+    :param file_name: nome enviado à API quando o áudio é passado em bytes (define o formato).
+    """
+    if isinstance(audio, str):
+        with open(audio, "rb") as audio_file:
+            audio_bytes = audio_file.read()
+        file_name = file_name or os.path.basename(audio)
+    else:
+        audio_bytes = bytes(audio)
+        file_name = file_name or "audio.wav"
+
+    cache_key = result_cache.make_key("transcricao_detalhada", hashlib.sha256(audio_bytes).hexdigest(),
+                                      WHISPER_MODEL, TRANSCRIPTION_LANGUAGE, str(WORD_TIMESTAMPS))
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print(f"Transcrição encontrada no cache: {file_name}")
+        record(cache_hits=1)
+        return cached
+
+    result, retries = api.transcribe(audio_bytes, file_name, WHISPER_MODEL, TRANSCRIPTION_LANGUAGE, WORD_TIMESTAMPS)
+    record(retries=retries)
+    result_cache.set(cache_key, result)
+    return result
+
+def request_transcription(audio, file_name=None):
+    """
+    Envia o áudio para a API Whisper da OpenAI e retorna apenas o texto (ver request_transcription_detailed).
+    """
+    return request_transcription_detailed(audio, file_name)["text"]
+
+@traced("transcribe", paths=("audio_path",))
 def transcribe_audio(audio_path):
     """
-    Transcreve o áudio usando a API Whisper da OpenAI.
+    Transcreve o áudio usando a API Whisper da OpenAI. Levanta ApiCallError se a transcrição falhar.
     """
     print(f"Transcrevendo: {audio_path}")
-    try:
-        with open(audio_path, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="pt"
-            )
-        return transcript.text
-    except Exception as e:
-        print(f"Erro ao transcrever áudio: {e}")
-        return None
-
-def split_text_by_length(text, max_char_length=8000):
-    """
-    Divide o texto em partes menores para garantir que cada parte não ultrapasse o limite da API.
-    """
-    print("Texto muito longo. Dividindo em partes...")
-    parts = []
-    while len(text) > max_char_length:
-        split_index = text[:max_char_length].rfind('.')  # Encontrar o último ponto para dividir de forma natural
-        if split_index == -1:
-            split_index = max_char_length  # Divisão forçada se não encontrar ponto
-        parts.append(text[:split_index + 1])
-        text = text[split_index + 1:].strip()
-    parts.append(text)
-    print(f"Texto dividido em {len(parts)} partes.")
-    return parts
-
-def summarize_text_as_minutes(text, part_number=1):
+    return request_transcription(audio_path)
+
+# Modelos que aceitam response_format={"type": "json_object"}; nos demais, o JSON é pedido apenas no prompt
+JSON_MODE_MODELS = ("gpt-4-turbo", "gpt-4o", "gpt-4o-mini", "gpt-4-1106-preview", "gpt-4-0125-preview")
+
+@traced("chat_request")
+def chat_completion(system_content, prompt, on_token=None, json_output=False, validate=None):
     """
-    Gera uma ata de reunião no formato especificado usando GPT-4.
+    Executa uma chamada de chat no modelo configurado, reutilizando respostas em cache
+    para o mesmo modelo, temperatura e texto de prompt. Levanta ApiCallError se a chamada falhar.
+
+    :param on_token: se informado, a resposta é recebida em streaming e cada trecho é repassado a esta função.
+    :param json_output: pede a resposta como um objeto JSON (modo JSON nos modelos que o suportam).
+    :param validate: função que levanta ValueError se a resposta não puder ser usada; respostas inválidas
+        não são gravadas no cache, e uma entrada em cache que não passe na validação é descartada.
     """
-    prompt = f"""
-    Você é um assistente especializado em gerar atas de reuniões. A partir da transcrição a seguir, gere uma ata no formato:
+    cache_key = result_cache.make_key("chat", CHAT_MODEL, str(CHAT_TEMPERATURE), system_content, prompt,
+                                      "json" if json_output else "texto")
+    cached = result_cache.get(cache_key)
+    if cached is not None and validate is not None:
+        try:
+            validate(cached)
+        except ValueError:
+            cached = None
+    if cached is not None:
+        print("Resposta encontrada no cache.")
+        record(cache_hits=1)
+        if on_token:
+            on_token(cached)
+        return cached
+
+    # As instruções fixas vêm primeiro (mensagem de sistema) e o conteúdo variável por último, para que
+    # o prefixo comum das chamadas seja reaproveitado pelo cache de prompts da API
+    messages = [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": prompt}
+    ]
+    response_format = {"type": "json_object"} if json_output and CHAT_MODEL in JSON_MODE_MODELS else None
+    content, usage, retries = api.chat(messages, CHAT_MODEL, CHAT_TEMPERATURE, on_token, response_format)
+    record(retries=retries)
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        record(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens,
+               cached_prompt_tokens=getattr(details, "cached_tokens", None) or 0)
+    if validate is not None:
+        validate(content)
+    result_cache.set(cache_key, content)
+    return content
+
+MINUTES_FORMAT = """1. Principais Tópicos: Liste os principais assuntos discutidos.
+2. Ações e Responsáveis: Identifique ações importantes e quem são os responsáveis.
+3. Métricas e Decisões: Liste números, decisões e acordos feitos."""
+
+# Instruções fixas de cada chamada, enviadas como mensagem de sistema; o prompt do usuário leva apenas o conteúdo
+MINUTES_SYSTEM_PROMPT = f"""Você é um assistente especializado em gerar atas de reuniões. A partir da transcrição recebida, gere uma ata no formato:
+
+{MINUTES_FORMAT}
+
+A ata deve estar na norma culta da língua portuguesa e devidamente bem detalhada.
+Quando a transcrição tiver marcações [hh:mm:ss], indique o horário aproximado de cada tópico e decisão.
+Quando as falas estiverem identificadas como "Falante N:", use essas identificações para atribuir propostas,
+decisões e ações aos respectivos falantes."""
+
+FULL_SUMMARY_SYSTEM_PROMPT = """Você é um assistente especialista em criar resumos extensos e detalhados de atas.
+Você receberá várias atas de uma reunião. Gere um resumo total, extenso e detalhado, contendo o máximo de informações possíveis,
+porém em um único parágrafo. O objetivo é criar um texto longo que resuma com precisão tudo que foi discutido."""
+
+AGGREGATED_MINUTES_SYSTEM_PROMPT = f"""Você é um assistente especialista em criar atas consolidadas e detalhadas.
+Você receberá várias atas de uma reunião. Agregue todas em uma única ata, escolhendo as principais informações de cada uma.
+Use a norma culta da língua portuguesa e siga o formato abaixo:
+
+{MINUTES_FORMAT}"""
+
+FINAL_OUTPUTS_SYSTEM_PROMPT = f"""Você é um assistente especialista em resumos e atas de reuniões.
+Você receberá várias atas de uma reunião e deve gerar, a partir delas, duas saídas:
+
+- "resumo_extenso": um resumo total, extenso e detalhado, contendo o máximo de informações possíveis, porém em um único
+parágrafo. O objetivo é criar um texto longo que resuma com precisão tudo que foi discutido.
+- "ata_consolidada": todas as atas agregadas em uma única ata, com as principais informações de cada uma,
+na norma culta da língua portuguesa e no formato abaixo (com quebras de linha entre os itens):
 
-    1. Principais Tópicos: Liste os principais assuntos discutidos.
-    2. Ações e Responsáveis: Identifique ações importantes e quem são os responsáveis.
-    3. Métricas e Decisões: Liste números, decisões e acordos feitos.
+{MINUTES_FORMAT}
 
-    A ata deve estar na norma culta da língua portuguesa e devidamente bem detalhada.
+Responda apenas com um objeto JSON com as chaves "resumo_extenso" e "ata_consolidada", ambas com texto."""
 
-    Transcrição (Parte {part_number}):
-    {text}
+def build_minutes_prompt(text, part_number=1, time_range=None):
     """
+    Monta o prompt de geração da ata parcial (também usado para medir o custo fixo do template em tokens).
+    As instruções ficam em MINUTES_SYSTEM_PROMPT; aqui entram apenas a parte e seu trecho da gravação.
 
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "Você é um assistente especialista em atas de reuniões."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.5
-    )
-    return response.choices[0].message.content
+    :param time_range: intervalo (início, fim) em segundos da parte na gravação.
+    """
+    timing = ""
+    if time_range is not None:
+        timing = f"Trecho da gravação: {format_timestamp(time_range[0])} a {format_timestamp(time_range[1])}.\n"
+    return f"{timing}Transcrição (Parte {part_number}):\n{text}"
+
+def build_final_prompt(meeting_parts):
+    """
+    Prompt das saídas finais: apenas as atas, comum ao resumo extenso, à ata consolidada e à chamada combinada.
+    """
+    return f"Atas:\n{meeting_parts}"
+
+@traced("summarize_part")
+def summarize_text_as_minutes(text, part_number=1, on_token=None, time_range=None):
+    """
+    Gera uma ata de reunião no formato especificado usando GPT-4.
+    """
+    prompt = build_minutes_prompt(text, part_number, time_range)
+    return chat_completion(MINUTES_SYSTEM_PROMPT, prompt, on_token)
 
 def read_meeting_parts_from_directory(directory, file_pattern="*.txt"):
     """
@@ -237,52 +461,166 @@ def combine_meeting_parts(meeting_parts):
     print("Todas as partes foram combinadas em uma única ata.")
     return combined_text
 
-def generate_full_summary(meeting_parts):
+@traced("full_summary")
+def generate_full_summary(meeting_parts, on_token=None):
     """
     Gera um resumo extenso e detalhado de todas as atas em um único parágrafo.
     """
-    prompt = f"""
-    Abaixo estão várias atas de uma reunião. Gere um resumo total, extenso e detalhado, contendo o máximo de informações possíveis,
-    porém em um único parágrafo. O objetivo é criar um texto longo que resuma com precisão tudo que foi discutido.
-
-    Atas:
-    {meeting_parts}
-
-    Resumo Extenso e Detalhado:
-    """
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "Você é um assistente especialista em criar resumos extensos e detalhados de atas."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.5
-    )
-    return response.choices[0].message.content
+    return chat_completion(FULL_SUMMARY_SYSTEM_PROMPT, build_final_prompt(meeting_parts), on_token)
 
-def generate_aggregated_minutes(meeting_parts):
+@traced("aggregated_minutes")
+def generate_aggregated_minutes(meeting_parts, on_token=None):
     """
     Agrega todas as atas em uma só ata com um formato estruturado.
     """
-    prompt = f"""
-    Abaixo estão várias atas de uma reunião. Agrege todas em uma única ata, escolhendo as principais informações de cada uma.
-    Use a norma culta da língua portuguesa e siga o formato abaixo:
-
-    1. Principais Tópicos: Liste os principais assuntos discutidos.
-    2. Ações e Responsáveis: Identifique ações importantes e quem são os responsáveis.
-    3. Métricas e Decisões: Liste números, decisões e acordos feitos.
-
-    Atas:
-    {meeting_parts}
-
-    Ata Consolidada:
-    """
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "Você é um assistente especialista em criar atas consolidadas e detalhadas."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.5
-    )
-    return response.choices[0].message.content
\ No newline at end of file
+    return chat_completion(AGGREGATED_MINUTES_SYSTEM_PROMPT, build_final_prompt(meeting_parts), on_token)
+
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class JsonFieldStream:
+    """
+    Decodifica aos poucos os campos de texto de um objeto JSON recebido em streaming, repassando o texto
+    de cada campo a on_field(chave, trecho) à medida que chega. Texto antes do objeto (ex: abertura de um
+    bloco de código) é ignorado, assim como valores que não sejam texto (números, null, booleanos, listas
+    e objetos); a resposta completa continua sendo validada ao final por quem a recebeu.
+
+    :param fields: chaves repassadas (as demais são decodificadas e descartadas).
+    """
+
+    def __init__(self, on_field, fields=None):
+        self._on_field = on_field
+        self._fields = fields
+        self._state = "inicio"
+        self._key = []
+        self._field = None
+        self._text = []
+        self._escape = None  # None fora de um escape; "" logo após a barra; "u..." durante um \uXXXX
+        self._high_surrogate = None
+        self._depth = 0  # Aninhamento dentro de um valor ignorado
+        self._skip_string = False
+        self._skip_escape = False
+
+    def _decode(self, ch):
+        """
+        Decodifica um caractere de uma string JSON: retorna o texto resultante ou None no fim da string.
+        """
+        if self._escape is None:
+            if ch == "\\":
+                self._escape = ""
+                return ""
+            return None if ch == '"' else ch
+        if self._escape == "":
+            if ch == "u":
+                self._escape = "u"
+                return ""
+            self._escape = None
+            return _JSON_ESCAPES.get(ch, ch)
+        self._escape += ch
+        if len(self._escape) < 5:
+            return ""
+        try:
+            code = int(self._escape[1:], 16)
+        except ValueError:
+            code = 0xFFFD
+        self._escape = None
+        # Caracteres fora do plano básico chegam como um par de \uXXXX
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _skip(self, ch):
+        """
+        Consome um caractere de um valor que não é texto, até a vírgula ou o fecho do objeto principal.
+        """
+        if self._skip_string:
+            if self._skip_escape:
+                self._skip_escape = False
+            elif ch == "\\":
+                self._skip_escape = True
+            elif ch == '"':
+                self._skip_string = False
+        elif ch == '"':
+            self._skip_string = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}":
+            if self._depth:
+                self._depth -= 1
+            else:
+                self._state = "fim"
+        elif ch == "," and not self._depth:
+            self._state = "objeto"
+
+    def _flush(self):
+        if self._text and (self._fields is None or self._field in self._fields):
+            self._on_field(self._field, "".join(self._text))
+        self._text = []
+
+    def feed(self, chunk):
+        for ch in chunk:
+            if self._state in ("chave", "texto"):
+                decoded = self._decode(ch)
+                if decoded is None and self._state == "chave":
+                    self._field = "".join(self._key)
+                    self._state = "dois_pontos"
+                elif decoded is None:
+                    self._flush()
+                    self._state = "virgula"
+                elif self._state == "chave":
+                    self._key.append(decoded)
+                else:
+                    self._text.append(decoded)
+            elif self._state == "inicio" and ch == "{":
+                self._state = "objeto"
+            elif self._state == "objeto" and ch == '"':
+                self._key = []
+                self._state = "chave"
+            elif self._state == "dois_pontos" and ch == ":":
+                self._state = "valor"
+            elif self._state == "valor" and ch == '"':
+                self._state = "texto"
+            elif self._state == "valor" and not ch.isspace():
+                self._state = "ignorar"
+                self._skip(ch)
+            elif self._state == "ignorar":
+                self._skip(ch)
+            elif self._state == "virgula" and ch == ",":
+                self._state = "objeto"
+        if self._state == "texto":
+            self._flush()
+
+FINAL_OUTPUT_FIELDS = ("resumo_extenso", "ata_consolidada")
+
+@traced("final_outputs")
+def generate_final_outputs_combined(meeting_parts, on_token=None):
+    """
+    Gera o resumo extenso e a ata consolidada em uma única chamada, com resposta em JSON,
+    enviando as atas uma só vez. Retorna (resumo, ata) ou levanta ValueError se a resposta não for válida.
+
+    :param on_token: função (chave, trecho) que recebe em streaming o texto já decodificado de cada saída,
+        com chave "resumo_extenso" ou "ata_consolidada".
+    """
+    stream = JsonFieldStream(on_token, FINAL_OUTPUT_FIELDS).feed if on_token else None
+    content = chat_completion(FINAL_OUTPUTS_SYSTEM_PROMPT, build_final_prompt(meeting_parts), stream,
+                              json_output=True, validate=_parse_final_outputs)
+    return _parse_final_outputs(content)
+
+
+def _parse_final_outputs(content):
+    """
+    Extrai (resumo, ata) da resposta combinada, ou levanta ValueError se ela não for válida.
+    """
+    # Modelos sem modo JSON podem envolver o objeto em texto ou em um bloco de código
+    start, end = content.find("{"), content.rfind("}")
+    try:
+        outputs = json.loads(content[start:end + 1])
+        full_summary, aggregated_minutes = (outputs[field] for field in FINAL_OUTPUT_FIELDS)
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Resposta combinada inválida: {e}") from e
+    if not isinstance(full_summary, str) or not isinstance(aggregated_minutes, str):
+        raise ValueError("Resposta combinada inválida: as saídas devem ser texto.")
+    return full_summary, aggregated_minutes
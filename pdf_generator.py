@@ -1,70 +1,111 @@
+import io
 import os
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.pdfgen import canvas
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_RIGHT
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import os
+import threading
 from datetime import datetime
 import pytz
+from instrumentation import traced
+from lazy_imports import lazy_import
 
+# O ReportLab só é importado ao gerar o primeiro PDF
+pagesizes = lazy_import("reportlab.lib.pagesizes")
+rl_styles = lazy_import("reportlab.lib.styles")
+rl_enums = lazy_import("reportlab.lib.enums")
+platypus = lazy_import("reportlab.platypus")
+pdfmetrics = lazy_import("reportlab.pdfbase.pdfmetrics")
+ttfonts = lazy_import("reportlab.pdfbase.ttfonts")
 
-def gerar_pdf_resumo_ata(full_summary, aggregated_minutes, arquivo_saida="documento_final.pdf"):
-    pasta_saida = "pdf"
-    if not os.path.exists(pasta_saida):
-        os.makedirs(pasta_saida)
+# Fontes TrueType usadas no documento (nome registrado no reportlab, arquivo)
+FONTS = {"Arial": "Arial.ttf", "Arial-Bold": "Arialbd.ttf"}
+TIMEZONE = "America/Sao_Paulo"
 
-    caminho_pdf = os.path.join(pasta_saida, arquivo_saida)
 
-    # Configuração das fontes
-    pdfmetrics.registerFont(TTFont('Arial', 'Arial.ttf'))
-    pdfmetrics.registerFont(TTFont('Arial-Bold', 'Arialbd.ttf'))
-
-    # Configuração do documento PDF
-    doc = SimpleDocTemplate(caminho_pdf, pagesize=A4, 
-                            leftMargin=50, rightMargin=50, 
-                            topMargin=50, bottomMargin=50)
-
-    # Estilos de parágrafo
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Centered', fontSize=11, fontName='Arial', alignment=1, spaceAfter=6))
-    styles.add(ParagraphStyle(name='CustomTitle', fontSize=14, fontName='Arial-Bold', alignment=1, spaceAfter=12))
-    styles.add(ParagraphStyle(name='SubTitle', fontSize=14, fontName='Arial-Bold', alignment=1, spaceAfter=12))
-    
-    # Define a new 'Justified' style or modify an existing one
-    styles.add(ParagraphStyle(name='Justified', 
-                              parent=styles['Normal'], 
-                              alignment=TA_JUSTIFY, 
-                              spaceAfter=6))
-
-    story = []
-
-    # Adicionar data
-    story.append(Paragraph(f"Data: {datetime.now(pytz.timezone('America/Sao_Paulo')).strftime('%d/%m/%Y %H:%M:%S')}", styles['Centered']))
-    story.append(Spacer(1, 20))  # Espaço após a data
-
-    # Função para adicionar seções
-    def adicionar_secao(titulo, texto):
+class PdfRenderer:
+    """
+    Gera o PDF do resumo e da ata. As fontes são registradas e os estilos criados uma única vez,
+    e o mesmo objeto pode gerar vários documentos (ex: todos os jobs de um worker).
+    """
+
+    def __init__(self, fonts=FONTS):
+        # Fontes já registradas (ex: por outro renderizador do processo) não são lidas novamente
+        registered = set(pdfmetrics.getRegisteredFontNames())
+        for name, path in fonts.items():
+            if name not in registered:
+                pdfmetrics.registerFont(ttfonts.TTFont(name, path))
+
+        # Estilos de parágrafo
+        ParagraphStyle = rl_styles.ParagraphStyle
+        styles = rl_styles.getSampleStyleSheet()
+        styles.add(ParagraphStyle(name='Centered', fontSize=11, fontName='Arial', alignment=1, spaceAfter=6))
+        styles.add(ParagraphStyle(name='CustomTitle', fontSize=14, fontName='Arial-Bold', alignment=1, spaceAfter=12))
+        styles.add(ParagraphStyle(name='SubTitle', fontSize=14, fontName='Arial-Bold', alignment=1, spaceAfter=12))
+        styles.add(ParagraphStyle(name='Justified',
+                                  parent=styles['Normal'],
+                                  alignment=rl_enums.TA_JUSTIFY,
+                                  spaceAfter=6))
+        # A folha padrão já tem um estilo 'Bullet'; este é o usado nas linhas com marcador
+        styles.add(ParagraphStyle(name='JustifiedBullet', parent=styles['Justified'], leftIndent=20))
+        self.styles = styles
+
+    def _adicionar_secao(self, story, titulo, texto):
+        styles, Paragraph = self.styles, platypus.Paragraph
         story.append(Paragraph(titulo, styles['CustomTitle']))
-        story.append(Spacer(1, 12))  # Espaço após o título principal
-        
+        story.append(platypus.Spacer(1, 12))  # Espaço após o título principal
+
         for linha in texto.split("\n"):
-            if linha.startswith("1.") or linha.startswith("2.") or linha.startswith("3."):
+            if linha.startswith(("1.", "2.", "3.")):
                 story.append(Paragraph(linha, styles['SubTitle']))
             elif linha.strip().startswith("●"):
-                story.append(Paragraph(linha, ParagraphStyle('Bullet', parent=styles['Justified'], leftIndent=20)))
+                story.append(Paragraph(linha, styles['JustifiedBullet']))
             else:
-                story.append(Paragraph(linha, styles['Justified']))  # Use the new 'Justified' style
+                story.append(Paragraph(linha, styles['Justified']))
+
+    def render(self, full_summary, aggregated_minutes, output, generated_at=None):
+        """
+        Gera o documento em output: caminho de arquivo ou buffer binário (ex: io.BytesIO).
 
-    # Adicionar seções
-    adicionar_secao("Resumo Extenso e Detalhado", full_summary)
-    adicionar_secao("Ata Consolidada", aggregated_minutes)
+        :param generated_at: data exibida no documento; por padrão, o momento atual.
+        """
+        generated_at = generated_at or datetime.now(pytz.timezone(TIMEZONE))
+        doc = platypus.SimpleDocTemplate(output, pagesize=pagesizes.A4,
+                                leftMargin=50, rightMargin=50,
+                                topMargin=50, bottomMargin=50)
 
-    # Construir o documento
-    doc.build(story)
+        story = []
+        story.append(platypus.Paragraph(f"Data: {generated_at.strftime('%d/%m/%Y %H:%M:%S')}", self.styles['Centered']))
+        story.append(platypus.Spacer(1, 20))  # Espaço após a data
+        self._adicionar_secao(story, "Resumo Extenso e Detalhado", full_summary)
+        self._adicionar_secao(story, "Ata Consolidada", aggregated_minutes)
+        doc.build(story)
+        return output
+
+    def render_bytes(self, full_summary, aggregated_minutes, generated_at=None):
+        """
+        Gera o documento em memória e retorna seus bytes, sem gravar arquivo.
+        """
+        buffer = io.BytesIO()
+        self.render(full_summary, aggregated_minutes, buffer, generated_at)
+        return buffer.getvalue()
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_renderer():
+    """
+    Renderizador compartilhado pelo processo, criado na primeira chamada.
+    """
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PdfRenderer()
+        return _renderer
+
+@traced("pdf", returns_paths=True)
+def gerar_pdf_resumo_ata(full_summary, aggregated_minutes, arquivo_saida="documento_final.pdf", pasta_saida="pdf"):
+    if not os.path.exists(pasta_saida):
+        os.makedirs(pasta_saida)
+
+    caminho_pdf = os.path.join(pasta_saida, arquivo_saida)
+    get_renderer().render(full_summary, aggregated_minutes, caminho_pdf)
 
-    print(f"PDF gerado com sucesso: {caminho_pdf}")
\ No newline at end of file
+    print(f"PDF gerado com sucesso: {caminho_pdf}")
+    return caminho_pdf
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import os
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from cache import result_cache, hash_file
+from audio_encoding import upload_extension
+from denoise import load_audio, estimate_noise_profile, denoise_file_to_bytes, denoise_settings
+from model_functions import TRANSCRIPTION_LANGUAGE
+from transcription_backends import get_transcriber, MAX_WORKERS_LOCAL
+from instrumentation import bind_job
+
+# Concorrência padrão do pipeline de segmentos
+MAX_WORKERS_DENOISE = os.cpu_count() or 1  # Processos para redução de ruído (CPU)
+MAX_WORKERS_TRANSCRICAO = 8  # Chamadas simultâneas à API Whisper (limitadas por RPM em api_client)
+
+def estimar_ruido(origem_ruido):
+    """
+    Estima o perfil de ruído a partir do áudio indicado. Retorna (perfil, hash do áudio de origem),
+    no formato aceito pelo parâmetro ruido de processar_segmentos.
+    """
+    return estimate_noise_profile(load_audio(origem_ruido)[0]), hash_file(origem_ruido)
+
+def processar_segmentos(segments, max_workers_denoise=MAX_WORKERS_DENOISE,
+                        max_workers_transcricao=MAX_WORKERS_TRANSCRICAO, log=print,
+                        transcricoes_existentes=None, ao_transcrever=None, codec=None, progress=None,
+                        pool_cpu=None, pool_api=None, transcriber=None, pool_local=None, origem_ruido=None,
+                        ruido=None):
+    """
+    Reduz o ruído dos segmentos em paralelo (pool de processos) e, à medida que cada segmento fica pronto,
+    envia-o para transcrição: em um pool limitado de threads (API) ou em um pool de processos
+    que mantém o modelo carregado (mecanismo local, ver transcription_backends).
+
+    Retorna (transcricoes, falhas): os resultados {"text", "segments", "words"} na ordem dos segmentos
+    (None nos que falharam), com os tempos relativos a cada segmento, e um dicionário
+    {índice: mensagem de erro} com a falha de cada segmento não transcrito.
+
+    O perfil de ruído é estimado uma única vez por gravação, sempre a partir do primeiro segmento, e o
+    áudio limpo segue em memória até a transcrição, sem gravar arquivos intermediários. A chave de cache
+    de cada segmento inclui a origem do perfil (hash do áudio de onde foi estimado) e os parâmetros da
+    redução de ruído, já que ambos alteram o áudio enviado para transcrição.
+
+    :param log: função chamada na thread principal para reportar o progresso (ex: print ou st.write).
+    :param transcricoes_existentes: dicionário {índice: resultado} de segmentos já concluídos (ex: job retomado).
+    :param ao_transcrever: função (índice, resultado) chamada na thread principal para cada segmento transcrito com sucesso.
+    :param codec: codec do áudio limpo (ver audio_encoding.UPLOAD_CODECS); por padrão, o do mecanismo de transcrição.
+    :param progress: ProgressTracker opcional que recebe o avanço das etapas 'denoise' e 'transcricao'.
+    :param pool_cpu, pool_api: pools compartilhados entre várias gravações (ex: modo em lote); sem eles,
+        pools próprios são criados com max_workers_denoise e max_workers_transcricao.
+    :param transcriber: mecanismo de transcrição (ver transcription_backends.get_transcriber); por padrão, o configurado.
+    :param pool_local: pool de processos compartilhado para o mecanismo local, iniciado com transcriber.warm_up.
+    :param origem_ruido: áudio de onde o perfil de ruído é estimado; por padrão, o primeiro segmento
+        (ex: na reunião ao vivo, cujos segmentos são processados um a um, o primeiro segmento da gravação).
+    :param ruido: (perfil, hash da origem) já calculados com estimar_ruido, para quem chama a função várias
+        vezes com a mesma origem; dispensa origem_ruido.
+    """
+    transcriber = transcriber or get_transcriber()
+    codec = codec or transcriber.upload_codec
+    transcricoes_existentes = transcricoes_existentes or {}
+    total = len(segments)
+    transcricoes = [None] * total
+    falhas = {}
+
+    with ExitStack() as stack:
+        # Pools compartilhados pertencem a quem os criou e não são encerrados aqui
+        if pool_cpu is None:
+            pool_cpu = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers_denoise))
+        if transcriber.runs_in_process:
+            if pool_local is None:
+                # Cada processo carrega o modelo ao iniciar e o reutiliza em todos os segmentos
+                pool_local = stack.enter_context(ProcessPoolExecutor(max_workers=MAX_WORKERS_LOCAL,
+                                                                     initializer=transcriber.warm_up))
+            pool_transcricao = pool_local
+        else:
+            if pool_api is None:
+                pool_api = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers_transcricao))
+            pool_transcricao = pool_api
+
+        # Segmentos já transcritos em execuções anteriores dispensam a redução de ruído e a chamada à API
+        segment_keys = {}
+        denoise_futures = {}
+        noise_profile, noise_source_hash = ruido or (None, None)
+        origem_ruido = origem_ruido or (segments[0] if segments else None)
+        for idx, segment_path in enumerate(segments):
+            if idx in transcricoes_existentes:
+                transcricoes[idx] = transcricoes_existentes[idx]
+                log(f"Segmento {idx+1}/{total} já transcrito neste job.")
+                continue
+            if noise_source_hash is None:
+                noise_source_hash = hash_file(origem_ruido)
+            segment_keys[idx] = result_cache.make_key("segmento_detalhado", hash_file(segment_path),
+                                                      transcriber.cache_id, TRANSCRIPTION_LANGUAGE, codec,
+                                                      noise_source_hash, denoise_settings())
+            cached = result_cache.get(segment_keys[idx])
+            if cached is not None:
+                transcricoes[idx] = cached
+                log(f"Segmento {idx+1}/{total} encontrado no cache.")
+                if ao_transcrever:
+                    ao_transcrever(idx, cached)
+                continue
+            if noise_profile is None:
+                # Perfil de ruído estimado no primeiro segmento da gravação (mesmo que já transcrito)
+                # e reutilizado nos demais, para que não dependa de quais segmentos estão pendentes
+                noise_profile = estimate_noise_profile(load_audio(origem_ruido)[0])
+            future = pool_cpu.submit(bind_job(denoise_file_to_bytes), segment_path, noise_profile, codec=codec)
+            denoise_futures[future] = idx
+
+        if progress:
+            done = total - len(denoise_futures)
+            progress.start_stage("denoise", total=total, done=done)
+            progress.start_stage("transcricao", total=total, done=done)
+
+        transcricao_futures = {}
+        for future in as_completed(denoise_futures):
+            idx = denoise_futures.pop(future)
+            try:
+                cleaned_audio = future.result()
+            except Exception as e:
+                falhas[idx] = f"Redução de ruído: {e}"
+                log(f"Falha ao limpar o segmento {idx+1}/{total}: {e}")
+                continue
+            log(f"Segmento {idx+1}/{total} limpo. Enviando para transcrição...")
+            if progress:
+                progress.advance("denoise")
+            file_name = f"cleaned_{os.path.splitext(os.path.basename(segments[idx]))[0]}.{upload_extension(codec)}"
+            future = pool_transcricao.submit(bind_job(transcriber.transcribe), cleaned_audio, file_name)
+            transcricao_futures[future] = idx
+
+        for future in as_completed(transcricao_futures):
+            idx = transcricao_futures[future]
+            try:
+                transcricoes[idx] = future.result()
+            except Exception as e:
+                falhas[idx] = str(e)
+                log(f"Falha ao transcrever o segmento {idx+1}/{total}: {e}")
+                continue
+            result_cache.set(segment_keys[idx], transcricoes[idx])
+            if ao_transcrever:
+                ao_transcrever(idx, transcricoes[idx])
+            if progress:
+                progress.advance("transcricao")
+            log(f"Segmento {idx+1}/{total} transcrito.")
+
+    return transcricoes, falhas
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import time
+import queue
+import threading
+
+# Etapas do pipeline, na ordem em que são exibidas
+STAGES = {
+    "segmentacao": "Segmentação do áudio",
+    "diarizacao": "Identificação dos falantes",
+    "denoise": "Redução de ruído",
+    "transcricao": "Transcrição",
+    "atas_parciais": "Atas parciais",
+    "reducao": "Consolidação das atas",
+    "resumo_extenso": "Resumo extenso",
+    "ata_consolidada": "Ata consolidada",
+    "pdf": "Geração do PDF",
+}
+
+class ProgressTracker:
+    """
+    Modelo de progresso por etapa (concluídos, total, ETA) publicado como um fluxo de eventos.
+
+    Os métodos podem ser chamados de qualquer thread; os consumidores (CLI ou Streamlit) leem os
+    eventos com events() em sua própria thread. Cada evento é um dicionário com a chave "type":
+    - "stage": progresso de uma etapa (stage, done, total, eta_seconds, elapsed_seconds)
+    - "message": mensagem de log (text)
+    - "token": trecho de texto gerado pelo modelo em streaming (stage, text)
+    - "reset": o texto em streaming da etapa foi descartado e será gerado novamente (stage)
+    - "partial": resultado parcial concluído, como uma ata parcial (stage, index, text)
+    - "done": fim do processamento (result ou error)
+
+    Com on_event, os eventos são entregues diretamente a essa função (na thread que os gerou)
+    em vez de enfileirados para events().
+    """
+
+    def __init__(self, on_event=None):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._on_event = on_event
+
+    def _emit(self, event):
+        if self._on_event:
+            self._on_event(event)
+        else:
+            self._queue.put(event)
+
+    def _stage_event(self, stage):
+        data = self._stages[stage]
+        elapsed = time.monotonic() - data["started_at"]
+        eta = None
+        if data["total"] and data["done"]:
+            eta = elapsed / data["done"] * (data["total"] - data["done"])
+        return {"type": "stage", "stage": stage, "label": STAGES.get(stage, stage), "done": data["done"],
+                "total": data["total"], "eta_seconds": eta, "elapsed_seconds": elapsed}
+
+    def start_stage(self, stage, total=None, done=0):
+        with self._lock:
+            self._stages[stage] = {"total": total, "done": done, "started_at": time.monotonic()}
+            event = self._stage_event(stage)
+        self._emit(event)
+
+    def advance(self, stage, amount=1):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = {"total": None, "done": 0, "started_at": time.monotonic()}
+            self._stages[stage]["done"] += amount
+            event = self._stage_event(stage)
+        self._emit(event)
+
+    def complete_stage(self, stage):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = {"total": 1, "done": 0, "started_at": time.monotonic()}
+            data = self._stages[stage]
+            data["total"] = data["total"] or max(data["done"], 1)
+            data["done"] = data["total"]
+            event = self._stage_event(stage)
+        self._emit(event)
+
+    def message(self, text):
+        self._emit({"type": "message", "text": text})
+
+    def token(self, stage, text):
+        self._emit({"type": "token", "stage": stage, "text": text})
+
+    def reset_tokens(self, stage):
+        self._emit({"type": "reset", "stage": stage})
+
+    def partial(self, stage, index, text):
+        self._emit({"type": "partial", "stage": stage, "index": index, "text": text})
+
+    def finish(self, result=None, error=None):
+        self._emit({"type": "done", "result": result, "error": error})
+
+    def events(self):
+        """
+        Itera sobre os eventos publicados até o evento "done" (inclusive).
+        """
+        while True:
+            event = self._queue.get()
+            yield event
+            if event["type"] == "done":
+                return
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+class TerminalPrinter:
+    """
+    Consumidor do fluxo de eventos para o terminal. O texto em streaming de uma etapa é exibido
+    ao vivo; o de etapas simultâneas é acumulado e exibido quando a etapa termina.
+    """
+
+    def __init__(self):
+        self._live_stage = None
+        self._buffers = {}
+
+    def __call__(self, event):
+        if event["type"] == "message":
+            print(event["text"])
+        elif event["type"] == "stage":
+            if event["total"] and event["done"] >= event["total"]:
+                self._flush(event["stage"])
+            total = event["total"] if event["total"] is not None else "?"
+            print(f"[{event['label']}] {event['done']}/{total} (ETA {format_eta(event['eta_seconds'])})")
+        elif event["type"] == "token":
+            if self._live_stage is None:
+                self._live_stage = event["stage"]
+                print(f"\n### {STAGES.get(event['stage'], event['stage'])} ###\n")
+                print("".join(self._buffers.pop(event["stage"], [])), end="")
+            if event["stage"] == self._live_stage:
+                print(event["text"], end="", flush=True)
+            else:
+                self._buffers.setdefault(event["stage"], []).append(event["text"])
+        elif event["type"] == "reset":
+            self._buffers.pop(event["stage"], None)
+            if event["stage"] == self._live_stage:
+                print(f"\n\n[Texto descartado; gerando {STAGES.get(event['stage'], event['stage']).lower()} novamente]\n")
+                self._live_stage = None
+        elif event["type"] == "partial":
+            print(f"\n### Ata Parte {event['index'] + 1} ###\n\n{event['text']}\n")
+        elif event["type"] == "done" and event["error"]:
+            print(f"Erro durante o processamento: {event['error']}")
+
+    def _flush(self, stage):
+        if stage == self._live_stage:
+            print("\n")
+            self._live_stage = None
+        elif stage in self._buffers:
+            print(f"\n### {STAGES.get(stage, stage)} ###\n")
+            print("".join(self._buffers.pop(stage)))
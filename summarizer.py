@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import os
+from functools import partial
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from model_functions import (summarize_text_as_minutes, generate_full_summary, generate_aggregated_minutes,
+                             generate_final_outputs_combined, build_final_prompt, FULL_SUMMARY_SYSTEM_PROMPT,
+                             AGGREGATED_MINUTES_SYSTEM_PROMPT, FINAL_OUTPUTS_SYSTEM_PROMPT, FINAL_OUTPUT_FIELDS,
+                             CHAT_MODEL, JSON_MODE_MODELS)
+from text_chunker import count_tokens
+from instrumentation import bind_job
+
+MAX_WORKERS_SUMMARY = 4  # Chamadas simultâneas ao GPT-4
+MAX_REDUCE_INPUT_CHARS = 12000  # Tamanho máximo das atas enviadas juntas em uma chamada
+MAX_REDUCE_ROUNDS = 10
+# Resumo extenso e ata consolidada em uma única chamada com resposta em JSON ("0" volta às duas chamadas).
+# Por padrão, apenas nos modelos com modo JSON; nos demais a resposta pode não ser um objeto válido
+COMBINED_FINAL_OUTPUTS = os.environ.get("ATAS_SAIDAS_COMBINADAS",
+                                        "1" if CHAT_MODEL in JSON_MODE_MODELS else "0") != "0"
+
+def _api_pool(stack, pool, max_workers):
+    """
+    Usa o pool compartilhado recebido (ex: modo em lote) ou cria um pool próprio, encerrado junto com o stack.
+    """
+    if pool is not None:
+        return pool
+    return stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+
+def summarize_parts(parts, max_workers=MAX_WORKERS_SUMMARY, existing=None, on_done=None, log=print, progress=None,
+                    pool=None, time_ranges=None):
+    """
+    Etapa de map: gera a ata de cada parte da transcrição em paralelo, preservando a ordem das partes.
+
+    :param existing: dicionário {índice: ata} de partes já concluídas (ex: job retomado).
+    :param on_done: função (índice, ata) chamada na thread principal para cada parte concluída.
+    :param progress: ProgressTracker opcional que recebe o avanço da etapa e cada ata parcial concluída.
+    :param pool: pool de chamadas à API compartilhado; sem ele, um pool de max_workers threads é criado.
+    :param time_ranges: intervalos (início, fim) em segundos de cada parte na gravação, citados nas atas.
+    """
+    existing = existing or {}
+    summaries = [existing.get(i) for i in range(len(parts))]
+    if progress:
+        progress.start_stage("atas_parciais", total=len(parts), done=len(existing))
+
+    with ExitStack() as stack:
+        pool = _api_pool(stack, pool, max_workers)
+        futures = {}
+        for i, part in enumerate(parts):
+            if i in existing:
+                log(f"Ata da Parte {i+1} já gerada anteriormente.")
+                continue
+            log(f"Gerando a ata da Parte {i+1}/{len(parts)}...")
+            time_range = time_ranges[i] if time_ranges else None
+            futures[pool.submit(bind_job(summarize_text_as_minutes), part, i + 1, time_range=time_range)] = i
+
+        for future in as_completed(futures):
+            i = futures[future]
+            summaries[i] = future.result()
+            if on_done:
+                on_done(i, summaries[i])
+            if progress:
+                progress.advance("atas_parciais")
+                progress.partial("atas_parciais", i, summaries[i])
+            log(f"Ata da Parte {i+1} concluída.")
+
+    return summaries
+
+def _group_minutes(minutes, max_input_chars):
+    """
+    Agrupa atas consecutivas cujo texto combinado cabe em max_input_chars.
+    """
+    groups, current, size = [], [], 0
+    for text in minutes:
+        added = len(text) + (1 if current else 0)
+        if current and size + added > max_input_chars:
+            groups.append(current)
+            current, size = [], 0
+            added = len(text)
+        current.append(text)
+        size += added
+    if current:
+        groups.append(current)
+    return groups
+
+def reduce_minutes(minutes, max_input_chars=MAX_REDUCE_INPUT_CHARS, max_workers=MAX_WORKERS_SUMMARY, log=print,
+                   progress=None, pool=None):
+    """
+    Etapa de reduce: enquanto as atas não couberem juntas em uma única chamada, funde grupos
+    consecutivos de tamanho limitado em paralelo (redução em árvore). O número de rodadas cresce
+    com log(partes), e cada chamada recebe no máximo max_input_chars.
+    """
+    minutes = list(minutes)
+    for round_number in range(1, MAX_REDUCE_ROUNDS + 1):
+        if len("\n".join(minutes)) <= max_input_chars:
+            break
+
+        groups = _group_minutes(minutes, max_input_chars)
+        condense_all = all(len(group) == 1 for group in groups)
+        if condense_all:
+            log("Atas individuais muito longas; condensando cada uma antes de agrupar.")
+
+        def merge(group):
+            # Atas isoladas passam adiante sem nova chamada, exceto quando nenhuma pôde ser agrupada
+            if len(group) == 1 and not condense_all:
+                return group[0]
+            return generate_aggregated_minutes("\n".join(group))
+
+        log(f"Redução {round_number}: {len(minutes)} atas em {len(groups)} grupos...")
+        if progress:
+            progress.start_stage("reducao", total=len(groups))
+        with ExitStack() as stack:
+            round_pool = _api_pool(stack, pool, max_workers)
+            futures = [round_pool.submit(bind_job(merge), group) for group in groups]
+            for future in as_completed(futures):
+                future.result()
+                if progress:
+                    progress.advance("reducao")
+            minutes = [future.result() for future in futures]
+    return minutes
+
+def final_outputs_tokens(combined_text):
+    """
+    Tokens de entrada estimados das saídas finais: (chamada combinada, duas chamadas separadas).
+    """
+    prompt_tokens = count_tokens(build_final_prompt(combined_text))
+    combined = prompt_tokens + count_tokens(FINAL_OUTPUTS_SYSTEM_PROMPT)
+    separate = (2 * prompt_tokens + count_tokens(FULL_SUMMARY_SYSTEM_PROMPT)
+                + count_tokens(AGGREGATED_MINUTES_SYSTEM_PROMPT))
+    return combined, separate
+
+def generate_final_outputs(meeting_parts, max_workers=2, need_summary=True, need_minutes=True, on_token=None,
+                           pool=None, combined=COMBINED_FINAL_OUTPUTS, log=print, on_reset=None):
+    """
+    Gera o resumo extenso e a ata consolidada a partir das atas já reduzidas. Saídas não solicitadas
+    (ex: já concluídas em um job retomado) retornam None.
+
+    Com combined=True e as duas saídas pendentes, as atas são enviadas uma única vez e as duas saídas
+    voltam em um objeto JSON; se a resposta não for válida, as saídas são geradas em duas chamadas paralelas.
+
+    :param on_token: função (etapa, trecho) que recebe em streaming o texto de cada saída, com etapa
+        "resumo_extenso" ou "ata_consolidada" (na chamada combinada, decodificado do JSON à medida que chega).
+    :param on_reset: função (etapa) chamada quando o texto já repassado de uma saída é descartado
+        (resposta combinada inválida, gerada novamente nas chamadas separadas).
+    """
+    combined_text = "\n".join(meeting_parts)
+    if combined and need_summary and need_minutes:
+        combined_tokens, separate_tokens = final_outputs_tokens(combined_text)
+        log(f"Saídas finais em uma chamada: ~{combined_tokens} tokens de entrada "
+            f"(~{separate_tokens} em duas chamadas).")
+        try:
+            return generate_final_outputs_combined(combined_text, on_token)
+        except ValueError as e:
+            log(f"{e}. Gerando as saídas em duas chamadas.")
+            if on_token and on_reset:
+                for stage in FINAL_OUTPUT_FIELDS:
+                    on_reset(stage)
+
+    summary_tokens = partial(on_token, "resumo_extenso") if on_token else None
+    minutes_tokens = partial(on_token, "ata_consolidada") if on_token else None
+    with ExitStack() as stack:
+        pool = _api_pool(stack, pool, max_workers)
+        summary_future = pool.submit(bind_job(generate_full_summary), combined_text, summary_tokens) if need_summary else None
+        minutes_future = pool.submit(bind_job(generate_aggregated_minutes), combined_text, minutes_tokens) if need_minutes else None
+        full_summary = summary_future.result() if summary_future else None
+        aggregated_minutes = minutes_future.result() if minutes_future else None
+    return full_summary, aggregated_minutes
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from api_client import ApiClient, ApiCallError, TokenBucket
+
+
+class ServiceUnavailable(Exception):
+    status_code = 503
+
+
+def _chunk(text):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FlakyStreamClient:
+    """
+    Cliente falso cujo primeiro streaming falha com HTTP 503 depois de dois trechos.
+    """
+
+    def __init__(self, fail_after=2):
+        self.calls = 0
+        self.fail_after = fail_after
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        first = self.calls == 1
+
+        async def stream():
+            for i, text in enumerate(["t1 ", "t2 ", "t3 ", "t4 "]):
+                if first and i == self.fail_after:
+                    raise ServiceUnavailable("serviço indisponível")
+                yield _chunk(text)
+        return stream()
+
+
+def _client(fake):
+    client = ApiClient()
+    client.configure(chat_rpm=0, chat_tpm=0, max_attempts=3)
+    client.set_client(fake)
+    return client
+
+
+def test_stream_interrompido_nao_repete_texto_entregue():
+    fake, tokens = FlakyStreamClient(), []
+    with pytest.raises(ApiCallError) as error:
+        _client(fake).chat([{"role": "user", "content": "oi"}], "gpt-4o", 0, on_token=tokens.append)
+    assert fake.calls == 1
+    assert tokens == ["t1 ", "t2 "]
+    assert error.value.status_code == 503
+
+
+def test_falha_antes_do_primeiro_trecho_e_repetida(monkeypatch):
+    monkeypatch.setattr("api_client._retry_delay", lambda error, attempt: 0)
+    fake, tokens = FlakyStreamClient(fail_after=0), []
+    content, _, retries = _client(fake).chat([{"role": "user", "content": "oi"}], "gpt-4o", 0,
+                                             on_token=tokens.append)
+    assert content == "t1 t2 t3 t4 "
+    assert "".join(tokens) == content
+    assert retries == 1
+
+
+class FakeClock:
+    """
+    Relógio controlado pelo teste: asyncio.sleep apenas avança o tempo e registra a espera.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr("api_client.time.monotonic", fake.monotonic)
+    monkeypatch.setattr("api_client.asyncio.sleep", fake.sleep)
+    return fake
+
+
+def test_token_bucket_libera_a_rajada_e_depois_espera_a_reposicao(clock):
+    bucket = TokenBucket(per_minute=60, burst_seconds=10)  # 1 por segundo, rajada de 10
+
+    async def run():
+        for _ in range(10):
+            await bucket.acquire()
+        await bucket.acquire(3)
+    asyncio.run(run())
+
+    assert clock.sleeps == [pytest.approx(3.0)]
+    assert bucket.tokens == pytest.approx(0.0)
+
+
+def test_token_bucket_ajusta_pelo_consumo_real(clock):
+    bucket = TokenBucket(per_minute=600, burst_seconds=10)  # Capacidade de 100
+    asyncio.run(bucket.acquire(50))
+    bucket.adjust(30)  # Consumiu 30 a mais que o estimado
+    assert bucket.tokens == pytest.approx(20.0)
+    bucket.adjust(-500)  # A devolução não passa da capacidade
+    assert bucket.tokens == pytest.approx(100.0)
+    # Pedidos maiores que a capacidade são limitados a ela, em vez de esperar para sempre
+    asyncio.run(bucket.acquire(1000))
+    assert clock.sleeps == []
+
+
+def test_token_bucket_sem_limite_nao_espera(clock):
+    bucket = TokenBucket(per_minute=0)
+    asyncio.run(bucket.acquire(10 ** 6))
+    assert clock.sleeps == []
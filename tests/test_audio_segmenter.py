@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import wave
+
+import numpy as np
+
+from audio_segmenter import SilenceSegmenter, stitch_transcriptions
+
+SR = 16000
+
+
+def _tone(seconds):
+    t = np.arange(int(seconds * SR)) / SR
+    return (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16)
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.int16)
+
+
+def _segment(pcm, folder):
+    segmenter = SilenceSegmenter(str(folder), sr=SR, target_seconds=2, min_seconds=1, max_seconds=3,
+                                 overlap_seconds=0.3)
+    data = pcm.tobytes()
+    # Blocos que não coincidem com os quadros, como os lidos do ffmpeg
+    for i in range(0, len(data), 4001):
+        segmenter.feed(data[i:i + 4001])
+    return segmenter.finish()
+
+
+def test_corte_natural_na_pausa_sem_sobreposicao(tmp_path):
+    segments = _segment(np.concatenate([_tone(1.5), _silence(0.6), _tone(1.5)]), tmp_path)
+    assert len(segments) == 2
+    assert 1.5 <= segments[0]["end_seconds"] <= 2.1
+    assert segments[1]["start_seconds"] == segments[0]["end_seconds"]
+    assert [s["overlap_seconds"] for s in segments] == [0, 0]
+    # O excedente da pausa longa não é enviado, e a linha do tempo registra o salto
+    assert segments[1]["duration_seconds"] < segments[1]["end_seconds"] - segments[1]["start_seconds"]
+    assert len(segments[1]["timeline"]) == 2
+
+
+def test_corte_forcado_repete_a_sobreposicao(tmp_path):
+    segments = _segment(_tone(7), tmp_path)
+    assert [s["start_seconds"] for s in segments] == [0.0, 2.7, 5.4]
+    assert [s["overlap_seconds"] for s in segments] == [0, 0.3, 0.3]
+    assert max(s["duration_seconds"] for s in segments) <= 3.0
+    with wave.open(segments[0]["path"]) as f:
+        assert f.getframerate() == SR and f.getnframes() == 3 * SR
+
+
+def test_stitch_sem_sobreposicao_mantem_repeticoes_legitimas():
+    texts = ["Vamos votar. Sim, sim.", "Sim, sim. Aprovado."]
+    assert stitch_transcriptions(texts) == "Vamos votar. Sim, sim.\nSim, sim. Aprovado.\n"
+    assert stitch_transcriptions(texts, [0.0, 0.0]) == "Vamos votar. Sim, sim.\nSim, sim. Aprovado.\n"
+
+
+def test_stitch_remove_palavras_repetidas_pelo_corte_forcado():
+    texts = ["o orçamento foi aprovado por todos", "aprovado por todos os presentes"]
+    assert stitch_transcriptions(texts, [0.0, 1.5]) == ("o orçamento foi aprovado por todos\n"
+                                                         "os presentes\n")
+
+
+def test_stitch_limita_a_comparacao_ao_tempo_sobreposto():
+    texts = ["a b c d e f g h", "c d e f g h i"]
+    # Meio segundo de sobreposição cabe em no máximo 2 palavras; uma repetição maior não vem do corte
+    assert stitch_transcriptions(texts, [0.0, 0.5]) == "a b c d e f g h\nc d e f g h i\n"
+    assert stitch_transcriptions(texts, [0.0, 1.5]) == "a b c d e f g h\ni\n"
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from cache import DiskCache
+
+
+def test_sobrescrever_entrada_conta_so_a_diferenca_de_tamanho(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set("ab" * 32, "x")
+    cache.set("cd" * 32, "y" * 100)
+    for _ in range(3):
+        cache.set("cd" * 32, "z" * 10)
+    assert cache._size_bytes == cache._scan_size()
+    assert cache.get("cd" * 32) == "z" * 10
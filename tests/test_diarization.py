@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from diarization import _merge_clusters
+
+
+def test_merge_clusters_junta_vozes_proximas_e_numera_por_tamanho():
+    rng = np.random.default_rng(0)
+    voices = rng.normal(size=(2, 16))
+    sums = [voices[i % 2] + rng.normal(scale=0.05, size=16) for i in range(8)]
+    counts = np.array([1, 5, 1, 5, 1, 5, 1, 5])
+    speaker_of = _merge_clusters(sums, counts, threshold=0.3, max_speakers=10)
+    # A voz 2 (grupos ímpares) tem mais janelas e vira o Falante 1
+    assert list(speaker_of) == [1, 0, 1, 0, 1, 0, 1, 0]
+
+
+def test_merge_clusters_respeita_o_maximo_de_falantes():
+    rng = np.random.default_rng(1)
+    sums = list(rng.normal(size=(6, 16)))
+    speaker_of = _merge_clusters(sums, np.ones(6, dtype=int), threshold=0.0, max_speakers=2)
+    assert sorted(set(speaker_of)) == [0, 1]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import instrumentation
+from instrumentation import record, traced
+
+
+def test_etapas_aninhadas_nao_repetem_valores_e_so_medem_caminhos_declarados(monkeypatch, tmp_path):
+    entries = []
+    monkeypatch.setattr(instrumentation.tracer, "write", entries.append)
+    audio = tmp_path / "parte.wav"
+    audio.write_bytes(b"x" * 100)
+
+    @traced("interna")
+    def inner(text):
+        record(prompt_tokens=5)
+
+    @traced("externa", paths=("path",), returns_paths=True)
+    def outer(path, text):
+        inner(text)
+        record(prompt_tokens=1)
+        return [path]
+
+    outer(str(audio), str(audio))
+
+    inner_entry, outer_entry = entries
+    assert (inner_entry["prompt_tokens"], outer_entry["prompt_tokens"]) == (5, 1)
+    # O texto é medido pelo conteúdo, mesmo quando coincide com um caminho existente
+    assert inner_entry["bytes_in"] == len(str(audio).encode("utf-8"))
+    assert outer_entry["bytes_in"] == 100 + len(str(audio).encode("utf-8"))
+    assert outer_entry["bytes_out"] == 100
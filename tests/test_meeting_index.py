@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from meeting_index import MeetingIndex, stem, index_terms
+
+
+def test_stem_agrupa_flexoes_do_mesmo_verbo():
+    assert stem("decidiu") == stem("decidido") == stem("decidir") == stem("decidimos") == stem("decidiram")
+    assert stem("aprovou") == stem("aprovado") == stem("aprovar")
+
+
+def test_stem_agrupa_singular_e_plural():
+    assert stem("decisoes") == stem("decisao")
+    assert index_terms("Decisões") == index_terms("decisão")
+
+
+def _index(tmp_path):
+    index = MeetingIndex(str(tmp_path / "indice.db"))
+    index.index_meeting("reuniao-1", [
+        {"kind": "transcricao", "text": "Depois da discussão, o conselho decidiu aprovar o orçamento de 2025.",
+         "start": 754.0, "end": 780.0, "speaker": "Falante 2"},
+        {"kind": "ata_consolidada", "text": "Decisões: orçamento aprovado por unanimidade."},
+    ], title="Conselho")
+    index.index_meeting("reuniao-2", [
+        {"kind": "transcricao", "text": "Cronograma da obra revisado.", "start": 10.0, "end": 20.0},
+    ], title="Obras")
+    return index
+
+
+def test_busca_encontra_flexoes_e_traz_o_horario(tmp_path):
+    hits = _index(tmp_path).search("decidido orçamentos")
+    assert [(hit["meeting_id"], hit["kind"]) for hit in hits] == [("reuniao-1", "transcricao")]
+    assert hits[0]["timestamp"] == "00:12:34"
+    assert hits[0]["speaker"] == "Falante 2"
+    assert "decidiu" in hits[0]["snippet"]
+
+
+def test_busca_filtra_por_tipo_e_reuniao_e_reindexa(tmp_path):
+    index = _index(tmp_path)
+    assert [hit["kind"] for hit in index.search("orçamento", kinds=["ata_consolidada"])] == ["ata_consolidada"]
+    assert index.search("orçamento", meeting_id="reuniao-2") == []
+    assert index.search("de o") == []  # Apenas palavras frequentes
+
+    # Reindexar substitui os documentos anteriores da reunião
+    index.index_meeting("reuniao-1", [{"kind": "resumo_extenso", "text": "Resumo sem relação."}])
+    assert index.search("orçamento") == []
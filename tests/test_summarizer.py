@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import model_functions
+import summarizer
+from api_client import ApiClient
+from cache import result_cache
+from model_functions import JsonFieldStream
+
+
+def _chunk(text):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class ScriptedClient:
+    """
+    Cliente falso que responde em streaming, em trechos de 7 caracteres, com a resposta escolhida
+    a partir da mensagem de sistema de cada chamada.
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.systems = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, messages, **kwargs):
+        self.systems.append(messages[0]["content"])
+        content = self.answer(messages[0]["content"])
+
+        async def stream():
+            for i in range(0, len(content), 7):
+                yield _chunk(content[i:i + 7])
+        return stream()
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path):
+    monkeypatch.setattr(result_cache, "directory", str(tmp_path))
+
+    def install(answer):
+        client = ApiClient()
+        client.configure(chat_rpm=0, chat_tpm=0, max_attempts=1)
+        fake = ScriptedClient(answer)
+        client.set_client(fake)
+        monkeypatch.setattr(model_functions, "api", client)
+        return fake
+    return install
+
+
+def _collect():
+    received = {}
+
+    def on_token(stage, text):
+        received.setdefault(stage, []).append(text)
+    return received, on_token
+
+
+def test_json_field_stream_decodifica_campos_em_qualquer_particao():
+    payload = "```json\n" + json.dumps({"resumo_extenso": 'Linha 1\nAspas "x" e \\ ação 😀',
+                                        "outro": 3, "ata_consolidada": "Item\t1"}) + "\n```"
+    for size in (1, 2, 5, len(payload)):
+        received, on_token = _collect()
+        stream = JsonFieldStream(on_token)
+        for i in range(0, len(payload), size):
+            stream.feed(payload[i:i + size])
+        assert "".join(received["resumo_extenso"]) == 'Linha 1\nAspas "x" e \\ ação 😀'
+        assert "outro" not in received
+
+
+def test_json_field_stream_ignora_valores_que_nao_sao_texto():
+    payloads = {'{"n": 1, "resumo_extenso": "Resumo."}': {"resumo_extenso": "Resumo."},
+                '{"a":"x","n":null,"b":"y"}': {"a": "x", "b": "y"},
+                '{"l": [1, {"s": "]\\"}"}], "ok": true, "b": "y"}': {"b": "y"}}
+    for payload, expected in payloads.items():
+        for size in (1, 3, len(payload)):
+            received, on_token = _collect()
+            stream = JsonFieldStream(on_token, fields=("a", "b", "resumo_extenso"))
+            for i in range(0, len(payload), size):
+                stream.feed(payload[i:i + size])
+            assert {stage: "".join(parts) for stage, parts in received.items()} == expected
+
+
+def test_chamada_combinada_repassa_o_texto_em_streaming(fake_api):
+    outputs = {"resumo_extenso": "Resumo da reunião.", "ata_consolidada": "1. Principais Tópicos: orçamento."}
+    fake = fake_api(lambda system: json.dumps(outputs, ensure_ascii=False))
+    received, on_token = _collect()
+    resets = []
+
+    result = summarizer.generate_final_outputs(["Ata 1", "Ata 2"], on_token=on_token, combined=True,
+                                               log=lambda text: None, on_reset=resets.append)
+
+    assert result == (outputs["resumo_extenso"], outputs["ata_consolidada"])
+    assert len(fake.systems) == 1
+    # O texto chega aos poucos, não inteiro ao final
+    assert len(received["resumo_extenso"]) > 1
+    assert {stage: "".join(parts) for stage, parts in received.items()} == outputs
+    assert resets == []
+
+
+def test_resposta_combinada_invalida_volta_as_duas_chamadas(fake_api):
+    def answer(system):
+        if system == model_functions.FINAL_OUTPUTS_SYSTEM_PROMPT:
+            return '{"resumo_extenso": "Texto parcial", "ata_consolidada": '
+        if system == model_functions.FULL_SUMMARY_SYSTEM_PROMPT:
+            return "Resumo."
+        return "Ata."
+    fake = fake_api(answer)
+    received, on_token = _collect()
+    resets = []
+
+    def reset(stage):
+        resets.append(stage)
+        received.pop(stage, None)
+
+    result = summarizer.generate_final_outputs(["Ata 1"], on_token=on_token, combined=True,
+                                               log=lambda text: None, on_reset=reset)
+
+    assert result == ("Resumo.", "Ata.")
+    assert len(fake.systems) == 3
+    assert sorted(resets) == ["ata_consolidada", "resumo_extenso"]
+    assert {stage: "".join(parts) for stage, parts in received.items()} == {"resumo_extenso": "Resumo.",
+                                                                           "ata_consolidada": "Ata."}
+
+
+def test_resposta_combinada_invalida_nao_fica_no_cache(fake_api):
+    answers = ['{"resumo_extenso": "Texto parcial"}',
+               json.dumps({"resumo_extenso": "Resumo.", "ata_consolidada": "Ata."})]
+    fake = fake_api(lambda system: answers[len(fake.systems) - 1])
+    _, on_token = _collect()
+
+    with pytest.raises(ValueError):
+        model_functions.generate_final_outputs_combined(["Ata 1"], on_token)
+    # A nova execução chama a API de novo em vez de reaproveitar a resposta inválida, e a válida fica no cache
+    for _ in range(2):
+        assert model_functions.generate_final_outputs_combined(["Ata 1"], on_token) == ("Resumo.", "Ata.")
+    assert len(fake.systems) == 2
+
+
+def test_reduce_minutes_funde_em_arvore_ate_caber(monkeypatch):
+    calls = []
+
+    def merge(text):
+        calls.append(text)
+        return "r" * 30
+    monkeypatch.setattr(summarizer, "generate_aggregated_minutes", merge)
+
+    result = summarizer.reduce_minutes(["a" * 40] * 8, max_input_chars=100, log=lambda text: None)
+
+    # Rodada 1: 4 grupos de 2 atas; rodada 2: um grupo de 3 resumos, e o último passa adiante sem chamada
+    assert all(len(text) <= 100 for text in calls)
+    assert len(calls) == 5
+    assert result == ["r" * 30] * 2
+
+
+def test_reduce_minutes_para_no_limite_de_rodadas(monkeypatch):
+    rounds = []
+
+    def merge(text):
+        rounds.append(text)
+        return text  # Um modelo que não condensa nunca faria a redução terminar
+    monkeypatch.setattr(summarizer, "generate_aggregated_minutes", merge)
+    monkeypatch.setattr(summarizer, "MAX_REDUCE_ROUNDS", 3)
+
+    result = summarizer.reduce_minutes(["a" * 200] * 2, max_input_chars=100, log=lambda text: None)
+
+    # Atas isoladas maiores que o limite são condensadas uma a uma, em cada uma das 3 rodadas
+    assert len(rounds) == 6
+    assert result == ["a" * 200] * 2
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from text_chunker import split_table_by_tokens, count_tokens
+from transcript_store import TranscriptTable, format_timestamp
+
+
+def _table(rows, speakers=None):
+    start, end, text = zip(*rows)
+    return TranscriptTable(list(start), list(end), list(text), speaker=speakers)
+
+
+def test_sem_falantes_mantem_concordancias_e_repeticoes():
+    table = _table([(0, 2, "Vamos votar."), (2, 3, "Sim."), (3, 4, "Sim."), (4, 6, "Aprovado.")])
+    [part] = split_table_by_tokens(table, max_tokens=500)
+    assert part["text"].endswith("Vamos votar. Sim. Sim. Aprovado.")
+
+
+def test_hesitacao_omitida_apenas_na_fala_sobreposta():
+    table = _table([(0, 4, "Proponho o orçamento."), (3.5, 4.5, "Hum, tá."), (5, 6, "Sim."), (6, 8, "Aprovado.")],
+                   speakers=[0, 1, 1, 0])
+    turns = [[0, 4, 0], [4, 6, 1], [6, 8, 0]]
+    [part] = split_table_by_tokens(table, max_tokens=500, turns=turns)
+    # "Hum, tá." começa no turno do Falante 1; "Sim." está inteiro no turno do próprio falante
+    assert "Hum" not in part["text"]
+    assert "Falante 2: Sim." in part["text"]
+
+
+def test_partes_respeitam_o_limite_e_levam_o_intervalo():
+    rows = [(i * 10.0, i * 10.0 + 9, f"Frase número {i} sobre o andamento do projeto.") for i in range(30)]
+    parts = split_table_by_tokens(_table(rows), max_tokens=60)
+    assert len(parts) > 1
+    assert all(count_tokens(part["text"]) <= 60 for part in parts)
+    assert parts[0]["start"] == 0.0 and parts[-1]["end"] == 299.0
+    assert all(a["end"] <= b["start"] for a, b in zip(parts, parts[1:]))
+    # Cada parte começa com uma marcação de tempo
+    assert all(part["text"].startswith("[") for part in parts)
+    assert parts[1]["text"].startswith(f"[{format_timestamp(parts[1]['start'])}]")
+
+
+def test_turnos_comecam_em_nova_linha_com_o_falante():
+    table = _table([(0, 2, "Bom dia."), (2, 4, "Vamos começar."), (4, 6, "Concordo.")], speakers=[0, 0, 1])
+    [part] = split_table_by_tokens(table, max_tokens=500)
+    assert part["text"] == "[00:00:00] Falante 1: Bom dia. Vamos começar.\nFalante 2: Concordo."
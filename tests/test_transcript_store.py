@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from transcript_store import TranscriptTable
+
+
+def _results():
+    timelines = [{"timeline": [[0.0, 0.0]], "duration_seconds": 10.0},
+                 # Segundo segmento com 1 s de sobreposição e uma pausa longa encurtada em 4 s
+                 {"timeline": [[0.0, 9.0], [3.0, 16.0]], "duration_seconds": 8.0}]
+    results = [
+        {"text": "Bom dia a todos. Vamos começar.",
+         "segments": [{"start": 0.0, "end": 4.0, "text": " Bom dia a todos.", "confidence": 0.9},
+                      {"start": 4.5, "end": 9.8, "text": " Vamos começar."}]},
+        {"text": "começar. Pauta aprovada, ação!",
+         "segments": [{"start": 0.0, "end": 0.8, "text": "começar."},
+                      {"start": 1.0, "end": 2.5, "text": "Pauta aprovada,"},
+                      {"start": 3.5, "end": 5.0, "text": "ação!"}]},
+    ]
+    return results, timelines
+
+
+def test_from_results_leva_os_tempos_a_gravacao_e_descarta_a_sobreposicao():
+    table = TranscriptTable.from_results(*_results())
+    assert table.text == ["Bom dia a todos.", "Vamos começar.", "Pauta aprovada,", "ação!"]
+    assert table.start.tolist() == [0.0, 4.5, 10.0, 16.5]
+    assert table.end.tolist() == [4.0, 9.8, 11.5, 18.0]
+    assert table.chunk.tolist() == [0, 0, 1, 1]
+    assert table.confidence[0] == pytest.approx(0.9) and np.isnan(table.confidence[1])
+
+
+@pytest.mark.parametrize("extension", ["npz", "parquet"])
+def test_tabela_gravada_e_lida_sem_perdas(tmp_path, extension):
+    if extension == "parquet":
+        pytest.importorskip("pyarrow")
+    table = TranscriptTable.from_results(*_results())
+    table.assign_speakers({"turns": [[0.0, 9.9, 0], [9.9, 20.0, 1]]})
+
+    loaded = TranscriptTable.load(table.save(str(tmp_path / f"transcript.{extension}")))
+
+    assert loaded.text == table.text
+    for column in ("start", "end", "chunk", "speaker"):
+        assert getattr(loaded, column).tolist() == getattr(table, column).tolist()
+    np.testing.assert_array_equal(loaded.confidence, table.confidence)
+    assert loaded.speaker.tolist() == [0, 0, 1, 1]
+    assert loaded.full_text() == "Bom dia a todos. Vamos começar.\nPauta aprovada, ação!\n"
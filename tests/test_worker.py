@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import os
+from contextlib import ExitStack
+
+import worker
+from worker import WarmPools, _is_broken
+
+
+def test_pool_quebrado_e_recriado():
+    with ExitStack() as stack:
+        pools = WarmPools(stack, workers_cpu=1)
+        broken = pools.pool_cpu
+        # Um processo que termina de forma abrupta quebra o pool inteiro
+        try:
+            broken.submit(os._exit, 1).result()
+        except Exception:
+            pass
+        assert _is_broken(broken)
+
+        assert pools.rebuild_broken() == ["cpu"]
+        assert pools.pool_cpu is not broken
+        assert not _is_broken(pools.pool_cpu)
+        assert pools.rebuild_broken() == []
+
+
+def test_job_volta_a_fila_uma_unica_vez(monkeypatch):
+    monkeypatch.setattr(worker, "MAX_BROKEN_POOL_RETRIES", 1)
+    with ExitStack() as stack:
+        pools = WarmPools(stack, workers_cpu=1)
+        assert pools.should_retry("job-1")
+        assert not pools.should_retry("job-1")
+        assert pools.should_retry("job-2")
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+import re
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:  # Sem o tiktoken, os tokens são estimados a partir das palavras
+    tiktoken = None
+
+from model_functions import CHAT_MODEL, MINUTES_SYSTEM_PROMPT, build_minutes_prompt
+from transcript_store import format_timestamp, speaker_label
+
+# Janela de contexto (tokens) dos modelos de chat suportados
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+RESERVED_OUTPUT_TOKENS = 1500  # Reservado para a ata gerada pelo modelo
+MAX_CHUNK_TOKENS = 12000  # Limite por parte mesmo em modelos de contexto grande, para manter as atas detalhadas
+TOKENS_PER_WORD_ESTIMATE = 1.6  # Estimativa para português quando o tiktoken não está instalado
+TIME_MARKER_SECONDS = 60  # Intervalo mínimo entre as marcações [hh:mm:ss] inseridas no texto das partes
+
+# Trechos formados só por estas palavras (hesitações, concordâncias) não entram nas partes enviadas ao modelo
+FILLER_WORDS = {"né", "hum", "hmm", "hm", "aham", "uhum", "ahn", "ah", "eh", "hã", "é", "tá", "ok", "sim", "certo"}
+FILLER_PATTERN = re.compile(r"[^\w]+")
+
+# Uma sentença termina em '.', '!' ou '?' seguidos de espaço; o restante do texto forma a última sentença
+SENTENCE_PATTERN = re.compile(r"(?:[^.!?]|[.!?]+(?!\s|$))+[.!?]*", re.S)
+
+_encodings = {}
+
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[model]
+
+def count_tokens(text, model=CHAT_MODEL):
+    """
+    Conta os tokens do texto com o tokenizador local do modelo (ou uma estimativa, sem o tiktoken).
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return int(len(text.split()) * TOKENS_PER_WORD_ESTIMATE + 0.5)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def minutes_chunk_budget(model=CHAT_MODEL):
+    """
+    Tokens disponíveis para a transcrição em cada chamada: contexto do modelo menos o template
+    do prompt, a mensagem de sistema e a resposta reservada.
+    """
+    context = MODEL_CONTEXT_TOKENS.get(model, MODEL_CONTEXT_TOKENS["gpt-4"])
+    template = count_tokens(build_minutes_prompt("", part_number=999, time_range=(0, 0)), model) + count_tokens(MINUTES_SYSTEM_PROMPT, model)
+    return min(context - template - RESERVED_OUTPUT_TOKENS, MAX_CHUNK_TOKENS)
+
+def _split_long_sentence(sentence, max_tokens, model):
+    """
+    Divide uma sentença maior que o limite em pedaços de palavras que caibam em max_tokens.
+    """
+    pieces, current, current_tokens = [], [], 0
+    for word in sentence.split():
+        word_tokens = count_tokens(" " + word, model)
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def split_text_by_tokens(text, max_tokens=None, overlap_tokens=0, model=CHAT_MODEL):
+    """
+    Divide o texto em partes de até max_tokens, respeitando os limites das sentenças, em uma única passagem.
+
+    :param max_tokens: limite por parte; por padrão, o orçamento do modelo (ver minutes_chunk_budget).
+    :param overlap_tokens: quantidade aproximada de tokens das últimas sentenças repetida no início da parte seguinte.
+    """
+    max_tokens = max_tokens or minutes_chunk_budget(model)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    sentences = []  # (texto, tokens)
+    for match in SENTENCE_PATTERN.finditer(text):
+        sentence = match.group().strip()
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence, model)
+        if tokens > max_tokens:
+            sentences.extend((piece, count_tokens(piece, model))
+                             for piece in _split_long_sentence(sentence, max_tokens, model))
+        else:
+            sentences.append((sentence, tokens))
+
+    parts = []
+    current, current_tokens = [], 0
+    for sentence, tokens in sentences:
+        if current and current_tokens + tokens > max_tokens:
+            parts.append(" ".join(s for s, _ in current))
+
+            # Mantém as últimas sentenças da parte anterior como contexto da próxima
+            carried, carried_tokens = [], 0
+            for previous, previous_tokens in reversed(current):
+                if carried_tokens + previous_tokens > overlap_tokens or carried_tokens + previous_tokens + tokens > max_tokens:
+                    break
+                carried.insert(0, (previous, previous_tokens))
+                carried_tokens += previous_tokens
+            current, current_tokens = carried, carried_tokens
+
+        current.append((sentence, tokens))
+        current_tokens += tokens
+
+    if current:
+        parts.append(" ".join(s for s, _ in current))
+    if not parts:
+        parts.append(text)
+
+    print(f"Texto dividido em {len(parts)} partes de até {max_tokens} tokens.")
+    return parts
+
+def is_filler(text):
+    """
+    Indica se o trecho contém apenas hesitações ou concordâncias (ex: "Hum, tá.").
+    """
+    words = [w for w in FILLER_PATTERN.split(text.lower()) if w]
+    return all(w in FILLER_WORDS for w in words)
+
+def _crosstalk_rows(table, turns):
+    """
+    Indica as linhas da tabela que se sobrepõem ao turno de outro falante (fala simultânea),
+    segundo o índice de turnos de diarization.diarize_segments (ordenado e sem sobreposição).
+    """
+    turns = np.asarray(turns, dtype=np.float64).reshape(-1, 3)
+    crosstalk = np.zeros(len(table), dtype=bool)
+    if not len(turns):
+        return crosstalk
+    first = np.searchsorted(turns[:, 1], table.start, side="right")
+    last = np.searchsorted(turns[:, 0], table.end, side="left")
+    for i, (lo, hi, speaker) in enumerate(zip(first, last, table.speaker)):
+        crosstalk[i] = bool(np.any(turns[lo:hi, 2] != speaker))
+    return crosstalk
+
+def split_table_by_tokens(table, max_tokens=None, model=CHAT_MODEL, marker_seconds=TIME_MARKER_SECONDS, turns=None):
+    """
+    Divide a tabela de transcrição (ver transcript_store.TranscriptTable) em partes de até max_tokens,
+    seguindo os trechos da tabela em vez de reprocessar o texto corrido.
+
+    Retorna uma lista de {"text", "start", "end"}, com o intervalo de cada parte na gravação (segundos).
+    Marcações [hh:mm:ss] são inseridas no texto a cada marker_seconds, para que as atas possam citar horários.
+    Com falantes identificados, cada turno começa em uma nova linha com "Falante N:".
+
+    :param turns: turnos dos falantes ("turns" do índice de diarization.diarize_segments). Com eles, trechos
+        só com hesitações ou que repetem o anterior são omitidos apenas quando se sobrepõem ao turno de
+        outro falante (fala simultânea); fora disso, concordâncias como "Sim." são mantidas.
+    """
+    max_tokens = max_tokens or minutes_chunk_budget(model)
+    with_speakers = table.has_speakers()
+    crosstalk = (_crosstalk_rows(table, turns) if with_speakers and turns is not None
+                 else np.zeros(len(table), dtype=bool))
+
+    parts = []
+    current, current_tokens, current_start, current_end = [], 0, 0.0, 0.0
+    last_marker, last_speaker, last_text = None, None, None
+
+    def flush():
+        parts.append({"text": "".join(current).strip(), "start": float(current_start), "end": float(current_end)})
+
+    for start, end, text, speaker, overlapped in zip(table.start, table.end, table.text, table.speaker, crosstalk):
+        if not text or (overlapped and (is_filler(text) or text == last_text)):
+            continue
+        last_text = text
+        tokens = count_tokens(text, model)
+        if current and current_tokens + tokens > max_tokens:
+            flush()
+            current, current_tokens = [], 0
+        # Cada parte e cada turno começam com o falante; o texto segue na mesma linha até a troca de falante
+        prefix = ""
+        new_turn = with_speakers and (not current or speaker != last_speaker)
+        if new_turn:
+            prefix = f"{speaker_label(speaker)}: "
+            last_speaker = speaker
+        # Cada parte começa com uma marcação de tempo, repetida a cada marker_seconds
+        if not current or start - last_marker >= marker_seconds:
+            prefix = f"[{format_timestamp(start)}] {prefix}"
+            last_marker = start
+        if prefix:
+            text = prefix + text
+            tokens = count_tokens(text, model)
+        if not current:
+            current_start = start
+        separator = "\n" if new_turn else " "
+        for piece in (_split_long_sentence(text, max_tokens, model) if tokens > max_tokens else [text]):
+            piece_tokens = count_tokens(piece, model) if tokens > max_tokens else tokens
+            if current and current_tokens + piece_tokens > max_tokens:
+                flush()
+                current, current_tokens, current_start = [], 0, start
+            current.append(separator + piece)
+            current_tokens += piece_tokens
+            separator = " "
+        current_end = end
+    if current:
+        flush()
+    if not parts:
+        parts.append({"text": "", "start": 0.0, "end": 0.0})
+
+    print(f"Transcrição dividida em {len(parts)} partes de até {max_tokens} tokens.")
+    return parts
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+
+from lazy_imports import lazy_import
+
+# Sem o pyarrow, a tabela é gravada no formato .npz do numpy; com ele, é importado ao gravar ou ler a tabela
+pa = lazy_import("pyarrow", optional=True)
+pq = lazy_import("pyarrow.parquet", optional=True)
+
+# Formato (extensão) das tabelas de transcrição gravadas pelos jobs
+TRANSCRIPT_FORMAT = "parquet" if pa is not None else "npz"
+
+def format_timestamp(seconds):
+    """
+    Formata segundos como hh:mm:ss.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def speaker_label(speaker):
+    """
+    Rótulo do falante nas partes enviadas ao modelo (índices a partir de 0; -1 é desconhecido).
+    """
+    return f"Falante {speaker + 1}" if speaker >= 0 else "Falante desconhecido"
+
+def _map_times(timeline, times):
+    """
+    Versão vetorizada de audio_segmenter.to_recording_time para um array de tempos do segmento.
+    """
+    points = np.asarray(timeline, dtype=np.float64).reshape(-1, 2)
+    idx = np.maximum(np.searchsorted(points[:, 0], times, side="right") - 1, 0)
+    return points[idx, 1] + times - points[idx, 0]
+
+class TranscriptTable:
+    """
+    Transcrição em colunas: início e fim (segundos na gravação original), texto, confiança
+    (NaN quando desconhecida), o índice do segmento de áudio (chunk) de cada trecho ou palavra e
+    o falante (-1 quando desconhecido, ver diarization).
+    """
+
+    def __init__(self, start, end, text, confidence=None, chunk=None, speaker=None):
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.text = list(text)
+        n = len(self.text)
+        self.confidence = (np.full(n, np.nan, dtype=np.float32) if confidence is None
+                           else np.asarray(confidence, dtype=np.float32))
+        self.chunk = np.zeros(n, dtype=np.int32) if chunk is None else np.asarray(chunk, dtype=np.int32)
+        self.speaker = np.full(n, -1, dtype=np.int32) if speaker is None else np.asarray(speaker, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.text)
+
+    @classmethod
+    def from_results(cls, results, timelines, level="segments"):
+        """
+        Monta a tabela a partir dos resultados de transcrição dos segmentos ({"text", "segments", "words"},
+        ver transcription_backends) e das linhas do tempo de audio_segmenter.segment_timelines.
+
+        Segmentos sem timestamps (ex: transcritos antes desta versão) viram uma única linha com a duração
+        do segmento. Linhas que terminam antes do fim do segmento anterior (sobreposição dos cortes
+        forçados) são descartadas.
+        """
+        columns = {"start": [], "end": [], "text": [], "confidence": [], "chunk": []}
+        last_end = -np.inf
+        for chunk, (result, timeline) in enumerate(zip(results, timelines)):
+            rows = result.get(level) if result else None
+            if not rows:
+                if level != "segments" or not result or not result.get("text", "").strip():
+                    continue
+                rows = [{"start": 0.0, "end": timeline["duration_seconds"], "text": result["text"].strip()}]
+            start = _map_times(timeline["timeline"], np.array([r["start"] for r in rows], dtype=np.float64))
+            end = _map_times(timeline["timeline"], np.array([r["end"] for r in rows], dtype=np.float64))
+            keep = (start + end) / 2 >= last_end
+            for i in np.flatnonzero(keep):
+                confidence = rows[i].get("confidence")
+                columns["start"].append(start[i])
+                columns["end"].append(end[i])
+                columns["text"].append(rows[i]["text"].strip())
+                columns["confidence"].append(np.nan if confidence is None else confidence)
+                columns["chunk"].append(chunk)
+            if keep.any():
+                last_end = max(last_end, end[keep].max())
+        return cls(**columns)
+
+    def between(self, start, end=np.inf):
+        """
+        Linhas que começam no intervalo [start, end) da gravação.
+        """
+        mask = (self.start >= start) & (self.start < end)
+        return TranscriptTable(self.start[mask], self.end[mask], [t for t, keep in zip(self.text, mask) if keep],
+                               self.confidence[mask], self.chunk[mask], self.speaker[mask])
+
+    def has_speakers(self):
+        return bool((self.speaker >= 0).any())
+
+    def assign_speakers(self, index):
+        """
+        Atribui a cada linha o falante do turno (índice de diarization.diarize_segments, ordenado e sem
+        sobreposição) que contém o meio da linha; entre dois turnos, vale o mais próximo.
+        """
+        turns = np.asarray(index["turns"], dtype=np.float64).reshape(-1, 3)
+        if not len(turns) or not len(self):
+            return self
+        middle = (self.start + self.end) / 2
+        before = np.clip(np.searchsorted(turns[:, 0], middle, side="right") - 1, 0, len(turns) - 1)
+        after = np.minimum(before + 1, len(turns) - 1)
+        gap_before = np.maximum(middle - turns[before, 1], 0)
+        gap_after = np.maximum(turns[after, 0] - middle, 0)
+        best = np.where(gap_after < gap_before, after, before)
+        self.speaker = turns[best, 2].astype(np.int32)
+        return self
+
+    def full_text(self):
+        """
+        Texto corrido da transcrição, com uma linha por segmento de áudio.
+        """
+        lines, current = [], None
+        for chunk, text in zip(self.chunk, self.text):
+            if chunk != current:
+                lines.append([])
+                current = chunk
+            lines[-1].append(text)
+        return "".join(" ".join(line) + "\n" for line in lines)
+
+    def save(self, path):
+        """
+        Grava a tabela em Parquet (.parquet, requer pyarrow) ou no formato .npz do numpy, conforme a extensão.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise ValueError("Gravar tabelas em Parquet requer o pacote 'pyarrow' instalado.")
+            table = pa.table({"start": self.start, "end": self.end, "text": self.text,
+                              "confidence": self.confidence, "chunk": self.chunk, "speaker": self.speaker})
+            pq.write_table(table, path, compression="zstd")
+            return path
+        # O texto é guardado como um único bloco UTF-8 com os deslocamentos de cada linha
+        encoded = [t.encode("utf-8") for t in self.text]
+        offsets = np.concatenate(([0], np.cumsum([len(b) for b in encoded], dtype=np.int64)))
+        with open(path, "wb") as f:
+            np.savez_compressed(f, start=self.start, end=self.end, confidence=self.confidence, chunk=self.chunk,
+                                speaker=self.speaker, text=np.frombuffer(b"".join(encoded), dtype=np.uint8), text_offsets=offsets)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise ValueError("Ler tabelas em Parquet requer o pacote 'pyarrow' instalado.")
+            columns = pq.read_table(path).to_pydict()
+            return cls(columns["start"], columns["end"], columns["text"], columns["confidence"], columns["chunk"],
+                       columns.get("speaker"))
+        with np.load(path) as data:
+            blob, offsets = data["text"].tobytes(), data["text_offsets"]
+            text = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+            # Tabelas gravadas antes da identificação dos falantes não têm a coluna
+            speaker = data["speaker"] if "speaker" in data.files else None
+            return cls(data["start"], data["end"], text, data["confidence"], data["chunk"], speaker)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import math
+
+from audio_encoding import UPLOAD_CODEC
+from model_functions import request_transcription_detailed, WHISPER_MODEL, TRANSCRIPTION_LANGUAGE, WORD_TIMESTAMPS
+from instrumentation import traced
+from lazy_imports import lazy_import
+
+# O mecanismo local é opcional; sem o faster-whisper, apenas a API está disponível.
+# O pacote (e o CTranslate2) só é importado ao carregar o modelo
+faster_whisper = lazy_import("faster_whisper", optional=True)
+
+# Mecanismo de transcrição padrão: "api" (Whisper da OpenAI) ou "local" (faster-whisper na CPU)
+TRANSCRIPTION_BACKEND = os.environ.get("ATAS_TRANSCRICAO", "api")
+
+# Configuração do mecanismo local (CTranslate2 com quantização int8)
+LOCAL_MODEL = os.environ.get("ATAS_MODELO_LOCAL", "small")
+LOCAL_COMPUTE_TYPE = "int8"
+LOCAL_CPU_THREADS = 2  # Threads por processo; o paralelismo vem do número de processos
+LOCAL_BATCH_SIZE = 8  # Janelas de 30 s decodificadas juntas em cada segmento
+MAX_WORKERS_LOCAL = max(1, (os.cpu_count() or 1) // LOCAL_CPU_THREADS)
+
+def _granularity(word_timestamps):
+    # Entra no cache_id: transcrições com e sem os tempos das palavras não são intercambiáveis
+    return "palavras" if word_timestamps else "trechos"
+
+class ApiTranscriber:
+    """
+    Transcrição pela API Whisper da OpenAI, com cache, novas tentativas e limites de api_client.
+    Executada em threads, já que o trabalho é de rede.
+    """
+
+    name = "api"
+    runs_in_process = False
+    upload_codec = UPLOAD_CODEC
+    cache_id = f"{WHISPER_MODEL}-{_granularity(WORD_TIMESTAMPS)}"
+
+    def transcribe(self, audio, file_name=None):
+        """
+        Retorna {"text", "segments", "words"}, com os tempos em segundos relativos ao áudio enviado.
+        """
+        return request_transcription_detailed(audio, file_name)
+
+# Modelos locais carregados neste processo, reaproveitados entre os segmentos
+_local_models = {}
+
+def _load_local_model(model_size, compute_type, cpu_threads):
+    key = (model_size, compute_type, cpu_threads)
+    if key not in _local_models:
+        print(f"Carregando o modelo local '{model_size}' ({compute_type}) no processo {os.getpid()}...")
+        model = faster_whisper.WhisperModel(model_size, device="cpu", compute_type=compute_type,
+                                            cpu_threads=cpu_threads)
+        # Versões recentes do faster-whisper decodificam várias janelas do áudio em lote
+        batched = getattr(faster_whisper, "BatchedInferencePipeline", None)
+        _local_models[key] = (model, batched(model=model) if batched else None)
+    return _local_models[key]
+
+class LocalWhisperTranscriber:
+    """
+    Transcrição local com o faster-whisper (CTranslate2) na CPU, sem envio de áudio pela rede.
+
+    Executada em um pool de processos: cada processo carrega o modelo uma única vez (ver warm_up)
+    e o reutiliza em todos os segmentos que recebe.
+    """
+
+    name = "local"
+    runs_in_process = True
+    upload_codec = "wav"  # O áudio não sai da máquina; não há por que comprimi-lo
+
+    def __init__(self, model_size=LOCAL_MODEL, compute_type=LOCAL_COMPUTE_TYPE, cpu_threads=LOCAL_CPU_THREADS,
+                 batch_size=LOCAL_BATCH_SIZE, language=TRANSCRIPTION_LANGUAGE, word_timestamps=WORD_TIMESTAMPS):
+        if faster_whisper is None:
+            raise ValueError("O mecanismo de transcrição local requer o pacote 'faster-whisper' instalado.")
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.batch_size = batch_size
+        self.language = language
+        self.word_timestamps = word_timestamps
+
+    @property
+    def cache_id(self):
+        return f"faster-whisper-{self.model_size}-{self.compute_type}-{_granularity(self.word_timestamps)}"
+
+    def warm_up(self):
+        """
+        Carrega o modelo no processo atual (usado como initializer do pool de processos).
+        """
+        _load_local_model(self.model_size, self.compute_type, self.cpu_threads)
+
+    @traced("local_transcribe", paths=("audio",))
+    def transcribe(self, audio, file_name=None):
+        """
+        Retorna {"text", "segments", "words"}, no mesmo formato do mecanismo da API, com os tempos em segundos.
+        """
+        model, batched = _load_local_model(self.model_size, self.compute_type, self.cpu_threads)
+        source = audio if isinstance(audio, str) else io.BytesIO(audio)
+        options = {"language": self.language, "word_timestamps": self.word_timestamps}
+        if batched is not None:
+            raw_segments, _ = batched.transcribe(source, batch_size=self.batch_size, **options)
+        else:
+            raw_segments, _ = model.transcribe(source, **options)
+
+        segments, words = [], []
+        for s in raw_segments:
+            segments.append({"start": round(s.start, 2), "end": round(s.end, 2), "text": s.text.strip(),
+                             "confidence": round(math.exp(s.avg_logprob), 4)})
+            words.extend({"start": round(w.start, 2), "end": round(w.end, 2), "text": w.word,
+                          "confidence": round(w.probability, 4)} for w in s.words or [])
+        return {"text": " ".join(s["text"] for s in segments if s["text"]), "segments": segments or None,
+                "words": words or None}
+
+TRANSCRIBERS = {"api": ApiTranscriber, "local": LocalWhisperTranscriber}
+
+def get_transcriber(name=None, **options):
+    """
+    Cria o mecanismo de transcrição pelo nome ("api" ou "local"; por padrão, TRANSCRIPTION_BACKEND).
+    """
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in TRANSCRIBERS:
+        raise ValueError(f"Mecanismo de transcrição desconhecido: {name}. Opções: {', '.join(TRANSCRIBERS)}.")
+    return TRANSCRIBERS[name](**options)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import wave
+import tempfile
+from concurrent.futures import wait
+
+import numpy as np
+
+import api_client
+import denoise
+import diarization
+import model_functions
+import transcript_store
+from lazy_imports import preload
+from pdf_generator import get_renderer
+
+WARM_UP_SECONDS = 2  # Duração do áudio sintético processado no aquecimento
+
+def _write_noise(path, seconds=WARM_UP_SECONDS, sr=denoise.SAMPLE_RATE):
+    rng = np.random.default_rng(0)
+    samples = (rng.normal(scale=0.05, size=seconds * sr) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes(samples.tobytes())
+
+def warm_up_cpu():
+    """
+    Prepara um processo das etapas de CPU: importa o librosa, o noisereduce e o soundfile e executa a
+    decodificação, a redução de ruído e os embeddings de voz (se ativados) em um áudio curto, para que as funções
+    compiladas pelo numba (e o modelo de embeddings, se houver) já estejam prontas no primeiro job.
+    Usado como initializer dos pools de processos dos workers aquecidos; uma falha aqui não pode
+    inutilizar o pool, então é apenas registrada.
+    """
+    try:
+        preload(denoise.librosa, denoise.nr, denoise.sf, model_functions.ffmpeg, model_functions.pydub)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "aquecimento.wav")
+            _write_noise(path)
+            audio, sr = denoise.load_audio(path)
+            denoise.encode_wav(denoise.reduce_noise(audio, sr, snr_threshold_db=None)[0], sr)
+            # Sem a instrumentação, para que o aquecimento não entre nas métricas das etapas
+            if diarization.DIARIZATION_ENABLED:
+                diarization.segment_embeddings.__wrapped__(path)
+    except Exception as e:
+        print(f"Falha no aquecimento do processo {os.getpid()}: {e}")
+
+def warm_up_worker():
+    """
+    Prepara o processo de um worker: etapas de CPU, cliente da API, tabelas em Parquet e o renderizador
+    do PDF (fontes e estilos). Retorna a duração do aquecimento em segundos.
+    """
+    started = time.monotonic()
+    warm_up_cpu()
+    preload(api_client.openai, api_client.httpx, transcript_store.pa, transcript_store.pq)
+    get_renderer()
+    return time.monotonic() - started
+
+def prefork(pool, workers):
+    """
+    Inicia de imediato os processos do pool (que executam o initializer), em vez de no primeiro job.
+    """
+    wait([pool.submit(os.getpid) for _ in range(workers)])
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import argparse
+import threading
+import multiprocessing
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from job_queue import QUEUE_DB, JobQueue
+from job_workspace import retomar_job
+from job_runner import stream_job
+from instrumentation import start_metrics_server
+from pipeline import MAX_WORKERS_DENOISE
+from batch import MAX_WORKERS_API
+from transcription_backends import get_transcriber, MAX_WORKERS_LOCAL
+from warmup import warm_up_worker, warm_up_cpu, prefork
+
+POLL_INTERVAL = 2.0  # Intervalo entre consultas à fila quando não há jobs
+FLUSH_INTERVAL = 1.0  # Intervalo mínimo entre gravações do progresso no banco
+MAX_BROKEN_POOL_RETRIES = 1  # Vezes que um job interrompido por um pool de processos quebrado volta à fila
+HEARTBEAT_INTERVAL = 30.0  # Sinal de vida do worker durante etapas longas sem eventos
+
+def _apply_event(snapshot, event):
+    """
+    Atualiza o resumo do progresso gravado na fila, consultado pela aplicação.
+    """
+    if event["type"] == "stage":
+        snapshot["stages"][event["stage"]] = {key: event[key] for key in
+                                              ("label", "done", "total", "eta_seconds", "elapsed_seconds")}
+    elif event["type"] == "message":
+        snapshot["message"] = event["text"]
+    elif event["type"] == "partial":
+        snapshot["partials"][str(event["index"])] = event["text"]
+    elif event["type"] == "token":
+        snapshot["live"][event["stage"]] = snapshot["live"].get(event["stage"], "") + event["text"]
+    elif event["type"] == "reset":
+        snapshot["live"].pop(event["stage"], None)
+
+def process_job(queue, job_id, flush_interval=FLUSH_INTERVAL, pools=None):
+    """
+    Executa um job reservado, gravando o progresso na fila e o resultado (PDF ou erro) ao final.
+
+    :param pools: WarmPools do worker aquecido, reaproveitados entre os jobs. Se o job falhar com um pool
+        de processos quebrado (ex: processo encerrado por falta de memória), o pool é recriado e o job
+        volta à fila, retomando das etapas já concluídas.
+    """
+    print(f"Iniciando job '{job_id}'.")
+    manifest = retomar_job(job_id)
+    job_pools = pools.for_job(manifest.data.get("transcription_backend")) if pools is not None else {}
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(HEARTBEAT_INTERVAL):
+            queue.heartbeat(job_id)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    snapshot = {"stages": {}, "message": None, "partials": {}, "live": {}}
+    last_flush = 0.0
+    try:
+        for event in stream_job(manifest, **job_pools):
+            _apply_event(snapshot, event)
+            if time.monotonic() - last_flush >= flush_interval:
+                queue.update_progress(job_id, snapshot)
+                last_flush = time.monotonic()
+    finally:
+        stop_heartbeat.set()
+
+    queue.update_progress(job_id, snapshot)
+    if event["error"] and pools is not None:
+        rebuilt = pools.rebuild_broken()
+        if rebuilt and pools.should_retry(job_id):
+            queue.requeue(job_id)
+            print(f"Job '{job_id}' interrompido por pool de processos quebrado ({', '.join(rebuilt)}); "
+                  f"pool recriado e job devolvido à fila.")
+            return
+    if event["error"]:
+        queue.fail(job_id, event["error"])
+        print(f"Job '{job_id}' falhou: {event['error']}")
+    else:
+        queue.complete(job_id, event["result"])
+        print(f"Job '{job_id}' concluído: {event['result']}")
+
+def _is_broken(pool):
+    """
+    Indica se um pool de processos deixou de aceitar tarefas (um de seus processos terminou de forma abrupta).
+    """
+    try:
+        pool.submit(os.getpid).result()
+    except BrokenProcessPool:
+        return True
+    return False
+
+class WarmPools:
+    """
+    Pools mantidos por um worker aquecido entre os jobs: o de CPU (processos iniciados de imediato e já
+    com as dependências e as funções do numba carregadas), o das chamadas à API e um pool de transcrição
+    local por mecanismo (ver transcription_backends), criado no primeiro job que o usa.
+    """
+
+    def __init__(self, stack, workers_cpu):
+        self._stack = stack
+        self.workers_cpu = workers_cpu
+        self.pool_cpu = self._cpu_pool()
+        self.pool_api = stack.enter_context(ThreadPoolExecutor(max_workers=MAX_WORKERS_API, thread_name_prefix="api"))
+        self._local = {}
+        self._retries = {}
+
+    def _cpu_pool(self):
+        pool = self._stack.enter_context(ProcessPoolExecutor(max_workers=self.workers_cpu, initializer=warm_up_cpu))
+        prefork(pool, self.workers_cpu)
+        return pool
+
+    def for_job(self, backend=None):
+        """
+        Pools de um job (argumentos de job_runner.run_job), com o pool local do mecanismo de transcrição
+        do job, identificado pelo modelo e seus parâmetros (cache_id).
+        """
+        transcriber = get_transcriber(backend)
+        pool_local = None
+        if transcriber.runs_in_process:
+            if transcriber.cache_id not in self._local:
+                pool = self._stack.enter_context(ProcessPoolExecutor(max_workers=MAX_WORKERS_LOCAL,
+                                                                     initializer=transcriber.warm_up))
+                prefork(pool, MAX_WORKERS_LOCAL)
+                self._local[transcriber.cache_id] = pool
+            pool_local = self._local[transcriber.cache_id]
+        return {"pool_cpu": self.pool_cpu, "pool_api": self.pool_api, "pool_local": pool_local}
+
+    def rebuild_broken(self):
+        """
+        Recria os pools de processos quebrados (os locais, no próximo job que os usar).
+        Retorna os nomes dos pools recriados.
+        """
+        rebuilt = []
+        if _is_broken(self.pool_cpu):
+            self.pool_cpu.shutdown(wait=False, cancel_futures=True)
+            self.pool_cpu = self._cpu_pool()
+            rebuilt.append("cpu")
+        for cache_id, pool in list(self._local.items()):
+            if _is_broken(pool):
+                pool.shutdown(wait=False, cancel_futures=True)
+                del self._local[cache_id]
+                rebuilt.append(cache_id)
+        return rebuilt
+
+    def should_retry(self, job_id):
+        self._retries[job_id] = self._retries.get(job_id, 0) + 1
+        return self._retries[job_id] <= MAX_BROKEN_POOL_RETRIES
+
+def _warm_pools(stack, worker_id, workers_cpu):
+    """
+    Aquece o processo do worker e cria os pools mantidos entre os jobs, já com o pool local
+    do mecanismo de transcrição padrão.
+    """
+    try:
+        print(f"Worker '{worker_id}' aquecido em {warm_up_worker():.1f}s.")
+    except Exception as e:
+        # Sem o aquecimento (ex: fontes do PDF ausentes), as dependências são carregadas no primeiro job
+        print(f"Worker '{worker_id}': falha no aquecimento ({e}); seguindo sem ele.")
+    pools = WarmPools(stack, workers_cpu)
+    try:
+        pools.for_job()
+    except Exception as e:
+        print(f"Worker '{worker_id}': falha ao preparar a transcrição local ({e}); seguindo sem ela.")
+    return pools
+
+def worker_loop(worker_id, db_path=QUEUE_DB, poll_interval=POLL_INTERVAL, metrics_port=None, warm=True,
+                workers_cpu=MAX_WORKERS_DENOISE):
+    """
+    Laço de um processo de worker: reserva o próximo job da fila e o executa em seu diretório isolado.
+
+    Com warm, o worker carrega as dependências pesadas antes do primeiro job e mantém seus pools
+    (e os processos de CPU já aquecidos) entre os jobs, em vez de criá-los a cada job.
+    """
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    queue = JobQueue(db_path)
+    with ExitStack() as stack:
+        pools = _warm_pools(stack, worker_id, workers_cpu) if warm else None
+        print(f"Worker '{worker_id}' (pid {os.getpid()}) aguardando jobs.")
+        while True:
+            job_id = queue.claim(worker_id)
+            if job_id is None:
+                time.sleep(poll_interval)
+                continue
+            try:
+                process_job(queue, job_id, pools=pools)
+            except Exception as e:
+                queue.fail(job_id, str(e))
+                print(f"Job '{job_id}' falhou: {e}")
+
+def run_worker_pool(workers, db_path=QUEUE_DB, metrics_port=None, warm=True, workers_cpu=MAX_WORKERS_DENOISE):
+    """
+    Inicia o pool de processos de worker. Jobs interrompidos por workers encerrados voltam para a fila.
+    Com metrics_port, cada worker expõe suas métricas em uma porta própria (metrics_port + i).
+    Com warm, cada worker é aquecido uma vez e mantém seus pools entre os jobs (ver worker_loop).
+    """
+    requeued = JobQueue(db_path).requeue_stale()
+    if requeued:
+        print(f"{requeued} jobs interrompidos devolvidos à fila.")
+
+    # Os workers não são daemon: cada um usa seu próprio pool de processos para a redução de ruído
+    processes = [multiprocessing.Process(target=worker_loop, name=f"worker-{i + 1}",
+                                         args=(f"worker-{i + 1}", db_path, POLL_INTERVAL,
+                                               metrics_port + i if metrics_port else None, warm, workers_cpu))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("Encerrando workers...")
+        for process in processes:
+            process.terminate()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pool de workers que executa os jobs enfileirados pela aplicação.")
+    parser.add_argument("--workers", type=int, default=2, help="Número de processos de worker.")
+    parser.add_argument("--db", default=QUEUE_DB, help="Caminho do banco SQLite da fila.")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Primeira porta das métricas no formato do Prometheus (uma porta por worker).")
+    parser.add_argument("--workers-cpu", type=int, default=MAX_WORKERS_DENOISE,
+                        help="Processos de CPU (ffmpeg, redução de ruído, falantes) mantidos por worker.")
+    parser.add_argument("--sem-aquecimento", action="store_true",
+                        help="Não pré-carrega as dependências nem mantém os pools entre os jobs.")
+    args = parser.parse_args(argv)
+    run_worker_pool(args.workers, args.db, args.metrics_port, warm=not args.sem_aquecimento,
+                    workers_cpu=args.workers_cpu)
+
+if __name__ == "__main__":
+    main()